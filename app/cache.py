@@ -0,0 +1,374 @@
+import os
+import time
+import json
+import asyncio
+import hashlib
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, List, Dict
+
+import aiofiles
+import edge_tts
+from app import logger
+
+
+@dataclass
+class CachedAudio:
+    """
+    一次合成结果：音频字节 + WordBoundary 元数据
+    """
+    audio: bytes
+    boundaries: List[Dict] = field(default_factory=list)
+
+    @property
+    def size(self) -> int:
+        return len(self.audio)
+
+    def to_sub_maker(self) -> edge_tts.SubMaker:
+        """根据缓存的 WordBoundary 重建 SubMaker，供时长计算使用"""
+        sub_maker = edge_tts.SubMaker()
+        for boundary in self.boundaries:
+            sub_maker.feed({"type": "WordBoundary", **boundary})
+        return sub_maker
+
+
+def make_cache_key(text: str, voice_name: str, rate_str: str, volume: str) -> str:
+    """
+    根据合成参数生成归一化的缓存键
+    :param text: 文本，做 NFC 归一化并去掉首尾空白
+    :param voice_name: 语音名称，大小写不敏感
+    :param rate_str: 语速百分比字符串，如 +10%
+    :param volume: 音量百分比字符串，如 +0%
+    """
+    payload = json.dumps({
+        "text": unicodedata.normalize("NFC", text).strip(),
+        "voice": voice_name.strip().lower(),
+        "rate": rate_str.strip(),
+        "volume": volume.strip(),
+    }, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class MemoryLRU:
+    """
+    进程内 LRU，按字节预算淘汰
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items: "OrderedDict[str, CachedAudio]" = OrderedDict()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._items
+
+    def get(self, key: str) -> Optional[CachedAudio]:
+        item = self._items.get(key)
+        if item is not None:
+            self._items.move_to_end(key)
+        return item
+
+    def put(self, key: str, item: CachedAudio) -> None:
+        if item.size > self.max_bytes:
+            return
+        old = self._items.pop(key, None)
+        if old is not None:
+            self.current_bytes -= old.size
+        self._items[key] = item
+        self.current_bytes += item.size
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.current_bytes -= evicted.size
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class DiskCache:
+    """
+    节点内共享的磁盘缓存层，按 TTL 过期，按总字节数淘汰最久未访问的条目
+    写入时累加字节数，只在超出预算或距上次扫描超过 SCAN_INTERVAL 时才扫描目录
+    """
+    # 未超出预算时的全量扫描间隔（秒）：清理过期条目，并校正其他进程写入同一目录造成的统计偏差
+    SCAN_INTERVAL = 300
+    # 超过该时长（秒）未修改的临时文件视为写入中途崩溃的遗留，扫描时删除
+    STALE_TMP_SECONDS = 3600
+    # 超出预算时淘汰到预算的该比例，避免缓存写满后每次写入都触发扫描
+    EVICT_TARGET = 0.9
+
+    def __init__(self, directory: str, max_bytes: int, ttl: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._evicting = False
+        # 目录中文件的字节总数（估计值），None 表示尚未扫描
+        self._total_bytes: Optional[int] = None
+        self._next_scan = 0.0
+        os.makedirs(directory, exist_ok=True)
+
+    def _paths(self, key: str):
+        base = os.path.join(self.directory, key)
+        return f"{base}.mp3", f"{base}.json"
+
+    async def get(self, key: str) -> Optional[CachedAudio]:
+        audio_path, meta_path = self._paths(key)
+        try:
+            if time.time() - os.path.getmtime(audio_path) > self.ttl:
+                self._remove(key)
+                return None
+            async with aiofiles.open(meta_path, "r", encoding="utf-8") as f:
+                boundaries = json.loads(await f.read())
+            async with aiofiles.open(audio_path, "rb") as f:
+                audio = await f.read()
+            # 更新访问时间，淘汰时按 mtime 排序
+            os.utime(audio_path)
+            return CachedAudio(audio=audio, boundaries=boundaries)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    async def put(self, key: str, item: CachedAudio) -> None:
+        audio_path, meta_path = self._paths(key)
+        # 先写临时文件再 rename，避免并发读到半个文件
+        tmp_suffix = f".{os.getpid()}.{id(item)}.tmp"
+        meta = json.dumps(item.boundaries, ensure_ascii=False).encode("utf-8")
+        async with aiofiles.open(meta_path + tmp_suffix, "wb") as f:
+            await f.write(meta)
+        async with aiofiles.open(audio_path + tmp_suffix, "wb") as f:
+            await f.write(item.audio)
+        os.replace(meta_path + tmp_suffix, meta_path)
+        os.replace(audio_path + tmp_suffix, audio_path)
+        await self._record_write(item.size + len(meta))
+
+    async def _record_write(self, nbytes: int) -> None:
+        """
+        累加写入的字节数，超出预算或到了扫描间隔时扫描目录并淘汰
+        """
+        if self._total_bytes is not None:
+            self._total_bytes += nbytes
+        if self._total_bytes is None or self._total_bytes > self.max_bytes or time.monotonic() >= self._next_scan:
+            await self._maybe_evict()
+
+    async def _maybe_evict(self) -> None:
+        if not self._evicting:
+            self._evicting = True
+            try:
+                await asyncio.to_thread(self._evict)
+            finally:
+                self._evicting = False
+                self._next_scan = time.monotonic() + self.SCAN_INTERVAL
+
+    def _remove(self, key: str) -> None:
+        for path in self._paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        """
+        扫描目录：删除过期条目和遗留的临时文件，超出字节预算时按 mtime 从旧到新删除到 EVICT_TARGET；
+        扫描结果作为新的字节总数
+        条目的 mtime 取音频文件（读取时更新），只剩元数据文件时取元数据文件
+        """
+        now = time.time()
+        # 键 -> [音频 mtime, 元数据 mtime, 字节数]
+        entries = {}
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if entry.name.endswith(".tmp"):
+                    if now - stat.st_mtime > self.STALE_TMP_SECONDS:
+                        try:
+                            os.remove(entry.path)
+                        except FileNotFoundError:
+                            pass
+                    else:
+                        total += stat.st_size
+                    continue
+                key, ext = os.path.splitext(entry.name)
+                if ext not in (".mp3", ".json"):
+                    continue
+                item = entries.setdefault(key, [None, None, 0])
+                item[0 if ext == ".mp3" else 1] = stat.st_mtime
+                item[2] += stat.st_size
+
+        live = []
+        for key, (audio_mtime, meta_mtime, size) in entries.items():
+            mtime = audio_mtime if audio_mtime is not None else meta_mtime
+            if now - mtime > self.ttl:
+                self._remove(key)
+                continue
+            live.append((mtime, size, key))
+            total += size
+
+        live.sort()
+        target = self.max_bytes * self.EVICT_TARGET if total > self.max_bytes else self.max_bytes
+        for _, size, key in live:
+            if total <= target:
+                break
+            self._remove(key)
+            total -= size
+        self._total_bytes = total
+
+
+class SynthesisCache:
+    """
+    两级合成缓存：进程内 LRU + 磁盘共享层
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+        self.memory = MemoryLRU(int(os.getenv("TTS_CACHE_MEMORY_BYTES", 64 * 1024 * 1024)))
+        self.disk = DiskCache(
+            os.getenv("TTS_CACHE_DIR", "/tmp/tts_cache"),
+            int(os.getenv("TTS_CACHE_DISK_BYTES", 1024 * 1024 * 1024)),
+            int(os.getenv("TTS_CACHE_TTL", 86400)),
+        ) if self.enabled else None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    @property
+    def max_entry_bytes(self) -> int:
+        """单条缓存的字节上限"""
+        return self.memory.max_bytes if self.enabled else 0
+
+    async def get(self, key: str) -> Optional[CachedAudio]:
+        if not self.enabled:
+            return None
+        item = self.memory.get(key)
+        if item is not None:
+            self.stats["memory_hits"] += 1
+            return item
+        try:
+            item = await self.disk.get(key)
+        except Exception as e:
+            logger.warning(f"读取磁盘缓存失败: {e}")
+            item = None
+        if item is not None:
+            self.stats["disk_hits"] += 1
+            self.memory.put(key, item)
+            return item
+        self.stats["misses"] += 1
+        return None
+
+    async def put(self, key: str, item: CachedAudio) -> None:
+        if not self.enabled or not item.audio:
+            return
+        if key in self.memory:
+            # 合并到同一次合成的请求会各自写入相同的结果，只保留第一次
+            return
+        self.memory.put(key, item)
+        try:
+            await self.disk.put(key, item)
+        except Exception as e:
+            logger.warning(f"写入磁盘缓存失败: {e}")
+
+    def get_stats(self) -> dict:
+        lookups = sum(self.stats.values())
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "memory_bytes": self.memory.current_bytes,
+        }
+
+
+# 全局合成缓存
+synthesis_cache = SynthesisCache()
+
+
+class HotAudioStore(DiskCache):
+    """
+    任务音频的本地热副本：上传 S3 的同时写入磁盘，mode=stream 时直接从磁盘返回
+    与磁盘缓存共用 TTL 和字节预算的淘汰逻辑，以任务ID为键
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl: int, enabled: bool = True):
+        super().__init__(directory, max_bytes, ttl)
+        self.enabled = enabled
+
+    def path(self, task_id: str) -> Optional[str]:
+        """
+        返回未过期的本地文件路径，不存在时返回 None
+        """
+        if not self.enabled:
+            return None
+        audio_path, _ = self._paths(task_id)
+        try:
+            if time.time() - os.path.getmtime(audio_path) > self.ttl:
+                self._remove(task_id)
+                return None
+            os.utime(audio_path)
+            return audio_path
+        except FileNotFoundError:
+            return None
+
+    def writer(self, task_id: str) -> "HotAudioWriter":
+        return HotAudioWriter(self, task_id)
+
+
+class HotAudioWriter:
+    """
+    边写边落盘，commit 后才对读取方可见；写入失败只记录日志，不影响主流程
+    """
+
+    def __init__(self, store: HotAudioStore, task_id: str):
+        self.store = store
+        self.task_id = task_id
+        self.path, _ = store._paths(task_id)
+        self.tmp_path = f"{self.path}.{os.getpid()}.{id(self)}.tmp"
+        self._file = None
+        self._written = 0
+        self._failed = not store.enabled
+
+    async def write(self, data: bytes) -> None:
+        if self._failed:
+            return
+        try:
+            if self._file is None:
+                self._file = await aiofiles.open(self.tmp_path, "wb")
+            await self._file.write(data)
+            self._written += len(data)
+        except OSError as e:
+            logger.warning(f"写入本地音频副本失败: {e}")
+            await self.discard()
+
+    async def commit(self) -> None:
+        if self._failed or self._file is None:
+            return
+        try:
+            await self._file.close()
+            self._file = None
+            os.replace(self.tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"保存本地音频副本失败: {e}")
+            await self.discard()
+            return
+        await self.store._record_write(self._written)
+
+    async def discard(self) -> None:
+        self._failed = True
+        if self._file is not None:
+            try:
+                await self._file.close()
+            except OSError:
+                pass
+            self._file = None
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:
+            pass
+
+
+# 全局任务音频热副本
+hot_audio_store = HotAudioStore(
+    os.getenv("TTS_HOT_DIR", "/tmp/tts_hot"),
+    int(os.getenv("TTS_HOT_MAX_BYTES", 1024 * 1024 * 1024)),
+    int(os.getenv("TTS_HOT_TTL", 86400)),
+    os.getenv("TTS_HOT_ENABLED", "true").lower() == "true",
+)
@@ -1,72 +1,174 @@
 import os
+import hmac
+import asyncio
+from typing import Optional
 from redis import Redis, asyncio as aioredis
-from fastapi import HTTPException
-import boto3
-import aioboto3
-from botocore.exceptions import NoCredentialsError
+from fastapi import HTTPException, Header
 import logging
 import traceback
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, AsyncExitStack
+from app.metrics import REDIS_COMMAND_SECONDS, observe
 
 logger = logging.getLogger(__name__)
 
+REDIS_HOST = os.getenv("REDIS_HOST", "127.0.0.1")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 1))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 100))
+
+# 管理接口（/admin/*）的访问令牌，请求头 X-Admin-Token 需与之一致；未配置时管理接口不可用
+ADMIN_TOKEN = os.getenv("TTS_ADMIN_TOKEN", "")
+
+# 进程内共享的 Redis 连接池，由 lifespan 创建和关闭
+_redis_pool = None
+
+
+def init_redis_pool() -> aioredis.ConnectionPool:
+    """
+    创建全局 Redis 连接池（已存在时直接返回）
+    """
+    global _redis_pool
+    if _redis_pool is None:
+        _redis_pool = aioredis.BlockingConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            decode_responses=True
+        )
+    return _redis_pool
+
+
+async def close_redis_pool() -> None:
+    """
+    关闭全局 Redis 连接池
+    """
+    global _redis_pool
+    if _redis_pool is not None:
+        await _redis_pool.disconnect()
+        _redis_pool = None
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """
+    记录每条命令耗时的 Redis 客户端；pipeline 中排队的命令不单独计时
+    """
+
+    async def execute_command(self, *args, **options):
+        with observe(REDIS_COMMAND_SECONDS, command=str(args[0]).upper()):
+            return await super().execute_command(*args, **options)
+
+
 async def get_redis_client():
     """
-    创建并返回一个异步Redis客户端
+    返回一个使用全局连接池的异步Redis客户端
     """
-    redis = aioredis.Redis(
-        host=os.getenv("REDIS_HOST", "127.0.0.1"),
-        port=6379,
-        db=1,
-        decode_responses=True
-    )
-    return redis
+    return InstrumentedRedis(connection_pool=init_redis_pool())
+
+
+def verify_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    校验管理接口的访问令牌；用作路由依赖
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="管理接口未启用，请配置 TTS_ADMIN_TOKEN")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="管理接口令牌无效")
+
 
 def get_sync_redis_client():
     """
     创建并返回一个同步Redis客户端，用于不支持异步的场景
     """
     return Redis(
-        host=os.getenv("REDIS_HOST", "127.0.0.1"), 
-        port=6379, 
-        db=1, 
+        host=REDIS_HOST,
+        port=REDIS_PORT,
+        db=REDIS_DB,
         decode_responses=True
     )
 
-# 创建一个全局的 aioboto3 session
-_session = aioboto3.Session()
+# 全局的 aioboto3 session；boto3 系列模块导入较慢，首次使用 S3 时才导入
+_session = None
+
+
+def _get_session():
+    global _session
+    if _session is None:
+        import aioboto3
+        _session = aioboto3.Session()
+    return _session
+
+# 每个 S3 客户端的最大连接数
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", 50))
+
+# 按 (endpoint, access_key) 复用的长生命周期 S3 客户端，由 lifespan 关闭
+_s3_clients = {}
+_s3_exit_stack = AsyncExitStack()
+_s3_lock = asyncio.Lock()
+
+
+def _get_s3_credentials():
+    access_key = os.getenv('ACCESS_KEY_ID')
+    secret_key = os.getenv('SECRET_ACCESS_KEY')
+    endpoint_url = os.getenv('ENDPOINT_URL')
+    if not all([access_key, secret_key, endpoint_url]):
+        logger.error("S3凭证缺失:")
+        logger.error(f"ACCESS_KEY_ID: {'已设置' if access_key else '未设置'}")
+        logger.error(f"SECRET_ACCESS_KEY: {'已设置' if secret_key else '未设置'}")
+        logger.error(f"ENDPOINT_URL: {'已设置' if endpoint_url else '未设置'}")
+        raise HTTPException(status_code=500, detail="S3凭证未完全配置")
+    return access_key, secret_key, endpoint_url
+
+
+async def init_s3_client():
+    """
+    获取（必要时创建）共享的异步S3客户端
+    """
+    access_key, secret_key, endpoint_url = _get_s3_credentials()
+    key = (endpoint_url, access_key)
+    client = _s3_clients.get(key)
+    if client is not None:
+        return client
+
+    async with _s3_lock:
+        client = _s3_clients.get(key)
+        if client is None:
+            try:
+                logger.info(f"正在创建S3客户端，endpoint: {endpoint_url}")
+                from botocore.config import Config
+                client = await _s3_exit_stack.enter_async_context(_get_session().client(
+                    's3',
+                    aws_access_key_id=access_key,
+                    aws_secret_access_key=secret_key,
+                    endpoint_url=endpoint_url,
+                    config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS)
+                ))
+                _s3_clients[key] = client
+                logger.info("S3客户端创建成功")
+            except Exception as e:
+                logger.error(f"创建S3客户端失败: {str(e)}")
+                logger.error(f"错误详情: {traceback.format_exc()}")
+                raise HTTPException(status_code=500, detail=f"创建S3客户端失败: {str(e)}")
+    return client
+
+
+async def close_s3_clients() -> None:
+    """
+    关闭所有共享的S3客户端
+    """
+    global _s3_exit_stack
+    await _s3_exit_stack.aclose()
+    _s3_exit_stack = AsyncExitStack()
+    _s3_clients.clear()
+
 
 @asynccontextmanager
 async def get_s3_client():
     """
-    创建并返回一个异步S3客户端
+    返回共享的异步S3客户端，退出上下文时不会关闭客户端
     """
-    try:
-        access_key = os.getenv('ACCESS_KEY_ID')
-        secret_key = os.getenv('SECRET_ACCESS_KEY')
-        endpoint_url = os.getenv('ENDPOINT_URL')
-        
-        logger.info(f"正在创建S3客户端，endpoint: {endpoint_url}")
-        if not all([access_key, secret_key, endpoint_url]):
-            logger.error("S3凭证缺失:")
-            logger.error(f"ACCESS_KEY_ID: {'已设置' if access_key else '未设置'}")
-            logger.error(f"SECRET_ACCESS_KEY: {'已设置' if secret_key else '未设置'}")
-            logger.error(f"ENDPOINT_URL: {'已设置' if endpoint_url else '未设置'}")
-            raise HTTPException(status_code=500, detail="S3凭证未完全配置")
-
-        async with _session.client(
-            's3',
-            aws_access_key_id=access_key,
-            aws_secret_access_key=secret_key,
-            endpoint_url=endpoint_url
-        ) as client:
-            logger.info("S3客户端创建成功")
-            yield client
-
-    except Exception as e:
-        logger.error(f"创建S3客户端失败: {str(e)}")
-        logger.error(f"错误详情: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"创建S3客户端失败: {str(e)}")
+    yield await init_s3_client()
+
 
 def get_s3_client_ctx():
     """
@@ -78,6 +180,8 @@ def get_sync_s3_client():
     """
     创建并返回一个同步S3客户端，用于不支持异步的场景
     """
+    import boto3
+    from botocore.exceptions import NoCredentialsError
     try:
         return boto3.client(
             's3',
@@ -0,0 +1,161 @@
+"""
+时长预估：从每次上游合成中学习各语音的语速（每个发音单位的秒数），用于不经合成直接预估时长和所需语速
+统计量以 n / Σx / Σx² 的形式保存在 Redis hash 中（HINCRBYFLOAT，无需读改写），按语音整体和语速分档各记一份
+x 为换算到 1.0 倍语速的每单位秒数：x = 时长 × 语速 / 单位数；时长取最后一个 WordBoundary 的结束时间，与 max_duration 的口径一致
+"""
+import os
+import re
+import math
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from app import logger
+from app.dependencies import get_redis_client
+
+# 每个语音一个 hash：tts_speech_rate:{voice}
+STATS_PREFIX = "tts_speech_rate:"
+# 少于该单位数的文本不参与统计，首尾停顿占比过大
+MIN_UNITS = 3
+# 分档或语音整体的样本数达到该值才使用，否则退回到更粗的估计
+MIN_SAMPLES = int(os.getenv("TTS_ESTIMATE_MIN_SAMPLES", 5))
+# 预估区间对应的正态分位数（约 90%）
+CONFIDENCE_Z = 1.645
+# 没有样本时的先验：中日韩每字、其他语言每词的秒数，以及相对误差
+DEFAULT_SECONDS_PER_CJK = 0.22
+DEFAULT_SECONDS_PER_WORD = 0.33
+DEFAULT_RELATIVE_ERROR = 0.3
+# 进程内缓存统计量的时长（秒），预估接口大多数时候无需访问 Redis
+STATS_CACHE_SECONDS = 5
+
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_CJK_PATTERN = re.compile(f"[{_CJK_RANGES}]")
+_WORD_PATTERN = re.compile(f"[^\\W_{_CJK_RANGES}]+")
+
+
+def count_units(text: str) -> Tuple[int, int]:
+    """
+    统计发音单位
+    :return: (中日韩字符数, 其他语言的词数)
+    """
+    return len(_CJK_PATTERN.findall(text)), len(_WORD_PATTERN.findall(text))
+
+
+def parse_rate(rate_str: str) -> float:
+    """"+10%" -> 1.1"""
+    return 1.0 + float(rate_str.strip().rstrip("%")) / 100
+
+
+def _rate_bucket(rate: float) -> str:
+    return f"{rate:.1f}"
+
+
+@dataclass(frozen=True)
+class RunningStats:
+    n: float = 0.0
+    total: float = 0.0
+    total_sq: float = 0.0
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.n
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(max(self.total_sq / self.n - self.mean ** 2, 0.0))
+
+
+def _stats_key(voice_name: str) -> str:
+    return f"{STATS_PREFIX}{voice_name.strip().lower()}"
+
+
+async def record_synthesis(text: str, voice_name: str, rate_str: str, speech_seconds: float) -> None:
+    """
+    记录一次合成的实际时长；统计失败不影响合成
+    """
+    cjk, words = count_units(text)
+    units = cjk + words
+    if units < MIN_UNITS or speech_seconds <= 0:
+        return
+    try:
+        rate = parse_rate(rate_str)
+        value = speech_seconds * rate / units
+        redis = await get_redis_client()
+        async with redis.pipeline(transaction=False) as pipe:
+            for scope in ("all", _rate_bucket(rate)):
+                pipe.hincrbyfloat(_stats_key(voice_name), f"{scope}:n", 1)
+                pipe.hincrbyfloat(_stats_key(voice_name), f"{scope}:s", value)
+                pipe.hincrbyfloat(_stats_key(voice_name), f"{scope}:ss", value * value)
+            await pipe.execute()
+    except Exception as e:
+        logger.warning(f"记录语速统计失败: {e}")
+
+
+_stats_cache: Dict[str, Tuple[float, Dict[str, RunningStats]]] = {}
+
+
+async def _load_stats(voice_name: str) -> Dict[str, RunningStats]:
+    key = _stats_key(voice_name)
+    cached = _stats_cache.get(key)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    redis = await get_redis_client()
+    raw = await redis.hgetall(key)
+    fields: Dict[str, Dict[str, float]] = {}
+    for field, value in raw.items():
+        scope, _, name = field.rpartition(":")
+        fields.setdefault(scope, {})[name] = float(value)
+    stats = {scope: RunningStats(values.get("n", 0.0), values.get("s", 0.0), values.get("ss", 0.0))
+             for scope, values in fields.items()}
+    _stats_cache[key] = (time.monotonic() + STATS_CACHE_SECONDS, stats)
+    return stats
+
+
+@dataclass(frozen=True)
+class Estimate:
+    units: int
+    # 1.0 倍语速下每单位秒数的估计值及区间
+    seconds_per_unit: float
+    low_per_unit: float
+    high_per_unit: float
+    samples: int
+    source: str
+
+    def duration(self, rate: float = 1.0) -> Tuple[float, float, float]:
+        """
+        :return: (预估时长, 下限, 上限)，单位秒
+        """
+        return (self.units * self.seconds_per_unit / rate, self.units * self.low_per_unit / rate,
+                self.units * self.high_per_unit / rate)
+
+    def rate_for(self, target_duration: float) -> Tuple[float, float]:
+        """
+        :return: (按预估值满足目标时长所需的语速, 按上限估计仍能满足目标的语速)
+        """
+        return (self.units * self.seconds_per_unit / target_duration,
+                self.units * self.high_per_unit / target_duration)
+
+
+async def estimate(text: str, voice_name: str, rate: float = 1.0) -> Estimate:
+    """
+    预估文本的语音时长；优先使用该语音在相近语速下的统计，其次是该语音整体，最后是先验值
+    """
+    cjk, words = count_units(text)
+    units = cjk + words
+    try:
+        stats = await _load_stats(voice_name)
+    except Exception as e:
+        logger.warning(f"读取语速统计失败: {e}")
+        stats = {}
+
+    for scope, source in ((_rate_bucket(rate), "voice_rate"), ("all", "voice")):
+        item = stats.get(scope)
+        if item is not None and item.n >= MIN_SAMPLES:
+            # 单次观测的预测区间：标准差按样本数放大
+            margin = CONFIDENCE_Z * item.std * math.sqrt(1 + 1 / item.n)
+            return Estimate(units=units, seconds_per_unit=item.mean, low_per_unit=max(item.mean - margin, 0.0),
+                            high_per_unit=item.mean + margin, samples=int(item.n), source=source)
+
+    prior = (cjk * DEFAULT_SECONDS_PER_CJK + words * DEFAULT_SECONDS_PER_WORD) / units if units else 0.0
+    return Estimate(units=units, seconds_per_unit=prior, low_per_unit=prior * (1 - DEFAULT_RELATIVE_ERROR),
+                    high_per_unit=prior * (1 + DEFAULT_RELATIVE_ERROR), samples=0, source="default")
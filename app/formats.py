@@ -0,0 +1,47 @@
+"""
+输出格式注册表：每种格式对应上游原生合成的格式名、响应的媒体类型、对象扩展名和时长计算方式
+服务端不做转码，只提供上游客户端（edge_tts）能直接产出的格式
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+from app.mp3 import Mp3DurationCounter
+
+
+@dataclass(frozen=True)
+class OutputFormat:
+    name: str
+    upstream: str
+    media_type: str
+    extension: str
+    duration_counter: Callable[[], Mp3DurationCounter]
+    # 码率（bit/s），用于按时长估算音频大小
+    bitrate: int
+
+
+# edge_tts 7.0 在 speech.config 中固定请求 audio-24khz-48kbitrate-mono-mp3，
+# 且只接受 audio/mpeg 的音频消息，因此目前只有 MP3 一种原生格式
+OUTPUT_FORMATS: Dict[str, OutputFormat] = {
+    "mp3": OutputFormat(
+        name="mp3",
+        upstream="audio-24khz-48kbitrate-mono-mp3",
+        media_type="audio/mpeg",
+        extension="mp3",
+        duration_counter=Mp3DurationCounter,
+        bitrate=48000,
+    ),
+}
+DEFAULT_OUTPUT_FORMAT = "mp3"
+# 允许直接使用上游格式名
+_ALIASES = {output_format.upstream: output_format.name for output_format in OUTPUT_FORMATS.values()}
+
+
+def get_output_format(name: str) -> OutputFormat:
+    """
+    按名称（如 mp3）或上游格式名查找输出格式，不支持时抛出 ValueError
+    """
+    key = (name or DEFAULT_OUTPUT_FORMAT).lower()
+    output_format = OUTPUT_FORMATS.get(_ALIASES.get(key, key))
+    if output_format is None:
+        raise ValueError(f"不支持的输出格式: {name}，可选: {', '.join(OUTPUT_FORMATS)}")
+    return output_format
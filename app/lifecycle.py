@@ -0,0 +1,206 @@
+"""
+节点生命周期：跟踪进行中的音频流和后台任务，支持排空（drain），并为 /healthz、/readyz 检查依赖
+排空期间不再接受新的合成和任务（返回 503），等待进行中的工作在期限内完成
+排空状态写入节点本地的标记文件，/admin/drain 由任意一个 uvicorn 进程处理，所有进程都会看到
+"""
+import os
+import time
+import asyncio
+from typing import Coroutine, Dict, List
+from urllib.parse import urlparse
+
+import edge_tts
+from fastapi import HTTPException
+
+from app import logger
+from app.dependencies import get_redis_client, init_s3_client
+
+# uvicorn 进程数，以及排空的最长等待时间（秒）
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+DRAIN_TIMEOUT = float(os.getenv("TTS_DRAIN_TIMEOUT", 30))
+# 排空时建议客户端的重试间隔（秒）
+DRAIN_RETRY_AFTER = 5
+# 依赖检查的超时及结果缓存时长（秒），避免探针频繁访问上游
+HEALTH_CHECK_TIMEOUT = float(os.getenv("TTS_HEALTH_CHECK_TIMEOUT", 2))
+HEALTH_CACHE_SECONDS = 5
+# 配置后用 head_bucket 检查 S3，否则只检查客户端能否创建
+HEALTH_S3_BUCKET = os.getenv("TTS_HEALTH_S3_BUCKET")
+# 排空标记文件，同一节点的所有 uvicorn 进程共享；服务关闭时删除
+DRAIN_FILE = os.getenv("TTS_DRAIN_FILE", "/tmp/tts_draining")
+
+
+class NodeLifecycle:
+    def __init__(self, drain_file: str = DRAIN_FILE):
+        self.drain_file = drain_file
+        # 本进程已开始关闭
+        self._draining = False
+        # 预热完成前 /readyz 不返回就绪
+        self.warmed_up = False
+        self.streams = 0
+        self._tasks: Dict[asyncio.Task, str] = {}
+        # 启动报告：导入耗时、预热各阶段耗时、首个请求的响应耗时
+        self.startup = {"import_seconds": None, "warmup": None, "first_request": None}
+
+    @property
+    def draining(self) -> bool:
+        return self._draining or os.path.exists(self.drain_file)
+
+    def mark_draining(self) -> None:
+        """
+        让本节点的所有进程开始排空：写入标记文件，写入失败时至少本进程排空
+        """
+        self._draining = True
+        try:
+            os.makedirs(os.path.dirname(self.drain_file) or ".", exist_ok=True)
+            with open(self.drain_file, "w") as f:
+                f.write(str(time.time()))
+        except OSError as e:
+            logger.error(f"写入排空标记失败 {self.drain_file}: {e}")
+
+    def clear_drain_marker(self) -> None:
+        try:
+            os.remove(self.drain_file)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除排空标记失败 {self.drain_file}: {e}")
+
+    @property
+    def tasks(self) -> int:
+        return len(self._tasks)
+
+    def spawn(self, coro: Coroutine, name: str) -> asyncio.Task:
+        """
+        在后台运行任务，不依附于请求连接；排空时会等待其完成
+        """
+        task = asyncio.create_task(coro)
+        self._tasks[task] = name
+        task.add_done_callback(self._on_task_done)
+        return task
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        name = self._tasks.pop(task, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"后台任务 {name} 失败: {task.exception()}")
+
+    async def stream(self, stream):
+        """
+        包装音频流，统计进行中的流数
+        """
+        self.streams += 1
+        try:
+            async for data in stream:
+                yield data
+        finally:
+            self.streams -= 1
+
+    def ensure_accepting(self) -> None:
+        """
+        排空期间拒绝新的工作；用作路由依赖
+        """
+        if self.draining:
+            raise HTTPException(status_code=503, detail="节点正在排空，请稍后重试",
+                                headers={"Retry-After": str(DRAIN_RETRY_AFTER)})
+
+    async def drain(self, timeout: float = DRAIN_TIMEOUT) -> List[str]:
+        """
+        停止接受新工作，等待进行中的流和后台任务完成；超过期限后取消剩余任务
+        :return: 被取消的后台任务名称
+        """
+        self._draining = True
+        deadline = time.monotonic() + timeout
+        if self.streams or self._tasks:
+            logger.info(f"开始排空：{self.streams} 个音频流，{len(self._tasks)} 个后台任务")
+        while (self.streams or self._tasks) and time.monotonic() < deadline:
+            await asyncio.sleep(0.2)
+
+        unfinished = list(self._tasks.items())
+        for task, _ in unfinished:
+            task.cancel()
+        if unfinished:
+            await asyncio.wait([task for task, _ in unfinished], timeout=HEALTH_CHECK_TIMEOUT)
+            logger.warning(f"排空超时，已取消 {len(unfinished)} 个后台任务")
+        # 服务关闭后标记失效，避免重启后的进程仍处于排空状态
+        self.clear_drain_marker()
+        return [name for _, name in unfinished]
+
+
+class FirstRequestTimer:
+    """
+    ASGI 中间件：记录启动后首个业务请求到响应头发出的耗时，写入启动报告；记录后直接透传
+    """
+    # 探针和指标请求不计入
+    IGNORED_PATHS = ("/healthz", "/readyz", "/metrics")
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or lifecycle.startup["first_request"] is not None
+                or scope["path"] in self.IGNORED_PATHS):
+            return await self.app(scope, receive, send)
+
+        started = time.perf_counter()
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start" and lifecycle.startup["first_request"] is None:
+                lifecycle.startup["first_request"] = {
+                    "path": scope["path"],
+                    "status": message["status"],
+                    "seconds": round(time.perf_counter() - started, 3),
+                }
+                logger.info(f"首个请求 {scope['path']} 耗时 {lifecycle.startup['first_request']['seconds']} 秒")
+            await send(message)
+
+        await self.app(scope, receive, timed_send)
+
+
+async def _timed_check(check) -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(check(), timeout=HEALTH_CHECK_TIMEOUT)
+        return {"ok": True, "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    except Exception as e:
+        return {"ok": False, "error": str(e) or type(e).__name__}
+
+
+async def _check_redis() -> None:
+    redis = await get_redis_client()
+    await redis.ping()
+
+
+async def _check_s3() -> None:
+    s3_client = await init_s3_client()
+    if HEALTH_S3_BUCKET:
+        await s3_client.head_bucket(Bucket=HEALTH_S3_BUCKET)
+
+
+async def _check_upstream() -> None:
+    """
+    只建立到上游的 TCP 连接，不发起合成
+    """
+    url = urlparse(edge_tts.communicate.WSS_URL)
+    port = url.port or (443 if url.scheme == "wss" else 80)
+    _, writer = await asyncio.open_connection(url.hostname, port)
+    writer.close()
+    await writer.wait_closed()
+
+
+_health_cache = {"checked_at": 0.0, "result": None}
+_health_lock = asyncio.Lock()
+
+
+async def check_dependencies() -> dict:
+    """
+    并发检查 Redis、S3 和上游的可达性，结果缓存 HEALTH_CACHE_SECONDS 秒
+    """
+    async with _health_lock:
+        if _health_cache["result"] is None or time.monotonic() - _health_cache["checked_at"] > HEALTH_CACHE_SECONDS:
+            redis, s3, upstream = await asyncio.gather(
+                _timed_check(_check_redis), _timed_check(_check_s3), _timed_check(_check_upstream))
+            _health_cache["result"] = {"redis": redis, "s3": s3, "upstream": upstream}
+            _health_cache["checked_at"] = time.monotonic()
+        return _health_cache["result"]
+
+
+lifecycle = NodeLifecycle()
@@ -0,0 +1,143 @@
+"""
+进程级音频缓冲内存预算：合成和处理过程中留在内存中的音频（单飞合并的回放缓冲、待写入缓存的音频块、
+按时长调整语速、响度归一化、长文本拼接、对白、字幕）开始前按预估字节数申请额度，额度不足时排队等待，
+超时抛出 MemoryBudgetError，接口返回 503 + Retry-After，避免并发的大文件把容器推向 OOM
+额度按先来先得分配，大请求不会被源源不断的小请求饿死
+"""
+import os
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+from fastapi.responses import StreamingResponse
+
+from app.metrics import MEMORY_BUDGET_USED_BYTES, MEMORY_BUDGET_REJECTED
+
+# 本进程音频缓冲的字节上限，0 表示不限制
+MEMORY_BUDGET_BYTES = int(os.getenv("TTS_MEMORY_BUDGET_BYTES", 256 * 1024 * 1024))
+# 接口请求等待额度的最长时间（秒），0 表示额度不足时立即返回 503
+MEMORY_WAIT_SECONDS = float(os.getenv("TTS_MEMORY_WAIT_SECONDS", 1))
+# 后台任务等待额度的最长时间（秒），超时后任务失败并按队列策略重试
+TASK_MEMORY_WAIT_SECONDS = float(os.getenv("TTS_TASK_MEMORY_WAIT_SECONDS", 300))
+# 额度不足时建议客户端的重试间隔（秒）
+MEMORY_RETRY_AFTER = 2
+
+
+class MemoryBudgetError(Exception):
+    """等待内存额度超时"""
+
+
+class BufferLease:
+    """
+    一份已申请的额度；release 可重复调用
+    """
+
+    def __init__(self, budget: "MemoryBudget", nbytes: int):
+        self.budget = budget
+        self.nbytes = nbytes
+
+    def release(self) -> None:
+        if self.nbytes:
+            self.budget._release(self.nbytes)
+            self.nbytes = 0
+
+
+class LeasedStreamingResponse(StreamingResponse):
+    """
+    响应结束后释放内存额度；发送响应头失败或客户端在开始读取音频流之前断开时同样释放，
+    不依赖音频流生成器的 finally（生成器未开始迭代时 finally 不会执行）
+    """
+
+    def __init__(self, content, lease: BufferLease, **kwargs):
+        super().__init__(content, **kwargs)
+        self.lease = lease
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.lease.release()
+
+
+class MemoryBudget:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self.rejected = 0
+        self._waiters = deque()
+
+    @property
+    def enabled(self) -> bool:
+        return self.limit > 0
+
+    def _grant_waiters(self) -> None:
+        while self._waiters:
+            nbytes, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if self.used + nbytes > self.limit:
+                break
+            self._waiters.popleft()
+            self.used += nbytes
+            future.set_result(None)
+        MEMORY_BUDGET_USED_BYTES.set(self.used)
+
+    def _release(self, nbytes: int) -> None:
+        self.used -= nbytes
+        self._grant_waiters()
+
+    async def acquire(self, nbytes: int, timeout: float) -> BufferLease:
+        """
+        申请 nbytes 字节的额度，不足时最多等待 timeout 秒
+        超过总预算的单个申请按总预算计，即等到独占全部额度后执行
+        """
+        nbytes = min(max(int(nbytes), 0), self.limit) if self.enabled else 0
+        if not nbytes:
+            return BufferLease(self, 0)
+        if not self._waiters and self.used + nbytes <= self.limit:
+            self.used += nbytes
+            MEMORY_BUDGET_USED_BYTES.set(self.used)
+            return BufferLease(self, nbytes)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((nbytes, future))
+        granted = False
+        try:
+            if timeout > 0:
+                await asyncio.wait((future,), timeout=timeout)
+            granted = future.done()
+        finally:
+            if not granted:
+                if future.done():
+                    # 额度已分配但等待方被取消
+                    self.used -= nbytes
+                else:
+                    future.cancel()
+                # 队首放弃后，后面较小的申请可能已经放得下
+                self._grant_waiters()
+        if not granted:
+            self.rejected += 1
+            MEMORY_BUDGET_REJECTED.inc()
+            raise MemoryBudgetError(f"音频缓冲内存不足（已用 {self.used} / {self.limit} 字节），请稍后重试")
+        return BufferLease(self, nbytes)
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int, timeout: float):
+        lease = await self.acquire(nbytes, timeout)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def get_stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "limit_bytes": self.limit,
+            "used_bytes": self.used,
+            "waiting": sum(not future.done() for _, future in self._waiters),
+            "rejected": self.rejected,
+        }
+
+
+memory_budget = MemoryBudget(MEMORY_BUDGET_BYTES)
@@ -0,0 +1,86 @@
+"""
+Prometheus 指标：合成链路各阶段耗时、Redis/S3 延迟、进行中的流、任务结果和输出字节数
+API 进程通过 /metrics 暴露，worker 进程在 TTS_WORKER_METRICS_PORT 上单独暴露
+uvicorn 多进程运行时设置 PROMETHEUS_MULTIPROC_DIR，/metrics 汇总所有进程的指标
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, CONTENT_TYPE_LATEST, generate_latest, \
+    multiprocess, start_http_server
+
+WORKER_METRICS_PORT = int(os.getenv("TTS_WORKER_METRICS_PORT", 9101))
+
+# 毫秒级到分钟级的通用耗时分桶
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+_REDIS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+UPSTREAM_WAIT_SECONDS = Histogram(
+    "tts_upstream_wait_seconds", "等待上游并发名额的时间", buckets=_LATENCY_BUCKETS)
+UPSTREAM_TTFB_SECONDS = Histogram(
+    "tts_upstream_ttfb_seconds", "上游首个音频块的到达时间", buckets=_LATENCY_BUCKETS)
+SYNTHESIS_SECONDS = Histogram(
+    "tts_synthesis_seconds", "单次上游合成的总耗时", ["outcome"], buckets=_LATENCY_BUCKETS)
+DURATION_FIT_ITERATIONS = Histogram(
+    "tts_duration_fit_iterations", "按时长调整语速时的合成次数", buckets=(1, 2, 3, 4, 5, 6, 8))
+NORMALIZE_SECONDS = Histogram(
+    "tts_normalize_seconds", "响度归一化耗时", buckets=_LATENCY_BUCKETS)
+S3_REQUEST_SECONDS = Histogram(
+    "tts_s3_request_seconds", "S3 请求耗时", ["operation"], buckets=_LATENCY_BUCKETS)
+REDIS_COMMAND_SECONDS = Histogram(
+    "tts_redis_command_seconds", "Redis 命令耗时", ["command"], buckets=_REDIS_BUCKETS)
+TASK_SECONDS = Histogram(
+    "tts_task_seconds", "音频任务从开始处理到结束的耗时", ["status"], buckets=_LATENCY_BUCKETS)
+
+TASKS_TOTAL = Counter("tts_tasks_total", "处理结束的音频任务数", ["status"])
+BYTES_SERVED = Counter("tts_bytes_served_total", "输出的音频字节数", ["endpoint"])
+SYNTHESIS_COALESCED = Counter("tts_synthesis_coalesced_total", "合并到进行中的相同合成上的请求数")
+MEMORY_BUDGET_REJECTED = Counter("tts_memory_budget_rejected_total", "因音频缓冲内存额度不足被拒绝的请求和任务数")
+# multiprocess_mode 只在多进程模式下生效
+STREAMS_IN_FLIGHT = Gauge("tts_streams_in_flight", "进行中的 /tts 音频流", multiprocess_mode="livesum")
+MEMORY_BUDGET_USED_BYTES = Gauge("tts_memory_budget_used_bytes", "已申请的音频缓冲内存额度", multiprocess_mode="livesum")
+TASK_QUEUE_PENDING = Gauge("tts_task_queue_pending", "任务流中尚未被处理完的任务数", multiprocess_mode="mostrecent")
+TASK_QUEUE_DELAYED = Gauge("tts_task_queue_delayed", "等待重试的任务数", multiprocess_mode="mostrecent")
+
+
+@contextmanager
+def observe(histogram, **labels):
+    """
+    记录代码块的耗时
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        (histogram.labels(**labels) if labels else histogram).observe(time.perf_counter() - started)
+
+
+async def track_stream(stream, endpoint: str):
+    """
+    包装音频流：统计进行中的流数和输出字节数
+    """
+    STREAMS_IN_FLIGHT.inc()
+    try:
+        async for data in stream:
+            BYTES_SERVED.labels(endpoint=endpoint).inc(len(data))
+            yield data
+    finally:
+        STREAMS_IN_FLIGHT.dec()
+
+
+def render_metrics() -> bytes:
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+def start_worker_metrics_server() -> None:
+    """
+    worker 进程没有 HTTP 服务，单独监听一个端口供 Prometheus 抓取；端口为 0 时不启动
+    """
+    if WORKER_METRICS_PORT:
+        start_http_server(WORKER_METRICS_PORT)
+
@@ -0,0 +1,179 @@
+"""
+MP3 帧级工具：解析帧头、计算时长、无重编码拼接
+"""
+import math
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Tuple
+
+# 比特率表（kbps），按 (MPEG1?, layer) 索引
+_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+# 采样率表，按版本位索引：0 = MPEG2.5, 2 = MPEG2, 3 = MPEG1
+_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    0: [11025, 12000, 8000],
+}
+
+
+@dataclass
+class FrameHeader:
+    version: int
+    layer: int
+    bitrate: int
+    sample_rate: int
+    padding: int
+    channel_mode: int
+    protected: bool
+    length: int
+    samples: int
+
+    @property
+    def mpeg1(self) -> bool:
+        return self.version == 3
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate
+
+
+def parse_frame_header(data: bytes, pos: int) -> Optional[FrameHeader]:
+    """
+    解析 pos 处的帧头，不是合法帧头时返回 None
+    """
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version = (b1 >> 3) & 0x03
+    layer_bits = (b1 >> 1) & 0x03
+    bitrate_index = (b2 >> 4) & 0x0F
+    sample_rate_index = (b2 >> 2) & 0x03
+    if version == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    layer = 4 - layer_bits
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (b2 >> 1) & 0x01
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return FrameHeader(
+        version=version,
+        layer=layer,
+        bitrate=bitrate,
+        sample_rate=sample_rate,
+        padding=padding,
+        channel_mode=(b3 >> 6) & 0x03,
+        protected=not (b1 & 0x01),
+        length=length,
+        samples=samples,
+    )
+
+
+def skip_id3v2(data: bytes) -> int:
+    """返回 ID3v2 标签之后的偏移量，没有标签时返回 0"""
+    if len(data) >= 10 and data[:3] == b"ID3":
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        footer = 10 if data[5] & 0x10 else 0
+        return 10 + size + footer
+    return 0
+
+
+def iter_frames(data: bytes) -> Iterator[Tuple[int, FrameHeader]]:
+    """
+    依次返回 (偏移量, 帧头)；遇到无法识别的字节时向后重新同步
+    """
+    pos = skip_id3v2(data)
+    end = len(data)
+    if end >= 128 and data[-128:-125] == b"TAG":
+        end -= 128
+    while pos + 4 <= end:
+        header = parse_frame_header(data, pos)
+        if header is None or header.length <= 0 or pos + header.length > end:
+            pos += 1
+            continue
+        yield pos, header
+        pos += header.length
+
+
+def mp3_duration(data: bytes) -> float:
+    """按帧数计算音频时长（秒）"""
+    return sum(header.duration for _, header in iter_frames(data))
+
+
+def strip_tags(data: bytes) -> bytes:
+    """去掉首尾的 ID3 标签，只保留音频帧"""
+    start = skip_id3v2(data)
+    end = len(data)
+    if end - start >= 128 and data[-128:-125] == b"TAG":
+        end -= 128
+    return data[start:end]
+
+
+def join_mp3(parts: List[bytes]) -> bytes:
+    """
+    在帧边界拼接多段 MP3，不重新编码
+    """
+    return b"".join(strip_tags(part) for part in parts)
+
+
+# edge_tts 输出格式（audio-24khz-48kbitrate-mono-mp3）的静音帧：
+# MPEG2 Layer III、48kbps、24kHz、单声道，side info 与主数据全为 0，每帧 576 个采样
+_SILENT_FRAME = bytes([0xFF, 0xF3, 0x64, 0xC0]) + bytes(140)
+_SILENT_FRAME_SECONDS = 576 / 24000
+
+
+def silence(seconds: float) -> bytes:
+    """
+    生成与 edge_tts 输出格式一致的静音帧，时长向上取整到帧
+    """
+    # 先四舍五入再向上取整，避免浮点误差使整数帧的时长多出一帧
+    count = max(math.ceil(round(seconds / _SILENT_FRAME_SECONDS, 6)), 0)
+    return _SILENT_FRAME * count
+
+
+class Mp3DurationCounter:
+    """
+    增量统计 MP3 流的时长，只缓存跨块的不完整帧
+    """
+
+    def __init__(self):
+        self.duration = 0.0
+        self.frames = 0
+        self._pending = b""
+        self._started = False
+
+    def feed(self, data: bytes) -> None:
+        data = self._pending + data
+        pos = 0
+        if not self._started:
+            if len(data) < 10:
+                self._pending = data
+                return
+            pos = skip_id3v2(data)
+            if pos > len(data):
+                self._pending = data
+                return
+            self._started = True
+        while pos + 4 <= len(data):
+            header = parse_frame_header(data, pos)
+            if header is None or header.length <= 0:
+                pos += 1
+                continue
+            if pos + header.length > len(data):
+                break
+            self.duration += header.duration
+            self.frames += 1
+            pos += header.length
+        self._pending = data[pos:]
@@ -0,0 +1,243 @@
+"""
+MP3 无损响度归一化（与 mp3gain 原理相同）：
+解码后分析响度，再按 1.5dB 步长修改每个 granule 的 global_gain，音频帧不重新编码
+"""
+import io
+import os
+import math
+import signal
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Tuple
+
+from app import logger
+from app.mp3 import iter_frames
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# global_gain 每加 1 对应的增益（dB）
+GAIN_STEP_DB = 1.5
+# ReplayGain 参考值：分析结果为 PINK_REF 时对应 89dB 的目标响度
+PINK_REF = 64.82
+REFERENCE_DB = 89.0
+# 分析窗口长度（秒）及取值的百分位
+WINDOW_SECONDS = 0.05
+LOUDNESS_PERCENTILE = 95
+# 低于该电平（16 位刻度的 dB，约 -70 dBFS）的窗口视为静音，不参与响度统计
+SILENCE_LEVEL_DB = 20.0
+# 单次归一化的最大增益（dB），避免近乎静音的音频得到离谱的建议增益
+MAX_GAIN_DB = 12.0
+
+NORMALIZE_ENABLED = os.getenv("TTS_NORMALIZE_ENABLED", "true").lower() == "true"
+NORMALIZE_WORKERS = int(os.getenv("TTS_NORMALIZE_WORKERS", 2))
+
+
+@dataclass(frozen=True)
+class GainOptions:
+    """
+    mp3gain 参数的类型化表示
+    apply_track_gain: -r 应用音轨增益
+    ignore_clipping: -c 忽略削波，不因峰值限制增益
+    db_offset: -d N 在建议增益基础上额外调整 N dB（目标响度为 89 + N dB）
+    """
+    apply_track_gain: bool = False
+    ignore_clipping: bool = False
+    db_offset: float = 0.0
+
+    @classmethod
+    def parse(cls, params: Optional[str]) -> "GainOptions":
+        """
+        解析 mp3gain 风格的参数字符串，如 "-r -c -d 8"；不支持的参数抛出 ValueError
+        """
+        tokens = (params or "").split()
+        options = {}
+        index = 0
+        while index < len(tokens):
+            token = tokens[index]
+            if token == "-r":
+                options["apply_track_gain"] = True
+            elif token == "-c":
+                options["ignore_clipping"] = True
+            elif token == "-d":
+                index += 1
+                if index >= len(tokens):
+                    raise ValueError("-d 参数缺少数值")
+                try:
+                    options["db_offset"] = float(tokens[index])
+                except ValueError:
+                    raise ValueError(f"-d 参数不是有效数值: {tokens[index]}")
+            else:
+                raise ValueError(f"不支持的 MP3Gain 参数: {token}")
+            index += 1
+        return cls(**options)
+
+
+def analyze_loudness(samples: "np.ndarray", sample_rate: int) -> Tuple[float, float]:
+    """
+    简化的 ReplayGain 响度分析（不含等响度滤波），静音窗口不参与统计
+    :param samples: 浮点采样，形状为 (n,) 或 (n, channels)
+    :return: (建议增益 dB, 峰值)；全部为静音时建议增益为 0
+    """
+    import numpy as np
+
+    if samples.ndim > 1:
+        power = np.mean(np.square(samples), axis=1)
+    else:
+        power = np.square(samples)
+    peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+
+    window = max(int(sample_rate * WINDOW_SECONDS), 1)
+    count = len(power) // window
+    if count == 0:
+        return 0.0, peak
+    # 按 16 位整数刻度计算每个窗口的均方值
+    mean_square = power[:count * window].reshape(count, window).mean(axis=1) * (32768.0 ** 2)
+    levels = 10 * np.log10(mean_square + 1e-37)
+    levels = levels[levels >= SILENCE_LEVEL_DB]
+    if levels.size == 0:
+        return 0.0, peak
+    loudness = float(np.percentile(levels, LOUDNESS_PERCENTILE))
+    return PINK_REF - loudness, peak
+
+
+def _read_bits(data: bytearray, bit_pos: int, count: int) -> int:
+    value = 0
+    for i in range(count):
+        byte = data[(bit_pos + i) >> 3]
+        value = (value << 1) | ((byte >> (7 - ((bit_pos + i) & 7))) & 1)
+    return value
+
+
+def _write_bits(data: bytearray, bit_pos: int, count: int, value: int) -> None:
+    for i in range(count):
+        index = (bit_pos + i) >> 3
+        shift = 7 - ((bit_pos + i) & 7)
+        bit = (value >> (count - 1 - i)) & 1
+        data[index] = (data[index] & ~(1 << shift)) | (bit << shift)
+
+
+def _crc16(data: bytes) -> int:
+    """MPEG 音频帧使用的 CRC-16（多项式 0x8005，初值 0xFFFF）"""
+    crc = 0xFFFF
+    for byte in data:
+        crc ^= byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x8005) if crc & 0x8000 else (crc << 1)
+            crc &= 0xFFFF
+    return crc
+
+
+def apply_gain_steps(data: bytes, steps: int) -> bytes:
+    """
+    将每个 Layer III 帧所有 granule/声道的 global_gain 加上 steps，可逆且不重新编码
+    """
+    if steps == 0:
+        return data
+    output = bytearray(data)
+    for pos, header in iter_frames(data):
+        if header.layer != 3:
+            continue
+        channels = 1 if header.channel_mode == 3 else 2
+        side_start = pos + 4 + (2 if header.protected else 0)
+        if header.mpeg1:
+            side_length = 17 if channels == 1 else 32
+            prefix_bits = 9 + (5 if channels == 1 else 3) + 4 * channels
+            granules, granule_bits = 2, 59
+        else:
+            side_length = 9 if channels == 1 else 17
+            prefix_bits = 8 + (1 if channels == 1 else 2)
+            granules, granule_bits = 1, 63
+
+        for index in range(granules * channels):
+            # global_gain 位于 part2_3_length(12) 和 big_values(9) 之后
+            bit_pos = side_start * 8 + prefix_bits + index * granule_bits + 21
+            gain = _read_bits(output, bit_pos, 8)
+            _write_bits(output, bit_pos, 8, min(max(gain + steps, 0), 255))
+
+        if header.protected:
+            crc = _crc16(bytes(output[pos + 2:pos + 4]) + bytes(output[side_start:side_start + side_length]))
+            output[pos + 4:pos + 6] = crc.to_bytes(2, "big")
+    return bytes(output)
+
+
+def normalize_mp3(data: bytes, options: GainOptions) -> Tuple[bytes, float]:
+    """
+    分析并应用响度增益
+    :return: (处理后的音频, 实际应用的增益 dB)
+    """
+    if not options.apply_track_gain or not data:
+        return data, 0.0
+    # numpy/soundfile 只在归一化的进程池中使用，按需导入以加快服务启动
+    import soundfile as sf
+
+    try:
+        samples, sample_rate = sf.read(io.BytesIO(data), dtype="float32")
+    except RuntimeError as e:
+        # 无法解码（截断或损坏的音频）时原样返回，不让一次归一化失败拖垮整个请求或任务
+        logger.warning(f"音频解码失败，跳过归一化: {e}")
+        return data, 0.0
+    suggested_db, peak = analyze_loudness(samples, sample_rate)
+    max_steps = math.floor(MAX_GAIN_DB / GAIN_STEP_DB)
+    steps = min(max(round((suggested_db + options.db_offset) / GAIN_STEP_DB), -max_steps), max_steps)
+    if not options.ignore_clipping and peak > 0:
+        # 限制增益使峰值不超过满幅
+        steps = min(steps, math.floor(20 * math.log10(1.0 / peak) / GAIN_STEP_DB))
+    return apply_gain_steps(data, steps), steps * GAIN_STEP_DB
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+# 子进程用 forkserver 启动（不支持时用 spawn）：直接 fork 会复制事件循环、Redis/S3 连接和已加锁的锁，
+# 在多线程的服务进程中 fork 也可能死锁
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def _init_worker() -> None:
+    """
+    进程池子进程的初始化：恢复默认的信号处理，不继承服务进程对 SIGTERM/SIGINT 的处理方式，
+    保证父进程退出后子进程能被正常终止
+    """
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=NORMALIZE_WORKERS, initializer=_init_worker,
+                                        mp_context=multiprocessing.get_context(START_METHOD))
+    return _executor
+
+
+def _preload() -> None:
+    import numpy  # noqa: F401
+    import soundfile  # noqa: F401
+
+
+async def warm_up_normalizer() -> None:
+    """
+    预先启动进程池中的所有进程并导入解码依赖，首个归一化请求不再等待进程启动
+    """
+    executor = _get_executor()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(executor, _preload) for _ in range(NORMALIZE_WORKERS)))
+
+
+async def normalize_audio(data: bytes, options: GainOptions) -> Tuple[bytes, float]:
+    """
+    在进程池中执行归一化，避免阻塞事件循环
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), normalize_mp3, data, options)
+
+
+def shutdown_normalizer() -> None:
+    """
+    取消排队中的归一化并等待子进程退出，不留下孤儿进程
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
@@ -1,33 +1,187 @@
+"""
+异步代理池：后台定期从 proxy_pool 服务拉取代理，按健康度为每次上游请求分配代理
+健康度综合成功率与首字节延迟 EWMA，连续失败的代理进入冷却期；只有连接类错误计为代理失败
+"""
 import os
-import redis
-import requests
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+import aiohttp
 from app import logger
 
+PROXY_ENABLED = os.getenv("TTS_PROXY_ENABLED", "false").lower() == "true"
+PROXY_POOL_URL = os.getenv("TTS_PROXY_POOL_URL", "http://proxy_pool:5010/all/")
+REFRESH_SECONDS = int(os.getenv("TTS_PROXY_REFRESH_SECONDS", 60))
+# 冷却时长基数（秒），连续失败 n 次冷却 base * 2^(n-1)，上限 COOLDOWN_MAX
+COOLDOWN_BASE = 10
+COOLDOWN_MAX = 300
+# 延迟 EWMA 的平滑系数
+LATENCY_ALPHA = 0.2
+
+
+@dataclass
+class ProxyStats:
+    proxy: str
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    latency_ewma: float = 1.0
+    cooldown_until: float = 0.0
+    in_flight: int = 0
+
+    @property
+    def success_rate(self) -> float:
+        # 拉普拉斯平滑，新代理从 0.5 起步
+        return (self.successes + 1) / (self.successes + self.failures + 2)
+
+    @property
+    def score(self) -> float:
+        return self.success_rate / (self.latency_ewma * (1 + self.in_flight))
+
+
+def _normalize_proxy(proxy: str) -> str:
+    return proxy if "://" in proxy else f"http://{proxy}"
+
+
+def is_proxy_error(error: BaseException) -> bool:
+    """
+    判断是否为代理可能导致的连接类错误；上游返回的内容错误（如 NoAudioReceived）与代理无关
+    """
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientHttpProxyError,
+                              aiohttp.WSServerHandshakeError, asyncio.TimeoutError, ConnectionError))
+
+
+class ProxyLease:
+    """
+    一次上游请求分配到的代理；收到首个音频块时调用 mark_first_byte，延迟按首字节计，不受文本长度影响
+    """
+
+    def __init__(self, stats: Optional[ProxyStats]):
+        self.stats = stats
+        self.proxy = stats.proxy if stats is not None else None
+        self.started = time.monotonic()
+        self.first_byte_at: Optional[float] = None
+
+    def mark_first_byte(self) -> None:
+        if self.first_byte_at is None:
+            self.first_byte_at = time.monotonic()
+
+    @property
+    def latency(self) -> float:
+        return (self.first_byte_at or time.monotonic()) - self.started
+
+
+class ProxyManager:
+    """
+    进程内代理管理器，每次请求独立分配代理，不修改进程环境变量
+    """
+
+    def __init__(self, pool_url: str = PROXY_POOL_URL, refresh_seconds: int = REFRESH_SECONDS):
+        self.pool_url = pool_url
+        self.refresh_seconds = refresh_seconds
+        self._proxies: Dict[str, ProxyStats] = {}
+        self._refresher: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> None:
+        """
+        从 proxy_pool 拉取代理列表；保留已有代理的统计数据，移除已下线的代理
+        """
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
+                async with session.get(self.pool_url) as response:
+                    response.raise_for_status()
+                    items = await response.json(content_type=None)
+        except Exception as e:
+            logger.warning(f"拉取代理列表失败: {e}")
+            return
+
+        proxies = {_normalize_proxy(item["proxy"]) for item in items if isinstance(item, dict) and item.get("proxy")}
+        for proxy in proxies - self._proxies.keys():
+            self._proxies[proxy] = ProxyStats(proxy=proxy)
+        for proxy in self._proxies.keys() - proxies:
+            if self._proxies[proxy].in_flight == 0:
+                del self._proxies[proxy]
+        logger.info(f"代理池已刷新，共 {len(self._proxies)} 个代理")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.refresh_seconds)
+
+    def start(self) -> None:
+        if self._refresher is None:
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    def pick(self) -> Optional[ProxyStats]:
+        """
+        按健康度加权随机选择一个不在冷却期的代理，代理池为空时返回 None（直连）
+        """
+        now = time.time()
+        candidates = [stats for stats in self._proxies.values() if stats.cooldown_until <= now]
+        if not candidates:
+            return None
+        return random.choices(candidates, weights=[stats.score for stats in candidates])[0]
+
+    def report(self, stats: ProxyStats, ok: bool, latency: float) -> None:
+        if ok:
+            stats.successes += 1
+            stats.consecutive_failures = 0
+            stats.latency_ewma = LATENCY_ALPHA * latency + (1 - LATENCY_ALPHA) * stats.latency_ewma
+        else:
+            stats.failures += 1
+            stats.consecutive_failures += 1
+            cooldown = min(COOLDOWN_BASE * 2 ** (stats.consecutive_failures - 1), COOLDOWN_MAX)
+            stats.cooldown_until = time.time() + cooldown
+
+    @asynccontextmanager
+    async def use(self):
+        """
+        为一次上游请求分配代理，并根据请求结果更新代理的健康度
+        :return: ProxyLease，未启用或没有可用代理时其 proxy 为 None（直连）
+        """
+        stats = self.pick() if PROXY_ENABLED else None
+        lease = ProxyLease(stats)
+        if stats is None:
+            yield lease
+            return
+
+        stats.in_flight += 1
+        ok = None
+        try:
+            yield lease
+            ok = True
+        except (GeneratorExit, asyncio.CancelledError):
+            # 客户端断开或任务取消与代理无关，不计入健康度
+            raise
+        except Exception as e:
+            # 连接类错误计为失败；上游内容错误说明代理本身是通的，不计入健康度
+            if is_proxy_error(e):
+                ok = False
+            raise
+        finally:
+            stats.in_flight -= 1
+            if ok is not None:
+                self.report(stats, ok, lease.latency)
+
+    def get_stats(self) -> list:
+        now = time.time()
+        return [{
+            "proxy": stats.proxy,
+            "success_rate": round(stats.success_rate, 3),
+            "latency_ewma": round(stats.latency_ewma, 3),
+            "in_flight": stats.in_flight,
+            "cooling_down": stats.cooldown_until > now,
+        } for stats in self._proxies.values()]
+
 
-def load_all_proxies(get_redis_client: redis.Redis):
-    try:
-        response = requests.get("http://proxy_pool:5010/all/")
-        if response.status_code == 200:
-            proxies = [proxy.get("proxy") for proxy in response.json()]
-            if isinstance(proxies, list):
-                for proxy in proxies:
-                    get_redis_client.rpush("proxy_pool", proxy)
-    except requests.RequestException:
-        pass
-
-
-def get_proxy(get_redis_client: redis.Redis):
-    return get_redis_client.lpop("proxy_pool")
-
-
-def reset_proxy(get_redis_client: redis.Redis):
-    load_all_proxies(get_redis_client)
-    current_proxy = get_proxy(get_redis_client)
-    if current_proxy:
-        os.environ["http_proxy"] = current_proxy
-        os.environ["https_proxy"] = current_proxy
-        logger.info(f"代理已设置: {current_proxy}")
-    else:
-        os.environ["http_proxy"] = ""
-        os.environ["https_proxy"] = ""
-        logger.info("代理已置空")
+# 全局代理管理器
+proxy_manager = ProxyManager()
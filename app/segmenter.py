@@ -0,0 +1,78 @@
+"""
+长文本分段：优先按句子切分，句子过长时再按分句切分，最后按长度硬切
+"""
+import re
+from typing import List
+
+# 句末标点：中日韩全角标点直接切分；半角 . ! ? ; 需后接空白或位于末尾，避免切开小数和缩写
+_SENTENCE_RE = re.compile(r"(?<=[。！？；…\n])|(?<=[.!?;])(?=\s|$)")
+_CLAUSE_RE = re.compile(r"(?<=[，、：,:])")
+# 含有可发音字符（字母、数字、汉字等）的片段才能合成，只含标点时上游返回 NoAudioReceived
+_SPEAKABLE_RE = re.compile(r"[^\W_]")
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def _hard_split(text: str, max_bytes: int) -> List[str]:
+    """按字节上限硬切，优先在空白处断开"""
+    pieces = []
+    while _utf8_len(text) > max_bytes:
+        # 上限小于单个字符的字节数时也至少前进一个字符
+        cut = max(len(text.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore")), 1)
+        space = text.rfind(" ", 0, cut)
+        if space > cut // 2:
+            cut = space + 1
+        pieces.append(text[:cut])
+        text = text[cut:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def _split_long(sentence: str, max_bytes: int) -> List[str]:
+    if _utf8_len(sentence) <= max_bytes:
+        return [sentence]
+    pieces = []
+    for clause in _CLAUSE_RE.split(sentence):
+        if clause:
+            pieces.extend(_hard_split(clause, max_bytes))
+    return pieces
+
+
+def split_text(text: str, max_bytes: int = 1000) -> List[str]:
+    """
+    将文本切分为不超过 max_bytes（UTF-8 字节）的片段
+    相邻的短句会合并到同一片段中，以减少上游请求次数；只含标点的片段并入相邻片段（此时可能略超上限）
+    :param text: 原始文本
+    :param max_bytes: 单个片段的字节上限
+    :return: 片段列表，拼接后与原文本一致（首尾空白除外）
+    """
+    pieces = []
+    for sentence in _SENTENCE_RE.split(text):
+        if sentence:
+            pieces.extend(_split_long(sentence, max_bytes))
+
+    chunks = []
+    current = ""
+    for piece in pieces:
+        if current and _utf8_len(current) + _utf8_len(piece) > max_bytes:
+            chunks.append(current)
+            current = ""
+        current += piece
+    if current:
+        chunks.append(current)
+
+    result = []
+    for chunk in (c.strip() for c in chunks):
+        if not chunk:
+            continue
+        if result and not _SPEAKABLE_RE.search(chunk):
+            result[-1] += chunk
+            continue
+        if result and not _SPEAKABLE_RE.search(result[-1]):
+            # 开头只含标点的片段并入后一个片段
+            chunk = result.pop() + chunk
+        result.append(chunk)
+    return result
@@ -0,0 +1,101 @@
+"""
+单飞合并：同一节点上参数完全相同、同时进行的合成只向上游发起一次请求
+第一个请求驱动上游流，后续相同的请求作为订阅者挂到扇出缓冲上：先回放已缓冲的消息，再跟随实时消息
+"""
+import os
+import asyncio
+from typing import AsyncIterator, Callable, Dict, Hashable
+
+from app.metrics import SYNTHESIS_COALESCED
+
+SINGLEFLIGHT_ENABLED = os.getenv("TTS_SINGLEFLIGHT_ENABLED", "true").lower() == "true"
+
+
+class Flight:
+    """
+    一次进行中的上游合成：后台任务读取上游消息写入缓冲，订阅者各自按下标读取
+    所有订阅者都离开后取消上游请求
+    """
+
+    def __init__(self, source: AsyncIterator[dict]):
+        self.messages = []
+        self.finished = False
+        self.error = None
+        self.subscribers = 0
+        self._wakeup = asyncio.Event()
+        self.task = asyncio.create_task(self._run(source))
+
+    def _notify(self) -> None:
+        wakeup, self._wakeup = self._wakeup, asyncio.Event()
+        wakeup.set()
+
+    async def _run(self, source: AsyncIterator[dict]) -> None:
+        try:
+            async for message in source:
+                self.messages.append(message)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = asyncio.CancelledError()
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            self._notify()
+
+    async def replay(self) -> AsyncIterator[dict]:
+        index = 0
+        while True:
+            while index < len(self.messages):
+                yield self.messages[index]
+                index += 1
+            if self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            await self._wakeup.wait()
+
+
+class SingleFlight:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._flights: Dict[Hashable, Flight] = {}
+
+    def _remove(self, key: Hashable, flight: Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def stream(self, key: Hashable, source_factory: Callable[[], AsyncIterator[dict]]) -> AsyncIterator[dict]:
+        """
+        返回 key 对应合成的消息流；已有相同 key 的合成在进行时直接订阅
+        :param source_factory: 没有进行中的合成时调用，返回上游消息的异步迭代器
+        """
+        if not self.enabled:
+            async for message in source_factory():
+                yield message
+            return
+
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = Flight(source_factory())
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._remove(key, flight))
+        else:
+            SYNTHESIS_COALESCED.inc()
+
+        flight.subscribers += 1
+        try:
+            async for message in flight.replay():
+                yield message
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.finished:
+                # 没有订阅者了，不再需要上游结果；先移除，避免新请求挂到正在取消的合成上
+                self._remove(key, flight)
+                flight.task.cancel()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+
+synthesis_flights = SingleFlight(enabled=SINGLEFLIGHT_ENABLED)
@@ -0,0 +1,145 @@
+import os
+import time
+from collections import OrderedDict
+from app import logger
+from app.metrics import S3_REQUEST_SECONDS, observe
+
+# 分片上传的分片大小，S3 要求除最后一片外不小于 5MB
+PART_SIZE = max(int(os.getenv("TTS_S3_PART_SIZE", 8 * 1024 * 1024)), 5 * 1024 * 1024)
+
+
+class S3StreamUploader:
+    """
+    流式上传到 S3/R2：缓冲区不超过一个分片大小
+    总大小不足一个分片时使用单次 put_object，否则使用分片上传
+    """
+
+    def __init__(self, s3_client, bucket_name: str, object_name: str, content_type: str = "audio/mpeg"):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.object_name = object_name
+        self.content_type = content_type
+        self.size = 0
+        self._buffer = bytearray()
+        self._upload_id = None
+        self._parts = []
+
+    async def write(self, data: bytes) -> None:
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= PART_SIZE:
+            part = bytes(self._buffer[:PART_SIZE])
+            del self._buffer[:PART_SIZE]
+            await self._upload_part(part)
+
+    async def _upload_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            with observe(S3_REQUEST_SECONDS, operation="create_multipart_upload"):
+                response = await self.s3_client.create_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.object_name,
+                    ContentType=self.content_type
+                )
+            self._upload_id = response["UploadId"]
+        part_number = len(self._parts) + 1
+        with observe(S3_REQUEST_SECONDS, operation="upload_part"):
+            response = await self.s3_client.upload_part(
+                Bucket=self.bucket_name,
+                Key=self.object_name,
+                UploadId=self._upload_id,
+                PartNumber=part_number,
+                Body=data
+            )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    async def complete(self) -> None:
+        if self._upload_id is None:
+            with observe(S3_REQUEST_SECONDS, operation="put_object"):
+                await self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=self.object_name,
+                    Body=bytes(self._buffer),
+                    ContentType=self.content_type
+                )
+        else:
+            if self._buffer:
+                await self._upload_part(bytes(self._buffer))
+            with observe(S3_REQUEST_SECONDS, operation="complete_multipart_upload"):
+                await self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=self.object_name,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts}
+                )
+        self._buffer.clear()
+        logger.info(f"S3上传成功: bucket={self.bucket_name}, object={self.object_name}, 大小: {self.size} bytes")
+
+    async def abort(self) -> None:
+        self._buffer.clear()
+        if self._upload_id is None:
+            return
+        try:
+            await self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=self.object_name,
+                UploadId=self._upload_id
+            )
+        except Exception as e:
+            logger.warning(f"取消分片上传失败: {e}")
+
+
+# 预签名URL的有效期，以及提前多久视为过期并重新生成
+PRESIGN_EXPIRES_IN = 3600
+PRESIGN_REFRESH_MARGIN = 300
+PRESIGN_CACHE_SIZE = 10000
+
+_presigned_urls: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+
+async def get_presigned_url(s3_client, bucket_name: str, object_name: str) -> str:
+    """
+    生成 get_object 预签名URL，并缓存到过期前 PRESIGN_REFRESH_MARGIN 秒
+    """
+    key = (bucket_name, object_name)
+    cached = _presigned_urls.get(key)
+    now = time.time()
+    if cached is not None and cached[1] > now:
+        _presigned_urls.move_to_end(key)
+        return cached[0]
+
+    url = await s3_client.generate_presigned_url(
+        'get_object',
+        Params={'Bucket': bucket_name, 'Key': object_name},
+        ExpiresIn=PRESIGN_EXPIRES_IN
+    )
+    _presigned_urls[key] = (url, now + PRESIGN_EXPIRES_IN - PRESIGN_REFRESH_MARGIN)
+    _presigned_urls.move_to_end(key)
+    while len(_presigned_urls) > PRESIGN_CACHE_SIZE:
+        _presigned_urls.popitem(last=False)
+    return url
+
+
+# 从 S3 转发对象时每次读取的字节数
+S3_STREAM_CHUNK_SIZE = 64 * 1024
+
+
+async def open_s3_object(s3_client, bucket_name: str, object_name: str, byte_range: str = None) -> dict:
+    """
+    发起 get_object 请求，返回响应（Body 尚未读取）
+    :param byte_range: HTTP Range 头，如 "bytes=0-1023"，原样转发给 S3
+    """
+    params = {"Bucket": bucket_name, "Key": object_name}
+    if byte_range:
+        params["Range"] = byte_range
+    with observe(S3_REQUEST_SECONDS, operation="get_object"):
+        return await s3_client.get_object(**params)
+
+
+async def iter_s3_body(response: dict, chunk_size: int = S3_STREAM_CHUNK_SIZE):
+    """
+    分块读取 get_object 的响应体，读取结束或中断时释放连接
+    """
+    body = response["Body"]
+    async with body:
+        while data := await body.read(chunk_size):
+            yield data
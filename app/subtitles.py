@@ -0,0 +1,106 @@
+"""
+由 WordBoundary 生成字幕（SRT/VTT）和逐词时间轴 JSON，不需要额外的上游请求
+边界的 offset/duration 单位为 100ns
+"""
+import json
+from typing import Callable, Dict, List
+
+# 单行字幕的最大字符数及最长时长（秒），词间停顿超过 MAX_GAP 秒时换行
+MAX_LINE_CHARS = 24
+MAX_LINE_SECONDS = 6.0
+MAX_GAP = 0.6
+TICKS_PER_SECOND = 10_000_000
+
+
+def _is_cjk(text: str) -> bool:
+    return any("\u3040" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af" for ch in text)
+
+
+def _join(words: List[str]) -> str:
+    """中日韩文字直接拼接，其他语言以空格分隔"""
+    text = ""
+    for word in words:
+        if text and not (_is_cjk(text[-1]) and _is_cjk(word[0])):
+            text += " "
+        text += word
+    return text
+
+
+def group_lines(boundaries: List[Dict]) -> List[Dict]:
+    """
+    将逐词边界合并为字幕行
+    :return: [{"start": 秒, "end": 秒, "text": 文本}, ...]
+    """
+    lines = []
+    words, start, end = [], 0.0, 0.0
+    for boundary in boundaries:
+        word = boundary["text"].strip()
+        if not word:
+            continue
+        word_start = boundary["offset"] / TICKS_PER_SECOND
+        word_end = (boundary["offset"] + boundary["duration"]) / TICKS_PER_SECOND
+        if words and (len(_join(words + [word])) > MAX_LINE_CHARS or word_end - start > MAX_LINE_SECONDS
+                      or word_start - end > MAX_GAP):
+            lines.append({"start": start, "end": end, "text": _join(words)})
+            words = []
+        if not words:
+            start = word_start
+        words.append(word)
+        end = word_end
+    if words:
+        lines.append({"start": start, "end": end, "text": _join(words)})
+    return lines
+
+
+def _timestamp(seconds: float, separator: str) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600_000)
+    minutes, millis = divmod(millis, 60_000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{millis:03d}"
+
+
+def to_srt(boundaries: List[Dict]) -> str:
+    return "".join(
+        f"{index}\n{_timestamp(line['start'], ',')} --> {_timestamp(line['end'], ',')}\n{line['text']}\n\n"
+        for index, line in enumerate(group_lines(boundaries), start=1)
+    )
+
+
+def to_vtt(boundaries: List[Dict]) -> str:
+    return "WEBVTT\n\n" + "".join(
+        f"{_timestamp(line['start'], '.')} --> {_timestamp(line['end'], '.')}\n{line['text']}\n\n"
+        for line in group_lines(boundaries)
+    )
+
+
+def to_word_json(boundaries: List[Dict]) -> str:
+    """
+    紧凑的逐词时间轴：{"words": [[开始毫秒, 结束毫秒, "词"], ...]}
+    """
+    words = [[boundary["offset"] // 10_000, (boundary["offset"] + boundary["duration"]) // 10_000, boundary["text"]]
+             for boundary in boundaries]
+    return json.dumps({"words": words}, ensure_ascii=False, separators=(",", ":"))
+
+
+# 格式名 -> (生成函数, 对象后缀, 媒体类型)
+SUBTITLE_FORMATS: Dict[str, tuple] = {
+    "srt": (to_srt, "srt", "application/x-subrip"),
+    "vtt": (to_vtt, "vtt", "text/vtt"),
+    "json": (to_word_json, "words.json", "application/json"),
+}
+
+
+def get_subtitle_format(name: str) -> tuple:
+    """
+    查找字幕格式，不支持时抛出 ValueError
+    """
+    subtitle_format = SUBTITLE_FORMATS.get((name or "").lower())
+    if subtitle_format is None:
+        raise ValueError(f"不支持的字幕格式: {name}，可选: {', '.join(SUBTITLE_FORMATS)}")
+    return subtitle_format
+
+
+def render_subtitles(name: str, boundaries: List[Dict]) -> str:
+    render: Callable[[List[Dict]], str] = get_subtitle_format(name)[0]
+    return render(boundaries)
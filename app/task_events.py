@@ -0,0 +1,93 @@
+"""
+任务状态变更通知：状态写入时通过 Redis pub/sub 发布，
+每个进程只维持一个模式订阅连接，再分发给本进程内等待该任务的协程
+"""
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Dict, Set, Optional
+
+from redis import asyncio as aioredis
+from app import logger
+
+EVENT_CHANNEL_PREFIX = "tts_task_events:"
+
+
+def event_channel(task_id: str) -> str:
+    return f"{EVENT_CHANNEL_PREFIX}{task_id}"
+
+
+class TaskEventHub:
+    """
+    进程内的任务事件分发中心
+    """
+
+    def __init__(self):
+        self._waiters: Dict[str, Set[asyncio.Queue]] = {}
+        self._reader: Optional[asyncio.Task] = None
+        self._pubsub = None
+        # 并发的首批订阅只建立一个订阅连接
+        self._start_lock = asyncio.Lock()
+
+    async def _ensure_started(self, redis: aioredis.Redis) -> None:
+        if self._reader is not None and not self._reader.done():
+            return
+        async with self._start_lock:
+            if self._reader is not None and not self._reader.done():
+                return
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            await pubsub.psubscribe(f"{EVENT_CHANNEL_PREFIX}*")
+            self._pubsub = pubsub
+            self._reader = asyncio.create_task(self._read_loop())
+
+    async def _read_loop(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"读取任务事件失败: {e}")
+                await asyncio.sleep(1)
+                continue
+            if not message or message.get("type") != "pmessage":
+                continue
+            task_id = message["channel"][len(EVENT_CHANNEL_PREFIX):]
+            try:
+                event = json.loads(message["data"])
+            except ValueError:
+                continue
+            for queue in self._waiters.get(task_id, ()):
+                queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, redis: aioredis.Redis, task_id: str):
+        """
+        订阅某个任务的状态事件，返回一个 asyncio.Queue
+        """
+        await self._ensure_started(redis)
+        queue = asyncio.Queue()
+        self._waiters.setdefault(task_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            waiters = self._waiters.get(task_id)
+            if waiters is not None:
+                waiters.discard(queue)
+                if not waiters:
+                    del self._waiters[task_id]
+
+    async def close(self) -> None:
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except Exception as e:
+                logger.warning(f"关闭任务事件订阅失败: {e}")
+            self._pubsub = None
+
+
+# 全局任务事件分发中心
+task_event_hub = TaskEventHub()
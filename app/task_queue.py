@@ -0,0 +1,204 @@
+import os
+import json
+import time
+import socket
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from redis import asyncio as aioredis
+from redis.exceptions import ResponseError
+from app import logger
+from app.task_store import compact_task_indexes, update_task
+
+# 任务流、消费组及延迟重试集合的 Redis 键
+STREAM_KEY = "tts_task_stream"
+GROUP_NAME = "tts_workers"
+DELAYED_KEY = "tts_task_delayed"
+ATTEMPTS_KEY = "tts_task_attempts"
+
+WORKER_CONCURRENCY = int(os.getenv("TTS_WORKER_CONCURRENCY", 4))
+# 租约时长：超过该时间没有心跳的任务会被其他 worker 重新认领
+LEASE_SECONDS = int(os.getenv("TTS_TASK_LEASE_SECONDS", 60))
+MAX_ATTEMPTS = int(os.getenv("TTS_TASK_MAX_ATTEMPTS", 3))
+# 重试退避基数（秒），第 n 次重试等待 base * 2^(n-1)
+RETRY_BACKOFF = float(os.getenv("TTS_TASK_RETRY_BACKOFF", 5))
+SWEEP_INTERVAL = 10
+# 清理状态索引中已过期任务的间隔（秒）
+COMPACT_INTERVAL = int(os.getenv("TTS_TASK_COMPACT_INTERVAL", 3600))
+
+TaskHandler = Callable[[str, dict, int, int], Awaitable[None]]
+
+
+async def ensure_group(redis: aioredis.Redis) -> None:
+    """
+    创建消费组（已存在时忽略）
+    """
+    try:
+        await redis.xgroup_create(STREAM_KEY, GROUP_NAME, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def enqueue_task(redis: aioredis.Redis, task_id: str, payload: dict) -> str:
+    """
+    将任务写入任务流
+    :param task_id: 任务ID
+    :param payload: 任务参数，需可 JSON 序列化
+    :return: 消息ID
+    """
+    return await redis.xadd(STREAM_KEY, {"task_id": task_id, "payload": json.dumps(payload, ensure_ascii=False)})
+
+
+async def get_queue_stats(redis: aioredis.Redis) -> dict:
+    """
+    任务处理完成后会从任务流中删除，因此任务流长度即为排队及处理中的任务数
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.xlen(STREAM_KEY)
+        pipe.zcard(DELAYED_KEY)
+        pending, delayed = await pipe.execute()
+    return {"pending": pending, "delayed": delayed}
+
+
+class TaskWorker:
+    """
+    基于 Redis Streams 消费组的任务 worker
+    每个任务持有租约并定期心跳；失败按指数退避重试；清扫协程会认领超时未心跳的任务
+    """
+
+    def __init__(self, redis: aioredis.Redis, handler: TaskHandler, concurrency: int = WORKER_CONCURRENCY,
+                 consumer_name: Optional[str] = None):
+        self.redis = redis
+        self.handler = handler
+        self.concurrency = concurrency
+        self.consumer_name = consumer_name or f"{socket.gethostname()}-{os.getpid()}"
+        self._slots = asyncio.Semaphore(concurrency)
+        self._running: set = set()
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        await ensure_group(self.redis)
+        logger.info(f"worker {self.consumer_name} 已启动，并发数 {self.concurrency}")
+        sweeper = asyncio.create_task(self._sweep_loop())
+        try:
+            await self._consume_loop()
+        finally:
+            sweeper.cancel()
+            # 等待进行中的任务完成；未完成的任务不会 ACK，由其他 worker 认领
+            if self._running:
+                logger.info(f"等待 {len(self._running)} 个进行中的任务完成")
+                await asyncio.wait(self._running, timeout=LEASE_SECONDS)
+            logger.info(f"worker {self.consumer_name} 已停止")
+
+    async def _consume_loop(self) -> None:
+        while not self._stopping.is_set():
+            await self._slots.acquire()
+            self._slots.release()
+            free = self.concurrency - len(self._running)
+            try:
+                response = await self.redis.xreadgroup(GROUP_NAME, self.consumer_name, {STREAM_KEY: ">"},
+                                                       count=max(free, 1), block=2000)
+            except Exception as e:
+                logger.error(f"读取任务流失败: {e}")
+                await asyncio.sleep(1)
+                continue
+            for _, messages in response or []:
+                for message_id, fields in messages:
+                    await self._start(message_id, fields)
+
+    async def _start(self, message_id: str, fields: dict) -> None:
+        await self._slots.acquire()
+        task = asyncio.create_task(self._handle(message_id, fields))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        task.add_done_callback(lambda _: self._slots.release())
+
+    async def _handle(self, message_id: str, fields: dict) -> None:
+        task_id = fields.get("task_id")
+        try:
+            payload = json.loads(fields.get("payload") or "{}")
+        except ValueError:
+            logger.error(f"任务 {task_id} 参数无法解析，丢弃消息 {message_id}")
+            # 先把任务标记为失败，避免客户端一直等待一个不会再被处理的任务
+            if task_id:
+                try:
+                    await update_task(self.redis, task_id, status="failed", error="任务参数无法解析",
+                                      message="任务参数无法解析")
+                except Exception as e:
+                    logger.error(f"标记任务失败出错 {task_id}: {e}")
+            await self._ack(message_id, task_id)
+            return
+
+        attempt = await self.redis.hincrby(ATTEMPTS_KEY, task_id, 1)
+        heartbeat = asyncio.create_task(self._heartbeat(message_id))
+        try:
+            await self.handler(task_id, payload, attempt, MAX_ATTEMPTS)
+        except Exception as e:
+            if attempt < MAX_ATTEMPTS:
+                delay = RETRY_BACKOFF * 2 ** (attempt - 1)
+                logger.warning(f"任务 {task_id} 第 {attempt} 次处理失败，{delay} 秒后重试: {e}")
+                await self.redis.zadd(DELAYED_KEY, {json.dumps(fields, ensure_ascii=False): time.time() + delay})
+                await self.redis.xack(STREAM_KEY, GROUP_NAME, message_id)
+                await self.redis.xdel(STREAM_KEY, message_id)
+                return
+            logger.error(f"任务 {task_id} 已达到最大重试次数 {MAX_ATTEMPTS}: {e}")
+        finally:
+            heartbeat.cancel()
+        await self._ack(message_id, task_id)
+
+    async def _ack(self, message_id: str, task_id: Optional[str]) -> None:
+        await self.redis.xack(STREAM_KEY, GROUP_NAME, message_id)
+        await self.redis.xdel(STREAM_KEY, message_id)
+        if task_id:
+            await self.redis.hdel(ATTEMPTS_KEY, task_id)
+
+    async def _heartbeat(self, message_id: str) -> None:
+        """重置消息的空闲时间，相当于续约"""
+        while True:
+            await asyncio.sleep(LEASE_SECONDS / 3)
+            try:
+                await self.redis.xclaim(STREAM_KEY, GROUP_NAME, self.consumer_name, 0, [message_id], justid=True)
+            except Exception as e:
+                logger.warning(f"任务心跳失败 {message_id}: {e}")
+
+    async def _sweep_loop(self) -> None:
+        next_compact = time.monotonic() + COMPACT_INTERVAL
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                await self._promote_delayed()
+                await self._reclaim_abandoned()
+                if time.monotonic() >= next_compact:
+                    next_compact = time.monotonic() + COMPACT_INTERVAL
+                    removed = await compact_task_indexes(self.redis)
+                    if removed:
+                        logger.info(f"已从状态索引中移除 {removed} 个过期任务")
+            except Exception as e:
+                logger.error(f"清扫任务失败: {e}")
+
+    async def _promote_delayed(self) -> None:
+        """将到期的重试任务放回任务流"""
+        due = await self.redis.zrangebyscore(DELAYED_KEY, 0, time.time(), start=0, num=100)
+        for raw in due:
+            # zrem 成功的 worker 才负责重新入队，避免多个 worker 重复投递
+            if await self.redis.zrem(DELAYED_KEY, raw):
+                await self.redis.xadd(STREAM_KEY, json.loads(raw))
+
+    async def _reclaim_abandoned(self) -> None:
+        """认领租约已过期（worker 崩溃或重启）的任务"""
+        free = self.concurrency - len(self._running)
+        if free <= 0 or self._stopping.is_set():
+            return
+        result = await self.redis.xautoclaim(STREAM_KEY, GROUP_NAME, self.consumer_name,
+                                             min_idle_time=LEASE_SECONDS * 1000, start_id="0-0", count=free)
+        for message_id, fields in result[1]:
+            if not fields:
+                # 消息已被删除，只需从待处理列表中移除
+                await self.redis.xack(STREAM_KEY, GROUP_NAME, message_id)
+                continue
+            logger.info(f"认领超时任务 {fields.get('task_id')} ({message_id})")
+            await self._start(message_id, fields)
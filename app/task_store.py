@@ -0,0 +1,211 @@
+"""
+任务状态读写：每个任务对应一个 Redis hash，所有读写都在一次往返内完成
+每种状态另有一个按创建时间排序的 sorted set 索引，任务进入终态后按配置的保留时长过期
+"""
+import os
+import json
+import time
+from typing import Optional
+from redis import asyncio as aioredis
+from redis.asyncio.client import Pipeline
+from app.task_events import event_channel
+
+# 任务相关数据的 Redis 键前缀
+TASK_PREFIX = "tts_task:"
+# 状态索引的键前缀：tts_task_index:{status}，成员为任务ID，分数为创建时间
+INDEX_PREFIX = "tts_task_index:"
+TASK_STATUSES = ("pending", "processing", "completed", "failed")
+
+# 终态任务的保留时长（秒），0 表示永久保留
+TASK_RETENTION = {
+    "completed": int(os.getenv("TTS_TASK_TTL_COMPLETED", 7 * 86400)),
+    "failed": int(os.getenv("TTS_TASK_TTL_FAILED", 30 * 86400)),
+}
+
+# 更新字段并把任务从旧状态的索引移到新状态的索引；终态设置过期时间，非终态取消过期
+# KEYS[1] 任务 hash；ARGV: 新状态, 索引前缀, 任务ID, 过期秒数, 当前时间, 字段1, 值1, ...
+_SET_STATUS_SCRIPT = """
+local previous = redis.call('HGET', KEYS[1], 'status')
+local created_at = redis.call('HGET', KEYS[1], 'created_at') or ARGV[5]
+redis.call('HSET', KEYS[1], unpack(ARGV, 6))
+if previous and previous ~= ARGV[1] then
+    redis.call('ZREM', ARGV[2] .. previous, ARGV[3])
+end
+redis.call('ZADD', ARGV[2] .. ARGV[1], created_at, ARGV[3])
+if tonumber(ARGV[4]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+else
+    redis.call('PERSIST', KEYS[1])
+end
+return previous
+"""
+
+
+def task_key(task_id: str) -> str:
+    return f"{TASK_PREFIX}{task_id}"
+
+
+def index_key(status: str) -> str:
+    return f"{INDEX_PREFIX}{status}"
+
+
+def _stringify(fields: dict) -> dict:
+    """Redis hash 只能存字符串，None 值跳过"""
+    return {key: str(value) for key, value in fields.items() if value is not None}
+
+
+async def create_task(redis: aioredis.Redis, task_id: str, **fields) -> None:
+    """
+    写入任务的初始状态并加入 pending 索引；可传入 pipeline，与其他写入合并为一次往返
+    """
+    created_at = time.time()
+    pipe = redis if isinstance(redis, Pipeline) else redis.pipeline(transaction=False)
+    pipe.hset(task_key(task_id), mapping=_stringify({
+        "status": "pending",
+        "voice_rate": "",
+        "message": "",
+        "created_at": round(created_at, 3),
+        **fields,
+    }))
+    pipe.zadd(index_key("pending"), {task_id: created_at})
+    if pipe is not redis:
+        await pipe.execute()
+
+
+async def update_task(redis: aioredis.Redis, task_id: str, **fields) -> None:
+    """
+    一次 HSET 更新任务的多个字段；包含 status 时同时更新状态索引、设置保留时长并发布状态变更事件
+    """
+    fields = _stringify(fields)
+    if not fields:
+        return
+    if "status" not in fields:
+        await redis.hset(task_key(task_id), mapping=fields)
+        return
+    status = fields["status"]
+    fields.setdefault("updated_at", str(round(time.time(), 3)))
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.eval(_SET_STATUS_SCRIPT, 1, task_key(task_id), status, INDEX_PREFIX, task_id,
+                  TASK_RETENTION.get(status, 0), time.time(), *[item for pair in fields.items() for item in pair])
+        pipe.publish(event_channel(task_id), json.dumps({"task_id": task_id, "status": fields["status"]}))
+        await pipe.execute()
+
+
+async def get_task(redis: aioredis.Redis, task_id: str) -> Optional[dict]:
+    """
+    一次 HGETALL 读取任务的全部字段，任务不存在时返回 None
+    """
+    task = await redis.hgetall(task_key(task_id))
+    return task or None
+
+
+async def get_task_field(redis: aioredis.Redis, task_id: str, field: str) -> Optional[str]:
+    return await redis.hget(task_key(task_id), field)
+
+
+async def list_tasks_by_status(redis: aioredis.Redis, status: str, offset: int = 0, limit: int = 100,
+                               newest_first: bool = True, since: Optional[float] = None,
+                               until: Optional[float] = None, fields: Optional[list] = None) -> tuple:
+    """
+    按创建时间分页列出某个状态的任务，只读取索引中的一页，与任务总数无关
+    已过期的任务会从索引中顺带移除
+    :return: (该状态下、创建时间在 since/until 范围内的任务总数, [(任务ID, 任务字段), ...])
+    """
+    key = index_key(status)
+    low = "-inf" if since is None else since
+    high = "+inf" if until is None else until
+    async with redis.pipeline(transaction=False) as pipe:
+        pipe.zcount(key, low, high)
+        if newest_first:
+            pipe.zrevrangebyscore(key, high, low, start=offset, num=limit)
+        else:
+            pipe.zrangebyscore(key, low, high, start=offset, num=limit)
+        total, task_ids = await pipe.execute()
+
+    tasks = await get_tasks(redis, task_ids, fields)
+    expired = [task_id for task_id, task in zip(task_ids, tasks) if task is None]
+    if expired:
+        await redis.zrem(key, *expired)
+    return total - len(expired), [(task_id, task) for task_id, task in zip(task_ids, tasks) if task is not None]
+
+
+async def compact_task_indexes(redis: aioredis.Redis, batch_size: int = 1000) -> int:
+    """
+    移除终态索引中已过期任务的ID
+    任务在创建后至少保留时长才会过期，因此只需检查创建时间早于该时长的条目
+    :return: 移除的条目数
+    """
+    removed = 0
+    for status, ttl in TASK_RETENTION.items():
+        if ttl <= 0:
+            continue
+        key = index_key(status)
+        cutoff = time.time() - ttl
+        offset = 0
+        while True:
+            task_ids = await redis.zrangebyscore(key, "-inf", cutoff, start=offset, num=batch_size)
+            if not task_ids:
+                break
+            async with redis.pipeline(transaction=False) as pipe:
+                for task_id in task_ids:
+                    pipe.exists(task_key(task_id))
+                exists = await pipe.execute()
+            expired = [task_id for task_id, found in zip(task_ids, exists) if not found]
+            if expired:
+                await redis.zrem(key, *expired)
+                removed += len(expired)
+            offset += len(task_ids) - len(expired)
+    return removed
+
+
+# 批量任务的 Redis 键前缀：hash 保存批次信息，list 按提交顺序保存任务ID
+BATCH_PREFIX = "tts_batch:"
+# 批次的保留时长（秒），从创建时开始计：批次中的任务通常很快进入终态，按终态中最长的保留时长计，
+# 批次不会早于其中的任务过期；任一终态永久保留时批次也永久保留
+BATCH_RETENTION = 0 if min(TASK_RETENTION.values()) <= 0 else max(TASK_RETENTION.values())
+
+
+def batch_key(batch_id: str) -> str:
+    return f"{BATCH_PREFIX}{batch_id}"
+
+
+async def create_batch(redis: aioredis.Redis, batch_id: str, task_ids: list, **fields) -> None:
+    """
+    写入批次信息并设置保留时长；task_ids 与提交的条目一一对应，重复条目对应同一个任务ID
+    可传入 pipeline，与任务写入合并为一次往返
+    """
+    await redis.hset(batch_key(batch_id), mapping=_stringify({
+        "total": len(task_ids),
+        "unique": len(set(task_ids)),
+        **fields,
+    }))
+    await redis.rpush(f"{batch_key(batch_id)}:tasks", *task_ids)
+    if BATCH_RETENTION:
+        await redis.expire(batch_key(batch_id), BATCH_RETENTION)
+        await redis.expire(f"{batch_key(batch_id)}:tasks", BATCH_RETENTION)
+
+
+async def get_batch(redis: aioredis.Redis, batch_id: str) -> Optional[dict]:
+    batch = await redis.hgetall(batch_key(batch_id))
+    return batch or None
+
+
+async def get_batch_task_ids(redis: aioredis.Redis, batch_id: str, start: int = 0, end: int = -1) -> list:
+    return await redis.lrange(f"{batch_key(batch_id)}:tasks", start, end)
+
+
+async def get_tasks(redis: aioredis.Redis, task_ids: list, fields: Optional[list] = None) -> list:
+    """
+    用一个 pipeline 读取多个任务；指定 fields 时只读取这些字段
+    :return: 与 task_ids 顺序一致的列表，任务不存在时对应 None
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for task_id in task_ids:
+            if fields:
+                pipe.hmget(task_key(task_id), fields)
+            else:
+                pipe.hgetall(task_key(task_id))
+        results = await pipe.execute()
+    if fields:
+        return [None if all(v is None for v in values) else dict(zip(fields, values)) for values in results]
+    return [result or None for result in results]
@@ -1,44 +1,297 @@
 import traceback
-import aiofiles
+import math
+import time
 import asyncio
-from fastapi import APIRouter, Query, HTTPException, Depends, BackgroundTasks, Body
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Query, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse, JSONResponse, Response, FileResponse
 from app import logger
 from app.utils import convert_rate_to_percent
-from app.dependencies import get_redis_client, get_s3_client_ctx, get_sync_redis_client
+from app.dependencies import get_redis_client, get_s3_client_ctx, verify_admin_token
+from app.cache import synthesis_cache, make_cache_key, CachedAudio, hot_audio_store
+from app.task_queue import enqueue_task
+from app.task_store import create_task, update_task, get_task, get_task_field, create_batch, get_batch, \
+    get_batch_task_ids, get_tasks, list_tasks_by_status, compact_task_indexes, TASK_STATUSES
+from app.segmenter import split_text
+from app.mp3 import join_mp3, mp3_duration, strip_tags, silence
+from app.formats import OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, get_output_format
+from app.subtitles import SUBTITLE_FORMATS, get_subtitle_format, render_subtitles
+from app.storage import S3StreamUploader, get_presigned_url, open_s3_object, iter_s3_body
+from app.task_events import task_event_hub
+from app.normalize import GainOptions, NORMALIZE_ENABLED, normalize_audio
+from app.upstream import upstream_slot, UpstreamBusyError, get_upstream_stats
+from app.proxy import proxy_manager
+from app.singleflight import synthesis_flights
+from app.lifecycle import lifecycle, check_dependencies
+from app.estimator import estimate, record_synthesis, parse_rate
+from app.memory import memory_budget, MemoryBudgetError, LeasedStreamingResponse, MEMORY_WAIT_SECONDS, \
+    TASK_MEMORY_WAIT_SECONDS, MEMORY_RETRY_AFTER
+from app.voices import voice_catalog
+from app.task_queue import get_queue_stats
+from app.metrics import UPSTREAM_WAIT_SECONDS, UPSTREAM_TTFB_SECONDS, SYNTHESIS_SECONDS, DURATION_FIT_ITERATIONS, \
+    NORMALIZE_SECONDS, TASK_SECONDS, TASKS_TOTAL, BYTES_SERVED, TASK_QUEUE_PENDING, TASK_QUEUE_DELAYED, \
+    CONTENT_TYPE_LATEST, observe, track_stream, render_metrics
 import os
+import json
 import uuid
-from redis import Redis, asyncio as aioredis
-import aioboto3
+from redis import asyncio as aioredis
 import edge_tts
-from mutagen.mp3 import MP3
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List
 
 load_dotenv()
 
 router = APIRouter()
 
+# 任务执行方式：queue 写入 Redis 任务流由独立 worker 处理；background 在 API 进程内执行
+TASK_BACKEND = os.getenv("TTS_TASK_BACKEND", "queue")
 
-async def generate_tts_stream(text: str, voice_name: str, rate_str: str, volume: str):
-    communicate = edge_tts.Communicate(text=text, voice=voice_name, rate=rate_str, volume=volume)
-    async for chunk in communicate.stream():
+
+# 命中缓存时按此大小分块返回音频
+CACHE_STREAM_CHUNK_SIZE = 16 * 1024
+# 超过该字节数（UTF-8）的文本会按句子分段并发合成
+CHUNK_THRESHOLD_BYTES = int(os.getenv("TTS_CHUNK_THRESHOLD_BYTES", 1500))
+# 单个分段的字节上限
+CHUNK_MAX_BYTES = int(os.getenv("TTS_CHUNK_MAX_BYTES", 1000))
+# 单个请求内并发合成的分段数
+CHUNK_CONCURRENCY = int(os.getenv("TTS_CHUNK_CONCURRENCY", 4))
+# 单个分段的最大尝试次数
+CHUNK_MAX_ATTEMPTS = 2
+
+
+async def stream_upstream(text: str, voice_name: str, rate_str: str, volume: str):
+    """
+    经过上游并发闸门和代理池请求一次合成，逐条返回 edge_tts 的消息；完整读完后记录语速统计
+    """
+    speech_end = 0
+    waited = time.perf_counter()
+    async with upstream_slot():
+        UPSTREAM_WAIT_SECONDS.observe(time.perf_counter() - waited)
+        async with proxy_manager.use() as lease:
+            communicate = edge_tts.Communicate(text=text, voice=voice_name, rate=rate_str, volume=volume,
+                                               proxy=lease.proxy)
+            started = time.perf_counter()
+            first_audio = True
+            outcome = "error"
+            try:
+                async for chunk in communicate.stream():
+                    if first_audio and chunk["type"] == "audio":
+                        UPSTREAM_TTFB_SECONDS.observe(time.perf_counter() - started)
+                        lease.mark_first_byte()
+                        first_audio = False
+                    elif chunk["type"] == "WordBoundary":
+                        speech_end = chunk["offset"] + chunk["duration"]
+                    yield chunk
+                outcome = "success"
+            except (GeneratorExit, asyncio.CancelledError):
+                outcome = "cancelled"
+                raise
+            finally:
+                SYNTHESIS_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - started)
+    # WordBoundary 的时间单位为 100 纳秒
+    await record_synthesis(text, voice_name, rate_str, speech_end / 10_000_000)
+
+
+def stream_synthesis(text: str, voice_name: str, rate_str: str, volume: str):
+    """
+    同 stream_upstream，但本节点上参数相同的并发合成共用一次上游请求
+    """
+    return synthesis_flights.stream(make_cache_key(text, voice_name, rate_str, volume),
+                                    lambda: stream_upstream(text, voice_name, rate_str, volume))
+
+
+def split_for_synthesis(text: str) -> list:
+    """短文本整段合成，长文本按句子分段"""
+    if len(text.encode("utf-8")) <= CHUNK_THRESHOLD_BYTES:
+        return [text]
+    return split_text(text, CHUNK_MAX_BYTES) or [text]
+
+
+async def synthesize_text(text: str, voice_name: str, rate_str: str, volume: str) -> CachedAudio:
+    """
+    向上游请求一次合成（不读写缓存，相同的并发请求会合并），失败时重试
+    """
+    for attempt in range(1, CHUNK_MAX_ATTEMPTS + 1):
+        audio_chunks = []
+        boundaries = []
+        try:
+            async for chunk in stream_synthesis(text, voice_name, rate_str, volume):
+                if chunk["type"] == "audio":
+                    audio_chunks.append(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    boundaries.append({"offset": chunk["offset"], "duration": chunk["duration"],
+                                       "text": chunk["text"]})
+            return CachedAudio(audio=b"".join(audio_chunks), boundaries=boundaries)
+        except Exception as e:
+            if attempt >= CHUNK_MAX_ATTEMPTS or isinstance(e, UpstreamBusyError):
+                raise
+            logger.warning(f"分段合成失败，正在重试: {e}")
+
+
+def merge_results(results: list) -> CachedAudio:
+    """
+    在帧边界拼接多段合成结果，并按前面各段的实际音频时长平移 WordBoundary 偏移量
+    """
+    boundaries = []
+    offset = 0
+    for result in results:
+        for boundary in result.boundaries:
+            boundaries.append({**boundary, "offset": boundary["offset"] + offset})
+        # WordBoundary 的时间单位为 100 纳秒
+        offset += round(mp3_duration(result.audio) * 10_000_000)
+    return CachedAudio(audio=join_mp3([result.audio for result in results]), boundaries=boundaries)
+
+
+def start_chunk_tasks(chunks: list, voice_name: str, rate_str: str, volume: str) -> list:
+    """
+    以有限并发启动各分段的合成任务；信号量按先来先得唤醒，靠前的分段优先完成
+    """
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def bounded(chunk: str) -> CachedAudio:
+        async with semaphore:
+            return await synthesize_text(chunk, voice_name, rate_str, volume)
+
+    return [asyncio.create_task(bounded(chunk)) for chunk in chunks]
+
+
+async def synthesize(text: str, voice_name: str, rate_str: str, volume: str) -> CachedAudio:
+    """
+    合成完整音频并收集 WordBoundary 元数据，优先读取合成缓存；长文本分段并发合成
+    """
+    cache_key = make_cache_key(text, voice_name, rate_str, volume)
+    cached = await synthesis_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    chunks = split_for_synthesis(text)
+    if len(chunks) == 1:
+        result = await synthesize_text(text, voice_name, rate_str, volume)
+    else:
+        tasks = start_chunk_tasks(chunks, voice_name, rate_str, volume)
+        try:
+            result = merge_results(await asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+    await synthesis_cache.put(cache_key, result)
+    return result
+
+
+async def generate_tts_stream(text: str, voice_name: str, rate_str: str, volume: str,
+                              boundaries: Optional[list] = None):
+    """
+    流式返回合成音频
+    :param boundaries: 传入列表时，在流结束后追加整段音频的 WordBoundary（偏移量以整段音频为基准）
+    """
+    cache_key = make_cache_key(text, voice_name, rate_str, volume)
+    cached = await synthesis_cache.get(cache_key)
+    if cached is not None:
+        async for data in iter_audio(cached.audio):
+            yield data
+        if boundaries is not None:
+            boundaries.extend(cached.boundaries)
+        return
+
+    chunks = split_for_synthesis(text)
+    if len(chunks) > 1:
+        # 长文本：各分段并发合成，按顺序在队首分段完成后立即返回
+        tasks = start_chunk_tasks(chunks, voice_name, rate_str, volume)
+        results = []
+        try:
+            for task in tasks:
+                result = await task
+                results.append(result)
+                yield strip_tags(result.audio)
+        finally:
+            for task in tasks:
+                task.cancel()
+        merged = merge_results(results)
+        if boundaries is not None:
+            boundaries.extend(merged.boundaries)
+        await synthesis_cache.put(cache_key, merged)
+        return
+
+    audio_chunks = []
+    collected = []
+    # 超过缓存单条上限后不再保留音频，避免大文件在内存中留存一份完整副本
+    cacheable = True
+    buffered = 0
+    async for chunk in stream_synthesis(text, voice_name, rate_str, volume):
         if chunk["type"] == "audio":
+            if cacheable:
+                buffered += len(chunk["data"])
+                cacheable = buffered <= synthesis_cache.max_entry_bytes
+                if cacheable:
+                    audio_chunks.append(chunk["data"])
+                else:
+                    audio_chunks.clear()
             yield chunk["data"]
+        elif chunk["type"] == "WordBoundary":
+            collected.append({"offset": chunk["offset"], "duration": chunk["duration"], "text": chunk["text"]})
+    if boundaries is not None:
+        boundaries.extend(collected)
+    # 只有完整读完上游流才写入缓存
+    if cacheable:
+        await synthesis_cache.put(cache_key, CachedAudio(audio=b"".join(audio_chunks), boundaries=collected))
 
 
-async def generate_tts_with_duration(text: str, voice_name: str, rate: float, volume: str):
+async def generate_tts_with_duration(text: str, voice_name: str, rate: float, volume: str) -> CachedAudio:
     rate_str = convert_rate_to_percent(rate)
-    communicate = edge_tts.Communicate(text=text, voice=voice_name, rate=rate_str, volume=volume)
-    sub_maker = edge_tts.SubMaker()
-    audio_data = b""
-    async for chunk in communicate.stream():
-        if chunk["type"] == "audio":
-            audio_data += chunk["data"]
-        elif chunk["type"] == "WordBoundary":
-            sub_maker.feed(chunk)
-    return audio_data, sub_maker
+    return await synthesize(text, voice_name, rate_str, volume)
+
+
+async def prefetch_stream(stream):
+    """
+    先读出音频流的第一块再构造响应：等待上游名额超时（UpstreamBusyError）等错误在发送 200 响应头之前抛出，
+    接口据此返回 503，而不是发出一个被截断的 200
+    """
+    try:
+        first = await stream.__anext__()
+    except StopAsyncIteration:
+        return stream
+
+    async def chained():
+        try:
+            yield first
+            async for data in stream:
+                yield data
+        finally:
+            await stream.aclose()
+
+    return chained()
+
+
+async def iter_audio(audio: bytes):
+    """
+    将内存中的整段音频分块返回
+    """
+    for start in range(0, len(audio), CACHE_STREAM_CHUNK_SIZE):
+        yield audio[start:start + CACHE_STREAM_CHUNK_SIZE]
+
+
+async def estimate_audio_bytes(text: str, voice_name: str, rate: float = 1.0, copies: int = 1) -> int:
+    """
+    按预估时长的上限估算整段音频的字节数，用于申请内存额度
+    :param copies: 处理过程中同时存在的整段音频份数
+    """
+    if not copies:
+        return 0
+    prediction = await estimate(text, voice_name, rate)
+    bytes_per_second = get_output_format(DEFAULT_OUTPUT_FORMAT).bitrate / 8
+    return int(prediction.duration(rate)[2] * bytes_per_second * copies)
+
+
+def buffered_copies(text: str, fit_duration: bool, normalize: bool = False) -> int:
+    """
+    处理过程中同时留在内存中的整段音频份数。每次上游合成都有两份：单飞合并的回放缓冲和待写入缓存（或待拼接）的音频块；
+    按时长调整语速时每个候选各两份，另加最终结果；长文本分段合成时另加拼接结果；响度归一化时另加原音频和处理结果
+    """
+    if fit_duration:
+        copies = DURATION_FIT_CANDIDATES * 2 + 1
+    else:
+        copies = 3 if len(split_for_synthesis(text)) > 1 else 2
+    return copies + (2 if normalize else 0)
 
 
 def get_audio_duration(sub_maker: edge_tts.SubMaker, weight: float = 1.0):
@@ -57,66 +310,140 @@ def get_audio_duration(sub_maker: edge_tts.SubMaker, weight: float = 1.0):
     return round(duration * weight, 2)
 
 
-async def adjust_rate_for_duration(text: str, voice_name: str, volume: str, target_duration: float, weight: float,
-                                   max_iterations: int = 5):
-    current_rate = 1
-    # 迭代法
-    for index in range(max_iterations):
-        if index == 0:
-            audio_data, sub_maker = await generate_tts_with_duration(text, voice_name, 1, volume)
-            current_duration = get_audio_duration(sub_maker, weight)
-            current_rate = round(current_duration / target_duration, 2)
-        else:
-            audio_data, sub_maker = await generate_tts_with_duration(text, voice_name, current_rate, volume)
-            current_duration = get_audio_duration(sub_maker, weight)
+# 语速倍率上限，与接口参数校验保持一致
+MAX_VOICE_RATE = 2.0
+# 并发竞速的候选语速数量，1 表示顺序求解
+DURATION_FIT_CANDIDATES = int(os.getenv("TTS_DURATION_FIT_CANDIDATES", 1))
+# 并发候选之间的语速步长（相对比例）
+DURATION_FIT_STEP = 0.03
 
-        if current_duration <= target_duration:
-            return audio_data, current_rate, current_duration
-        else:
-            current_rate += 0.1
 
-    # 如果达到最大迭代次数仍未达到标，返回最接近的结果
-    raise Exception("当前语速超出最大语速速率范围")
+def _ceil_rate(rate: float) -> float:
+    """上游语速精度为 1%，向上取整避免因舍入而超时"""
+    return math.ceil(round(rate * 100, 6)) / 100
 
 
-async def process_mp3gain(file_path: str, mp3gain_params: str) -> None:
+async def adjust_rate_for_duration(text: str, voice_name: str, volume: str, target_duration: float, weight: float,
+                                   max_iterations: int = 5, boundaries: Optional[list] = None):
     """
-    异步处理MP3Gain
+    求解使音频时长不超过目标时长的语速
+    语音时长近似与语速成反比（duration ≈ k / rate），第一次以原速合成得到 k，
+    之后每轮用最近一次的测量值做割线修正；可选地并发尝试多个候选语速，取能满足目标的最慢语速
+    已学到该语音的语速且预估下限也超过目标时，第一次直接使用预估的语速，省去一次原速合成
+    :param boundaries: 传入列表时，追加最终音频的 WordBoundary
+    :return: (音频数据, 语速, 时长, 合成次数)
     """
-    command = f"mp3gain {mp3gain_params} {file_path}"
-    process = await asyncio.create_subprocess_shell(
-        command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE
-    )
-    stdout, stderr = await process.communicate()
+    async def measure(rate: float):
+        result = await generate_tts_with_duration(text, voice_name, rate, volume)
+        return rate, result, get_audio_duration(result.to_sub_maker(), weight)
 
-    if process.returncode != 0:
-        raise Exception(f"MP3Gain处理失败: {stderr.decode()}")
+    start_rate = 1.0
+    prediction = await estimate(text, voice_name)
+    if prediction.samples and prediction.duration()[1] * weight > target_duration:
+        start_rate = min(_ceil_rate(prediction.rate_for(target_duration / weight)[0]), MAX_VOICE_RATE)
 
-    return None
+    _, result, current_duration = await measure(start_rate)
+    synthesis_count = 1
+    if current_duration <= target_duration:
+        DURATION_FIT_ITERATIONS.observe(synthesis_count)
+        if boundaries is not None:
+            boundaries.extend(result.boundaries)
+        return result.audio, start_rate, current_duration, synthesis_count
+
+    # 已知超时的最快语速及其时长，作为割线修正的基准点
+    slow_rate, slow_duration = start_rate, current_duration
+    for _ in range(max_iterations - 1):
+        if slow_rate >= MAX_VOICE_RATE:
+            break
+        predicted = _ceil_rate(slow_rate * slow_duration / target_duration)
+        # 保证每轮至少前进 1%，避免在舍入边界上原地踏步
+        predicted = min(max(predicted, round(slow_rate + 0.01, 2)), MAX_VOICE_RATE)
+        candidates = sorted({
+            min(_ceil_rate(predicted * (1 + DURATION_FIT_STEP * i)), MAX_VOICE_RATE)
+            for i in range(max(DURATION_FIT_CANDIDATES, 1))
+        })
+
+        results = await asyncio.gather(*(measure(rate) for rate in candidates))
+        synthesis_count += len(results)
+
+        fitted = [result for result in results if result[2] <= target_duration]
+        if fitted:
+            rate, result, current_duration = min(fitted, key=lambda result: result[0])
+            logger.info(f"语速求解完成，共合成 {synthesis_count} 次")
+            DURATION_FIT_ITERATIONS.observe(synthesis_count)
+            if boundaries is not None:
+                boundaries.extend(result.boundaries)
+            return result.audio, rate, current_duration, synthesis_count
+
+        slow_rate, _, slow_duration = max(results, key=lambda result: result[0])
+
+    logger.info(f"语速求解失败，共合成 {synthesis_count} 次")
+    DURATION_FIT_ITERATIONS.observe(synthesis_count)
+    raise Exception("当前语速超出最大语速速率范围")
 
 
-async def upload_to_s3(file_path: str, bucket_name: str, object_name: str, s3_client) -> None:
+async def upload_subtitles(s3_client, bucket_name: str, object_base: str, subtitle_formats: List[str],
+                           boundaries: list) -> dict:
     """
-    异步上传文件到S3
+    上传字幕文件，与音频同目录同名，仅后缀不同
+    :return: {格式: 对象名}
     """
-    logger.info(f"开始上传文件到S3: bucket={bucket_name}, object={object_name}")
-    try:
-        async with aiofiles.open(file_path, 'rb') as f:
-            data = await f.read()
-            logger.info(f"文件读取成功，大小: {len(data)} bytes")
-        
-        await s3_client.put_object(
-            Bucket=bucket_name,
-            Key=object_name,
-            Body=data
-        )
-        logger.info("S3上传成功")
-    except Exception as e:
-        logger.error(f"S3上传失败: {str(e)}")
-        logger.error(f"错误详情: {traceback.format_exc()}")
-        raise
+    subtitle_objects = {}
+    for name in subtitle_formats:
+        _, suffix, media_type = get_subtitle_format(name)
+        object_name = f"{object_base}.{suffix}"
+        uploader = S3StreamUploader(s3_client, bucket_name, object_name, content_type=f"{media_type}; charset=utf-8")
+        await uploader.write(render_subtitles(name, boundaries).encode("utf-8"))
+        await uploader.complete()
+        subtitle_objects[name] = object_name
+    return subtitle_objects
+
+
+async def store_task_audio(task_id: str, audio_source, s3_client_ctx, bucket_name: str, object_base: str,
+                           audio_format, gain_options: GainOptions, boundaries: list,
+                           subtitle_formats: Optional[List[str]]) -> tuple:
+    """
+    将任务音频上传到 S3/R2，同时写入本地热副本；按需做响度归一化并上传字幕
+    :param audio_source: 音频块的异步迭代器，读完后 boundaries 中为完整的 WordBoundary
+    :return: (对象名, 音频时长（秒）, 字幕对象 {格式: 对象名})
+    """
+    object_name = f"{object_base}.{audio_format.extension}"
+    normalize = NORMALIZE_ENABLED and gain_options.apply_track_gain
+    subtitle_objects = {}
+    async with s3_client_ctx() as s3_client:
+        uploader = S3StreamUploader(s3_client, bucket_name, object_name, content_type=audio_format.media_type)
+        # 同时写一份本地副本，供 mode=stream 直接返回
+        hot_copy = hot_audio_store.writer(task_id)
+        try:
+            # 时长由音频帧直接计算
+            counter = audio_format.duration_counter()
+            if normalize:
+                # 响度分析需要完整音频，在进程池中处理
+                audio = b"".join([data async for data in audio_source])
+                with observe(NORMALIZE_SECONDS):
+                    audio, gain_db = await normalize_audio(audio, gain_options)
+                logger.info(f"响度归一化完成，增益 {gain_db} dB")
+                counter.feed(audio)
+                await uploader.write(audio)
+                await hot_copy.write(audio)
+            else:
+                # 边合成边上传
+                async for data in audio_source:
+                    counter.feed(data)
+                    await uploader.write(data)
+                    await hot_copy.write(data)
+            await uploader.complete()
+            await hot_copy.commit()
+        except Exception:
+            await uploader.abort()
+            await hot_copy.discard()
+            raise
+        logger.info(f"音频已上传到 S3/R2: {bucket_name} file:{object_name}")
+
+        if subtitle_formats:
+            subtitle_objects = await upload_subtitles(s3_client, bucket_name, object_base, subtitle_formats,
+                                                      boundaries)
+    return object_name, counter.duration, subtitle_objects
 
 
 async def save_audio_task(
@@ -130,91 +457,203 @@ async def save_audio_task(
         bucket_name: str,
         directory_name: str,
         weight: float,
-        s3_client_ctx
+        s3_client_ctx,
+        output_format: str = DEFAULT_OUTPUT_FORMAT,
+        subtitle_formats: Optional[List[str]] = None
 ):
     """
-    异步保存音频任务
+    异步保存音频任务：合成的音频块直接流式上传到 S3/R2，不落地临时文件
+    任务的最终状态由 run_audio_task 根据返回值或异常写入，失败时由它决定重试还是标记失败
+    :param subtitle_formats: 需要同时生成的字幕格式（srt/vtt/json），由同一次合成的 WordBoundary 生成
+    :return: 任务完成时需要写入的字段
     """
-    file_path = f"/tmp/{task_id}.mp3"
-    error_message = None
+    audio_format = get_output_format(output_format)
+    object_base = task_id if not directory_name else f"{directory_name}/{task_id}"
+    boundaries = []
+    lease = None
 
     try:
+        # 响度归一化参数（mp3gain 风格），参数非法时直接失败
+        gain_options = GainOptions.parse(mp3gain_params)
+
         # 检查是否有最大时长限制
-        max_duration = await redis.hget(f"{TASK_PREFIX}{task_id}", "max_duration")
+        max_duration = await get_task_field(redis, task_id, "max_duration")
+        # 合成过程中要缓冲音频，先申请内存额度，额度不足时等待
+        copies = buffered_copies(text, bool(max_duration), NORMALIZE_ENABLED and gain_options.apply_track_gain)
+        lease = await memory_budget.acquire(
+            await estimate_audio_bytes(text, voice_name, 1.0 if max_duration else parse_rate(voice_rate), copies),
+            TASK_MEMORY_WAIT_SECONDS)
         if max_duration:
             max_duration = float(max_duration)
-            audio_data, adjusted_rate, tts_duration = await adjust_rate_for_duration(text, voice_name, voice_volume,
-                                                                                     max_duration, weight)
+            audio_data, adjusted_rate, tts_duration, synthesis_count = await adjust_rate_for_duration(
+                text, voice_name, voice_volume, max_duration, weight, boundaries=boundaries)
             logger.info(f"调整后的语速为 {adjusted_rate}, TTS 音频时长为 {tts_duration}")
-            await redis.hset(f"{TASK_PREFIX}{task_id}", "voice_rate", str(adjusted_rate))
-            await redis.hset(f"{TASK_PREFIX}{task_id}", "duration", str(tts_duration))
+            await update_task(redis, task_id, voice_rate=adjusted_rate, duration=tts_duration,
+                              synthesis_count=synthesis_count)
             if adjusted_rate < 0.1 or adjusted_rate > 2:
                 raise Exception(f"无法调整语速到合适的范围内。当前语速为 {adjusted_rate}")
-            
-            # 将音频数据写入文件
-            async with aiofiles.open(file_path, "wb") as file:
-                await file.write(audio_data)
-        else:
-            # 使用新的 API 直接生成音频文件
-            communicate = edge_tts.Communicate(text=text, voice=voice_name, rate=voice_rate, volume=voice_volume)
-            await communicate.save(file_path)
-            
-            # 使用 mutagen 获取音频时长
-            audio = MP3(file_path)
-            duration = round(audio.info.length * weight, 2)
-            await redis.hset(f"{TASK_PREFIX}{task_id}", "duration", str(duration))
-
-        # 使用异步MP3Gain处理音频文件
-        logger.info(f"开始处理音频文件 {file_path}")
-        try:
-            # await process_mp3gain(file_path, mp3gain_params)
-            logger.info("MP3Gain处理完成")
-        except Exception as e:
-            error_message = str(e)
-            logger.error(f"MP3Gain处理失败: {error_message}")
-            raise
+
+        async def audio_source():
+            if max_duration:
+                yield audio_data
+                return
+            # 命中缓存时不会请求上游
+            async for data in generate_tts_stream(text, voice_name, voice_rate, voice_volume, boundaries=boundaries):
+                yield data
 
         # 上传到S3/R2
         logger.info(f"开始上传文件到 S3/R2")
-        if not directory_name:
-            object_name = f"{task_id}.mp3"
-        else:
-            object_name = f"{directory_name}/{task_id}.mp3"
-
         try:
-            async with s3_client_ctx() as s3_client:
-                await upload_to_s3(file_path, bucket_name, object_name, s3_client)
-            logger.info(f"文件 {file_path} 已上传到 S3/R2: {bucket_name} file:{object_name}")
+            object_name, duration, subtitle_objects = await store_task_audio(
+                task_id, audio_source(), s3_client_ctx, bucket_name, object_base, audio_format, gain_options,
+                boundaries, subtitle_formats)
         except Exception as e:
-            error_message = str(e)
-            logger.error(f"S3上传失败: {error_message}")
+            logger.error(f"S3上传失败: {e}")
             raise
 
-        # 更新任务状态
-        await redis.hset(f"{TASK_PREFIX}{task_id}", mapping={
-            "status": "completed",
-            "object_name": object_name,
-            "message": "处理成功"
-        })
+        fields = {"object_name": object_name,
+                  "subtitle_objects": json.dumps(subtitle_objects) if subtitle_objects else None}
+        if not max_duration:
+            fields["duration"] = round(duration * weight, 2)
+        return fields
 
     except Exception as e:
-        if not error_message:
-            error_message = str(e)
-        logger.error(f"处理音频任务失败: {error_message}")
-        await redis.hset(f"{TASK_PREFIX}{task_id}", mapping={
-            "status": "failed",
-            "error": error_message,
-            "message": error_message
-        })
-        raise Exception(error_message)
+        logger.error(f"处理音频任务失败: {e}")
+        raise
+    finally:
+        if lease is not None:
+            lease.release()
+
+
+async def render_dialogue(segments: List[dict]) -> tuple:
+    """
+    并发合成各段对白并在帧边界拼接，段后插入静音帧；完全相同的段只合成一次
+    :param segments: [{"text", "voice_name", "voice_rate", "voice_volume", "pause"}]，voice_rate 为百分比字符串
+    :return: (音频, 整段的 WordBoundary, 各段的起止时间 [{"index", "start", "end"}])
+    """
+    unique = {}
+    for segment in segments:
+        key = (segment["text"], segment["voice_name"], segment["voice_rate"], segment["voice_volume"])
+        unique.setdefault(key, None)
+
+    semaphore = asyncio.Semaphore(CHUNK_CONCURRENCY)
+
+    async def render(key: tuple) -> CachedAudio:
+        async with semaphore:
+            return await synthesize(*key)
+
+    results = dict(zip(unique, await asyncio.gather(*(render(key) for key in unique))))
+
+    parts, boundaries, offsets = [], [], []
+    position = 0.0
+    for index, segment in enumerate(segments):
+        result = results[(segment["text"], segment["voice_name"], segment["voice_rate"], segment["voice_volume"])]
+        audio = strip_tags(result.audio)
+        duration = mp3_duration(audio)
+        # WordBoundary 的时间单位为 100 纳秒
+        shift = round(position * 10_000_000)
+        boundaries.extend({**boundary, "offset": boundary["offset"] + shift} for boundary in result.boundaries)
+        offsets.append({"index": index, "start": round(position, 3), "end": round(position + duration, 3)})
+        parts.append(audio)
+        position += duration
+        if segment.get("pause"):
+            pause = silence(segment["pause"])
+            parts.append(pause)
+            position += mp3_duration(pause)
+    return b"".join(parts), boundaries, offsets
 
+
+async def save_dialogue_task(
+        task_id: str,
+        segments: List[dict],
+        mp3gain_params: str,
+        redis: aioredis.Redis,
+        bucket_name: str,
+        directory_name: str,
+        s3_client_ctx,
+        subtitle_formats: Optional[List[str]] = None
+):
+    """
+    多角色对白任务：各段合成后拼接为一个音频对象，任务结果附带每段的起止时间
+    :return: 任务完成时需要写入的字段
+    """
+    object_base = task_id if not directory_name else f"{directory_name}/{task_id}"
+    lease = None
+    try:
+        gain_options = GainOptions.parse(mp3gain_params)
+        # 各段结果和拼接结果同时留在内存中，按两份整段音频（另加归一化的两份）申请额度
+        copies = 2 + (2 if NORMALIZE_ENABLED and gain_options.apply_track_gain else 0)
+        nbytes = 0
+        for segment in segments:
+            nbytes += await estimate_audio_bytes(segment["text"], segment["voice_name"],
+                                                 parse_rate(segment["voice_rate"]), copies)
+            nbytes += int((segment.get("pause") or 0) * get_output_format(DEFAULT_OUTPUT_FORMAT).bitrate / 8 * copies)
+        lease = await memory_budget.acquire(nbytes, TASK_MEMORY_WAIT_SECONDS)
+        audio, boundaries, offsets = await render_dialogue(segments)
+
+        async def audio_source():
+            yield audio
+
+        object_name, duration, subtitle_objects = await store_task_audio(
+            task_id, audio_source(), s3_client_ctx, bucket_name, object_base, get_output_format(DEFAULT_OUTPUT_FORMAT),
+            gain_options, boundaries, subtitle_formats)
+        return {"object_name": object_name, "duration": round(duration, 2), "segments": json.dumps(offsets),
+                "subtitle_objects": json.dumps(subtitle_objects) if subtitle_objects else None}
+    except Exception as e:
+        logger.error(f"处理对白任务失败: {e}")
+        raise
     finally:
-        # 清理临时文件
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        if lease is not None:
+            lease.release()
+
+
+# 任务类型 -> 处理函数，入队参数中的 kind 字段决定使用哪个
+TASK_HANDLERS = {"audio": save_audio_task, "dialogue": save_dialogue_task}
+
+
+async def run_audio_task(task_id: str, payload: dict, attempt: int, max_attempts: int, redis: aioredis.Redis,
+                         s3_client_ctx) -> None:
+    """
+    任务处理入口（队列 worker 和进程内后台执行共用），也是唯一写入最终状态（completed/failed）的地方：
+    失败且还能重试时回到 pending，订阅者和长轮询不会在重试前就看到 failed
+    :param payload: 入队时保存的任务参数，kind 指定任务类型（默认 audio）
+    :param attempt: 当前是第几次尝试
+    :param max_attempts: 最大尝试次数
+    """
+    payload = dict(payload)
+    handler = TASK_HANDLERS[payload.pop("kind", "audio")]
+    started = time.perf_counter()
+    await update_task(redis, task_id, status="processing", attempts=attempt)
+    try:
+        fields = await handler(task_id=task_id, redis=redis, s3_client_ctx=s3_client_ctx, **payload)
+    except Exception as e:
+        error_message = str(e)
+        if attempt < max_attempts:
+            await update_task(redis, task_id, status="pending", message=f"第 {attempt} 次处理失败，等待重试：{error_message}")
+        else:
+            await update_task(redis, task_id, status="failed", error=error_message, message=error_message)
+            TASKS_TOTAL.labels(status="failed").inc()
+            TASK_SECONDS.labels(status="failed").observe(time.perf_counter() - started)
+        raise
+
+    await update_task(redis, task_id, status="completed", message="处理成功", **fields)
+    TASKS_TOTAL.labels(status="completed").inc()
+    TASK_SECONDS.labels(status="completed").observe(time.perf_counter() - started)
+
+
+async def dispatch_audio_task(task_id: str, payload: dict, redis: aioredis.Redis, s3_client_ctx) -> None:
+    """
+    按 TASK_BACKEND 将任务投递到任务流，或在本进程后台执行（不依附于请求连接，排空时会等待完成）
+    """
+    if TASK_BACKEND == "queue":
+        await enqueue_task(redis, task_id, payload)
+    else:
+        lifecycle.spawn(run_audio_task(task_id, payload, attempt=1, max_attempts=1, redis=redis,
+                                       s3_client_ctx=s3_client_ctx), name=task_id)
 
 
-@router.get("/tts", summary="语音合成", description="将文本转换为语音，并返回语音流")
+@router.get("/tts", summary="语音合成", description="将文本转换为语音，并返回语音流",
+            dependencies=[Depends(lifecycle.ensure_accepting)])
 async def tts_endpoint(
         text: str = Query(..., description="要转换的文本"),
         voice_name: str = Query("zh-TW-HsiaoYuNeural", description="语音名称"),
@@ -222,31 +661,207 @@ async def tts_endpoint(
         voice_volume: str = Query("+0%", description="音量百分比, 范围为-100% ~ +100%"),
         max_duration: float = Query(None, description="最大音频时长（秒），精确到秒后两位"),
         weight: float = Query(1.0, description="权重值"),
+        output_format: str = Query(DEFAULT_OUTPUT_FORMAT, description=f"输出格式，可选: {', '.join(OUTPUT_FORMATS)}"),
         redis: aioredis.Redis = Depends(get_redis_client)
 ):
+    if not voice_catalog.is_valid(voice_name):
+        raise HTTPException(status_code=400, detail=f"不支持的语音名称: {voice_name}")
+    try:
+        media_type = get_output_format(output_format).media_type
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     try:
         if max_duration is not None:
             max_duration = round(max_duration, 2)  # 确保最大时长精确到秒后两位
 
+        # 合成过程中要缓冲音频，先申请内存额度，直到响应发送完才释放
+        lease = await memory_budget.acquire(
+            await estimate_audio_bytes(text, voice_name, 1.0 if max_duration else voice_rate,
+                                       buffered_copies(text, max_duration is not None)),
+            MEMORY_WAIT_SECONDS)
         if max_duration is None:
             rate_str = convert_rate_to_percent(voice_rate)
-            audio_stream = generate_tts_stream(text, voice_name, rate_str, voice_volume)
-            return StreamingResponse(audio_stream, media_type="audio/mpeg")
+            try:
+                audio_stream = await prefetch_stream(generate_tts_stream(text, voice_name, rate_str, voice_volume))
+            except BaseException:
+                lease.release()
+                raise
+            return LeasedStreamingResponse(track_stream(lifecycle.stream(audio_stream), "tts"), lease,
+                                           media_type=media_type)
         else:
-            audio_data, adjusted_rate, tts_duration = await adjust_rate_for_duration(text, voice_name, voice_volume,
-                                                                                     max_duration, weight)
+            try:
+                audio_data, adjusted_rate, tts_duration, synthesis_count = await adjust_rate_for_duration(
+                    text, voice_name, voice_volume, max_duration, weight)
+            except BaseException:
+                lease.release()
+                raise
             logger.info(f"调整的语速为 {adjusted_rate}, TTS 音频时长为 {tts_duration}")
             if adjusted_rate < 0.1 or adjusted_rate > 2:
+                lease.release()
                 raise HTTPException(status_code=400, detail="当前字数超出最大或最小语速速率范围")
 
-            return StreamingResponse(iter([audio_data]), media_type="audio/mpeg")
-    except:
+            return LeasedStreamingResponse(track_stream(iter_audio(audio_data), "tts"), lease, media_type=media_type,
+                                           headers={
+                                               "X-Voice-Rate": str(adjusted_rate),
+                                               "X-Synthesis-Count": str(synthesis_count),
+                                           })
+    except UpstreamBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except MemoryBudgetError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(MEMORY_RETRY_AFTER)})
+    except HTTPException:
+        raise
+    except Exception as e:
         logger.error(traceback.format_exc())
-        return HTTPException(status_code=400, detail="当前字数超出最大或最小语速速率范围")
+        raise HTTPException(status_code=400, detail=f"语音合成失败: {e}")
 
 
-# 任务相关数据的 Redis 键前缀
-TASK_PREFIX = "tts_task:"
+@router.get("/estimate", summary="预估时长",
+            description="根据各语音学到的语速预估文本的语音时长及满足目标时长所需的语速，不请求上游")
+async def estimate_duration(
+        text: str = Query(..., description="要预估的文本"),
+        voice_name: str = Query("zh-CN-XiaoxiaoNeural", description="语音名称"),
+        voice_rate: float = Query(1.0, ge=0.1, le=MAX_VOICE_RATE, description="语速倍率"),
+        max_duration: Optional[float] = Query(None, gt=0, description="目标时长（秒），传入时返回所需语速"),
+        weight: float = Query(1.0, description="权重值，与创建任务时一致")
+):
+    if not voice_catalog.is_valid(voice_name):
+        raise HTTPException(status_code=400, detail=f"不支持的语音名称: {voice_name}")
+    prediction = await estimate(text, voice_name, voice_rate)
+    duration, low, high = (round(value * weight, 2) for value in prediction.duration(voice_rate))
+    result = {
+        "units": prediction.units,
+        "voice_rate": voice_rate,
+        "duration": duration,
+        "duration_low": low,
+        "duration_high": high,
+        "samples": prediction.samples,
+        "source": prediction.source,
+    }
+    if max_duration is not None:
+        # 与 max_duration 任务一致：只会加快语速，不会放慢
+        rate, safe_rate = (max(_ceil_rate(value), 1.0) for value in prediction.rate_for(max_duration / weight))
+        result["fit"] = {
+            "max_duration": max_duration,
+            "voice_rate": rate,
+            "voice_rate_safe": safe_rate,
+            "feasible": rate <= MAX_VOICE_RATE,
+        }
+    return result
+
+
+@router.get("/tts/subtitles", summary="语音字幕",
+            description="返回与 /tts 相同参数合成的音频对应的字幕或逐词时间轴；音频已在缓存中时不会再次请求上游。"
+                        "使用 max_duration 时，voice_rate 传 /tts 响应头 X-Voice-Rate 的值",
+            dependencies=[Depends(lifecycle.ensure_accepting)])
+async def tts_subtitles(
+        text: str = Query(..., description="要转换的文本"),
+        voice_name: str = Query("zh-TW-HsiaoYuNeural", description="语音名称"),
+        voice_rate: float = Query(1.0, description="语速倍率"),
+        voice_volume: str = Query("+0%", description="音量百分比, 范围为-100% ~ +100%"),
+        subtitle_format: str = Query("srt", description=f"字幕格式，可选: {', '.join(SUBTITLE_FORMATS)}"),
+):
+    if not voice_catalog.is_valid(voice_name):
+        raise HTTPException(status_code=400, detail=f"不支持的语音名称: {voice_name}")
+    try:
+        _, _, media_type = get_subtitle_format(subtitle_format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        async with memory_budget.reserve(await estimate_audio_bytes(text, voice_name, voice_rate),
+                                         MEMORY_WAIT_SECONDS):
+            result = await synthesize(text, voice_name, convert_rate_to_percent(voice_rate), voice_volume)
+    except UpstreamBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except MemoryBudgetError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(MEMORY_RETRY_AFTER)})
+    return Response(render_subtitles(subtitle_format, result.boundaries), media_type=f"{media_type}; charset=utf-8")
+
+
+@router.get("/cache/stats", summary="合成缓存统计", description="返回合成缓存的命中/未命中计数")
+async def cache_stats():
+    return synthesis_cache.get_stats()
+
+
+@router.get("/metrics", summary="Prometheus 指标", description="返回 Prometheus 文本格式的指标")
+async def metrics(redis: aioredis.Redis = Depends(get_redis_client)):
+    try:
+        queue = await get_queue_stats(redis)
+        TASK_QUEUE_PENDING.set(queue["pending"])
+        TASK_QUEUE_DELAYED.set(queue["delayed"])
+    except Exception as e:
+        logger.warning(f"读取任务队列状态失败: {e}")
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
+@router.get("/upstream/stats", summary="上游并发状态", description="返回集群范围的上游并发上限、占用数和排队数")
+async def upstream_stats():
+    return {**await get_upstream_stats(), "in_flight_syntheses": synthesis_flights.in_flight(),
+            "proxies": proxy_manager.get_stats()}
+
+
+async def get_node_load() -> dict:
+    """
+    本进程的负载：进行中的音频流、后台任务和合并中的合成，以及集群的上游并发占用
+    """
+    load = {"streams": lifecycle.streams, "background_tasks": lifecycle.tasks,
+            "in_flight_syntheses": synthesis_flights.in_flight(), "memory": memory_budget.get_stats()}
+    try:
+        load["upstream"] = await get_upstream_stats()
+    except Exception as e:
+        load["upstream"] = {"error": str(e)}
+    return load
+
+
+@router.get("/healthz", summary="存活检查", description="进程存活即返回 200，同时报告依赖可达性和当前负载")
+async def healthz():
+    return {"status": "draining" if lifecycle.draining else "ok", "checks": await check_dependencies(),
+            "load": await get_node_load(), "startup": lifecycle.startup}
+
+
+@router.get("/readyz", summary="就绪检查", description="预热完成、依赖均可达且未在排空时返回 200，否则返回 503")
+async def readyz():
+    checks = await check_dependencies()
+    ready = lifecycle.warmed_up and not lifecycle.draining and all(check["ok"] for check in checks.values())
+    if ready:
+        status = "ready"
+    elif lifecycle.draining:
+        status = "draining"
+    else:
+        status = "unavailable" if lifecycle.warmed_up else "warming_up"
+    return JSONResponse({
+        "status": status,
+        "checks": checks,
+        "load": await get_node_load()
+    }, status_code=200 if ready else 503)
+
+
+@router.post("/admin/drain", summary="开始排空",
+             description="停止接受新的合成和任务，/readyz 随即返回 503；用于滚动发布前从负载均衡中摘除节点",
+             dependencies=[Depends(verify_admin_token)])
+async def admin_drain():
+    lifecycle.mark_draining()
+    return {"status": "draining", "load": await get_node_load()}
+
+
+# 语音列表的客户端缓存时长（秒）
+VOICES_MAX_AGE = int(os.getenv("TTS_VOICES_MAX_AGE", 3600))
+
+
+@router.get("/voices", summary="语音列表", description="返回可用的语音，可按语言区域、语言和性别过滤")
+async def list_voices(
+        request: Request,
+        locale: Optional[str] = Query(None, description="语言区域，如 zh-CN"),
+        language: Optional[str] = Query(None, description="语言，如 zh"),
+        gender: Optional[str] = Query(None, description="性别，Female 或 Male"),
+):
+    # 同一目录版本下，相同过滤条件的结果不变
+    etag = f'"{voice_catalog.etag}-{make_cache_key(locale or "", language or "", gender or "", "")[:8]}"'
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={VOICES_MAX_AGE}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    voices = voice_catalog.find(locale=locale, gender=gender, language=language)
+    return JSONResponse({"total": len(voices), "voices": voices}, headers=headers)
 
 
 class AudioTaskRequest(BaseModel):
@@ -256,7 +871,7 @@ class AudioTaskRequest(BaseModel):
     voice_rate: float = Field(default=1.0, description="语速倍率", example=1.0, ge=0.1, le=2.0)
     voice_volume: str = Field(default="+0%", description="音量百分比, 范围为-100% ~ +100%", 
                             example="+0%")
-    mp3gain_params: str = Field(default="-r -c -d 8", description="MP3Gain参数", 
+    mp3gain_params: str = Field(default="-r -c -d 8", description="响度归一化参数（mp3gain 风格，支持 -r -c -d N）", 
                               example="-r -c -d 8")
     max_duration: Optional[float] = Field(default=None, description="最大音频时长（秒），精确到秒后两位", 
                                         example=10.5)
@@ -264,6 +879,36 @@ class AudioTaskRequest(BaseModel):
     directory_name: Optional[str] = Field(default=None, description="S3目录名称, 默认为 / 根目录", 
                                         example="audio/tts")
     weight: float = Field(default=1.0, description="权重值", example=1.0, ge=0.1, le=2.0)
+    output_format: str = Field(default=DEFAULT_OUTPUT_FORMAT, description=f"输出格式，可选: {', '.join(OUTPUT_FORMATS)}",
+                               example=DEFAULT_OUTPUT_FORMAT)
+
+    subtitle_formats: List[str] = Field(default=[], description=f"同时生成的字幕格式，可选: {', '.join(SUBTITLE_FORMATS)}",
+                                        example=["srt"])
+
+    @field_validator("output_format")
+    @classmethod
+    def validate_output_format(cls, value: str) -> str:
+        return get_output_format(value).name
+
+    @field_validator("subtitle_formats")
+    @classmethod
+    def validate_subtitle_formats(cls, value: List[str]) -> List[str]:
+        for name in value:
+            get_subtitle_format(name)
+        return sorted({name.lower() for name in value})
+
+    @field_validator("voice_name")
+    @classmethod
+    def validate_voice_name(cls, value: str) -> str:
+        if not voice_catalog.is_valid(value):
+            raise ValueError(f"不支持的语音名称: {value}")
+        return value
+
+    @field_validator("mp3gain_params")
+    @classmethod
+    def validate_mp3gain_params(cls, value: str) -> str:
+        GainOptions.parse(value)
+        return value
 
     class Config:
         json_schema_extra = {
@@ -281,40 +926,40 @@ class AudioTaskRequest(BaseModel):
         }
 
 
-@router.post("/v2/create-audio-task", summary="创建音频任务", description="创建TTS音频生成任务并返回任务ID")
+def build_task_payload(request: AudioTaskRequest) -> dict:
+    """
+    将请求转换为入队的 save_audio_task 参数
+    """
+    directory_name = request.directory_name if request.directory_name is None else request.directory_name.strip("/")
+    return {
+        "text": request.text,
+        "voice_name": request.voice_name,
+        "voice_rate": convert_rate_to_percent(request.voice_rate),
+        "voice_volume": request.voice_volume,
+        "mp3gain_params": request.mp3gain_params,
+        "bucket_name": request.bucket_name,
+        "directory_name": directory_name,
+        "weight": request.weight,
+        "output_format": request.output_format,
+        "subtitle_formats": request.subtitle_formats,
+    }
+
+
+@router.post("/v2/create-audio-task", summary="创建音频任务", description="创建TTS音频生成任务并返回任务ID",
+             dependencies=[Depends(lifecycle.ensure_accepting)])
 async def create_audio_task_v2(
-    background_tasks: BackgroundTasks,
     request: AudioTaskRequest,
     redis: aioredis.Redis = Depends(get_redis_client),
     s3_client_ctx=Depends(get_s3_client_ctx)
 ):
     task_id = str(uuid.uuid4())
-    rate_str = convert_rate_to_percent(request.voice_rate)
-    directory_name = request.directory_name if request.directory_name is None else request.directory_name.strip("/")
 
     # Store initial task information in Redis
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "status", "pending")
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "voice_rate", "")
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "message", "")
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "bucket_name", request.bucket_name)
-    if request.max_duration is not None:
-        await redis.hset(f"{TASK_PREFIX}{task_id}", "max_duration", str(round(request.max_duration, 2)))
-
-    # Add the TTS task to the background tasks
-    background_tasks.add_task(
-        save_audio_task,
-        task_id,
-        request.text,
-        request.voice_name,
-        rate_str,
-        request.voice_volume,
-        request.mp3gain_params,
-        redis,
-        request.bucket_name,
-        directory_name,
-        request.weight,
-        s3_client_ctx
-    )
+    await create_task(redis, task_id, bucket_name=request.bucket_name, output_format=request.output_format,
+                      max_duration=None if request.max_duration is None else round(request.max_duration, 2))
+
+    # Dispatch the TTS task to the worker queue
+    await dispatch_audio_task(task_id, build_task_payload(request), redis, s3_client_ctx)
 
     return JSONResponse({
         "task_id": task_id,
@@ -322,61 +967,258 @@ async def create_audio_task_v2(
     })
 
 
-@router.post("/create-audio-task", summary="创建音频任务", description="创建TTS音频生成任务并返回任务ID")
+# 对白脚本的最大段数，以及单段后最长的停顿（秒）
+MAX_DIALOGUE_SEGMENTS = int(os.getenv("TTS_MAX_DIALOGUE_SEGMENTS", 200))
+MAX_DIALOGUE_PAUSE = 10.0
+
+
+class DialogueSegment(BaseModel):
+    text: str = Field(..., description="该段文本", min_length=1, example="你好。")
+    voice_name: str = Field(default="zh-CN-XiaoxiaoNeural", description="语音名称", example="zh-CN-XiaoxiaoNeural")
+    voice_rate: float = Field(default=1.0, description="语速倍率", example=1.0, ge=0.1, le=2.0)
+    voice_volume: str = Field(default="+0%", description="音量百分比, 范围为-100% ~ +100%", example="+0%")
+    pause_after: float = Field(default=0.0, description="该段之后插入的静音时长（秒）", example=0.5,
+                               ge=0, le=MAX_DIALOGUE_PAUSE)
+
+    @field_validator("voice_name")
+    @classmethod
+    def validate_voice_name(cls, value: str) -> str:
+        if not voice_catalog.is_valid(value):
+            raise ValueError(f"不支持的语音名称: {value}")
+        return value
+
+
+class DialogueTaskRequest(BaseModel):
+    segments: List[DialogueSegment] = Field(..., description="按播放顺序排列的对白段落", min_length=1)
+    mp3gain_params: str = Field(default="-r -c -d 8", description="响度归一化参数（mp3gain 风格，支持 -r -c -d N）",
+                                example="-r -c -d 8")
+    bucket_name: str = Field(..., description="S3桶名称", example="my-bucket")
+    directory_name: Optional[str] = Field(default=None, description="S3目录名称, 默认为 / 根目录",
+                                          example="audio/tts")
+    subtitle_formats: List[str] = Field(default=[], description=f"同时生成的字幕格式，可选: {', '.join(SUBTITLE_FORMATS)}",
+                                        example=["srt"])
+
+    @field_validator("subtitle_formats")
+    @classmethod
+    def validate_subtitle_formats(cls, value: List[str]) -> List[str]:
+        for name in value:
+            get_subtitle_format(name)
+        return sorted({name.lower() for name in value})
+
+    @field_validator("mp3gain_params")
+    @classmethod
+    def validate_mp3gain_params(cls, value: str) -> str:
+        GainOptions.parse(value)
+        return value
+
+
+@router.post("/v2/create-dialogue-task", summary="创建对白任务",
+             description="多角色对白：各段使用各自的语音、语速和音量并发合成，按顺序拼接为一个音频，结果附带每段的起止时间",
+             dependencies=[Depends(lifecycle.ensure_accepting)])
+async def create_dialogue_task(
+    request: DialogueTaskRequest,
+    redis: aioredis.Redis = Depends(get_redis_client),
+    s3_client_ctx=Depends(get_s3_client_ctx)
+):
+    if len(request.segments) > MAX_DIALOGUE_SEGMENTS:
+        raise HTTPException(status_code=400, detail=f"单个对白最多 {MAX_DIALOGUE_SEGMENTS} 段")
+
+    task_id = str(uuid.uuid4())
+    await create_task(redis, task_id, bucket_name=request.bucket_name, output_format=DEFAULT_OUTPUT_FORMAT)
+    directory_name = request.directory_name if request.directory_name is None else request.directory_name.strip("/")
+    await dispatch_audio_task(task_id, {
+        "kind": "dialogue",
+        "segments": [{
+            "text": segment.text,
+            "voice_name": segment.voice_name,
+            "voice_rate": convert_rate_to_percent(segment.voice_rate),
+            "voice_volume": segment.voice_volume,
+            "pause": segment.pause_after,
+        } for segment in request.segments],
+        "mp3gain_params": request.mp3gain_params,
+        "bucket_name": request.bucket_name,
+        "directory_name": directory_name,
+        "subtitle_formats": request.subtitle_formats,
+    }, redis, s3_client_ctx)
+
+    return JSONResponse({"task_id": task_id, "status": "Task created successfully"})
+
+
+# 单个批次的最大条目数
+MAX_BATCH_SIZE = int(os.getenv("TTS_MAX_BATCH_SIZE", 5000))
+
+
+class AudioTaskBatchRequest(BaseModel):
+    items: List[AudioTaskRequest] = Field(..., description="任务列表", min_length=1)
+
+
+@router.post("/v2/create-audio-task-batch", summary="批量创建音频任务",
+             description="批量创建TTS音频生成任务，相同的条目只生成一次，返回批次ID及每个条目对应的任务ID",
+             dependencies=[Depends(lifecycle.ensure_accepting)])
+async def create_audio_task_batch(
+    request: AudioTaskBatchRequest,
+    redis: aioredis.Redis = Depends(get_redis_client),
+    s3_client_ctx=Depends(get_s3_client_ctx)
+):
+    if len(request.items) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"单个批次最多 {MAX_BATCH_SIZE} 个条目")
+
+    batch_id = str(uuid.uuid4())
+    # 批次内完全相同的条目复用同一个任务
+    task_ids = []
+    unique_items = {}
+    for item in request.items:
+        dedup_key = json.dumps(item.model_dump(), sort_keys=True, ensure_ascii=False)
+        if dedup_key not in unique_items:
+            unique_items[dedup_key] = (str(uuid.uuid4()), item)
+        task_ids.append(unique_items[dedup_key][0])
+
+    # 所有任务信息、批次信息及入队消息通过一个 pipeline 写入
+    async with redis.pipeline(transaction=False) as pipe:
+        for task_id, item in unique_items.values():
+            await create_task(pipe, task_id, bucket_name=item.bucket_name, batch_id=batch_id,
+                              output_format=item.output_format,
+                              max_duration=None if item.max_duration is None else round(item.max_duration, 2))
+            if TASK_BACKEND == "queue":
+                await enqueue_task(pipe, task_id, build_task_payload(item))
+        await create_batch(pipe, batch_id, task_ids)
+        await pipe.execute()
+
+    if TASK_BACKEND != "queue":
+        for task_id, item in unique_items.values():
+            await dispatch_audio_task(task_id, build_task_payload(item), redis, s3_client_ctx)
+
+    return JSONResponse({
+        "batch_id": batch_id,
+        "task_ids": task_ids,
+        "total": len(task_ids),
+        "unique": len(unique_items),
+        "status": "Batch created successfully"
+    })
+
+
+@router.get("/v2/audio-task-batch/{batch_id}", summary="获取批次结果", description="获取批次的状态统计及分页的条目结果")
+async def get_audio_task_batch_result(
+        batch_id: str,
+        offset: int = Query(0, ge=0, description="条目偏移量"),
+        limit: int = Query(100, ge=1, le=1000, description="每页条目数"),
+        redis: aioredis.Redis = Depends(get_redis_client),
+        s3_client_ctx=Depends(get_s3_client_ctx)
+):
+    batch = await get_batch(redis, batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+
+    # 状态统计只读取 status 字段，按去重后的任务计数
+    all_task_ids = await get_batch_task_ids(redis, batch_id)
+    unique_task_ids = list(dict.fromkeys(all_task_ids))
+    counts = {}
+    for task in await get_tasks(redis, unique_task_ids, ["status"]):
+        status = task["status"] if task else "missing"
+        counts[status] = counts.get(status, 0) + 1
+
+    page_ids = all_task_ids[offset:offset + limit]
+    base_url = os.getenv("R2_BASE_URL", "").rstrip('/')
+    items = []
+    for index, (task_id, task) in enumerate(zip(page_ids, await get_tasks(redis, page_ids)), start=offset):
+        task = task or {}
+        object_name = task.get("object_name") if task.get("status") == "completed" else None
+        complete_download_url = ""
+        if object_name:
+            if base_url:
+                complete_download_url = f"{base_url}/{object_name}"
+            else:
+                async with s3_client_ctx() as s3_client:
+                    complete_download_url = await get_presigned_url(s3_client, task.get("bucket_name"), object_name)
+        items.append({
+            "index": index,
+            "task_id": task_id,
+            "status": task.get("status", "missing"),
+            "download_url": object_name or "",
+            "complete_download_url": complete_download_url,
+            "duration": float(task.get("duration") or 0),
+            "voice_rate": task.get("voice_rate", ""),
+            "message": task.get("error") or task.get("message", "")
+        })
+
+    return {
+        "batch_id": batch_id,
+        "total": int(batch.get("total", 0)),
+        "unique": int(batch.get("unique", 0)),
+        "counts": counts,
+        "offset": offset,
+        "limit": limit,
+        "items": items
+    }
+
+
+@router.post("/create-audio-task", summary="创建音频任务", description="创建TTS音频生成任务并返回任务ID",
+             dependencies=[Depends(lifecycle.ensure_accepting)])
 async def create_audio_task(
-        background_tasks: BackgroundTasks,
         text: str = Query(..., description="要转换的文本"),
         voice_name: str = Query("zh-TW-HsiaoYuNeural", description="语音名称"),
         voice_rate: float = Query(1.0, description="语速倍率"),
         voice_volume: str = Query("+0%", description="音量百分比, 范围为-100% ~ +100%"),
-        mp3gain_params: str = Query("-r -c -d 8", description="MP3Gain参数，默认为'-r -c -d 8'"),
+        mp3gain_params: str = Query("-r -c -d 8", description="响度归一化参数（mp3gain 风格，支持 -r -c -d N），默认为'-r -c -d 8'"),
         max_duration: float = Query(None, description="最大音频时长（秒），精确到秒后两位"),
         redis: aioredis.Redis = Depends(get_redis_client),
         bucket_name: str = Query(..., description="S3桶名称测试：7mfitness-test"),
         directory_name: str = Query(default=None, description="S3目录名称, 默认为 / 根目录"),
         weight: float = Query(1.0, description="权重值"),
+        output_format: str = Query(DEFAULT_OUTPUT_FORMAT, description=f"输出格式，可选: {', '.join(OUTPUT_FORMATS)}"),
         s3_client_ctx=Depends(get_s3_client_ctx)
 ):
+    if not voice_catalog.is_valid(voice_name):
+        raise HTTPException(status_code=400, detail=f"不支持的语音名称: {voice_name}")
+    try:
+        GainOptions.parse(mp3gain_params)
+        output_format = get_output_format(output_format).name
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     task_id = str(uuid.uuid4())
     rate_str = convert_rate_to_percent(voice_rate)
     directory_name = directory_name if directory_name is None else directory_name.strip("/")
 
     # Store initial task information in Redis
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "status", "pending")
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "voice_rate", "")
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "message", "")
-    await redis.hset(f"{TASK_PREFIX}{task_id}", "bucket_name", bucket_name)
-    if max_duration is not None:
-        await redis.hset(f"{TASK_PREFIX}{task_id}", "max_duration", str(round(max_duration, 2)))
+    await create_task(redis, task_id, bucket_name=bucket_name, output_format=output_format,
+                      max_duration=None if max_duration is None else round(max_duration, 2))
 
-    # Add the TTS task to the background tasks
-    background_tasks.add_task(save_audio_task, task_id, text, voice_name, rate_str, voice_volume, mp3gain_params, redis,
-                              bucket_name, directory_name, weight, s3_client_ctx)
+    # Dispatch the TTS task to the worker queue
+    await dispatch_audio_task(task_id, {
+        "text": text,
+        "voice_name": voice_name,
+        "voice_rate": rate_str,
+        "voice_volume": voice_volume,
+        "mp3gain_params": mp3gain_params,
+        "bucket_name": bucket_name,
+        "directory_name": directory_name,
+        "weight": weight,
+        "output_format": output_format,
+    }, redis, s3_client_ctx)
 
     return JSONResponse({"task_id": task_id, "status": "Task created successfully"})
 
 
-@router.get("/audio-task/{task_id}", summary="获取任务结果", description="获取语音合成任务的结果")
-async def get_audio_task_result(
-        task_id: str,
-        redis: aioredis.Redis = Depends(get_redis_client),
-        s3_client_ctx=Depends(get_s3_client_ctx),
-        mode: str = Query("url", description="选择模式：url 直接返回下载链接（默认）  stream 直接返回文件流")
-):
-    task_key = f"{TASK_PREFIX}{task_id}"
-    task_exists = await redis.exists(task_key)
+# 任务的终态，进入终态后不会再有状态变更
+FINAL_STATUSES = ("completed", "failed")
+# 长轮询的最长等待时间（秒）
+MAX_WAIT_SECONDS = 60
+# SSE 保活注释的发送间隔（秒）
+SSE_KEEPALIVE_SECONDS = 15
 
-    if not task_exists:
-        raise HTTPException(status_code=404, detail="Task not found")
 
-    # 获取所有任务相关信息
-    status = await redis.hget(task_key, "status")
-    voice_rate = await redis.hget(task_key, "voice_rate") or ""
-    message = await redis.hget(task_key, "message") or ""
-    duration = await redis.hget(task_key, "duration") or 0
-    
+async def build_task_result(task_id: str, task: dict, s3_client_ctx) -> dict:
+    """
+    根据任务信息构造任务结果，已完成的任务附带下载链接
+    """
+    status = task.get("status")
+    voice_rate = task.get("voice_rate") or ""
+    message = task.get("message") or ""
+    duration = task.get("duration") or 0
+
     if status == "failed":
-        error = await redis.hget(task_key, "error")
+        error = task.get("error")
         return {
             "task_id": task_id,
             "status": "failed",
@@ -398,44 +1240,223 @@ async def get_audio_task_result(
             "message": message
         }
 
-    object_name = await redis.hget(task_key, "object_name")
+    object_name = task.get("object_name")
     if not object_name:
         raise HTTPException(status_code=404, detail="Audio file not found")
 
-    # 从Redis中获取bucket_name
-    bucket_name = await redis.hget(task_key, "bucket_name")
+    # 从任务信息中获取bucket_name
+    bucket_name = task.get("bucket_name")
     if not bucket_name:
         raise HTTPException(status_code=500, detail="Bucket name not found in task data")
 
-    if mode == "url":
-        try:
+    try:
+        base_url = os.getenv("R2_BASE_URL", "").rstrip('/')
+
+        async def object_url(name: str) -> str:
+            if base_url:
+                # 配置了公开域名时无需生成预签名URL
+                return f"{base_url}/{name}"
             async with s3_client_ctx() as s3_client:
-                url = await s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': bucket_name, 'Key': object_name},
-                    ExpiresIn=3600
-                )
-                base_url = os.getenv("R2_BASE_URL", "").rstrip('/')
-                download_url = object_name
-                complete_download_url = f"{base_url}/{object_name}" if base_url else url
-                
-                return {
-                    "task_id": task_id,
-                    "status": "completed",
-                    "download_url": download_url,
-                    "complete_download_url": complete_download_url,
-                    "duration": float(duration),
-                    "voice_rate": voice_rate,
-                    "message": message
-                }
-        except Exception as e:
-            logger.error(f"生成预签名URL失败: {e}")
-            raise HTTPException(status_code=500, detail=f"Failed to generate presigned URL: {str(e)}")
-    else:
-        file_path = f"/tmp/{task_id}.mp3"
-        if not os.path.exists(file_path):
+                return await get_presigned_url(s3_client, bucket_name, name)
+
+        download_url = object_name
+        complete_download_url = await object_url(object_name)
+        subtitles = {
+            name: {"download_url": subtitle_object, "complete_download_url": await object_url(subtitle_object)}
+            for name, subtitle_object in json.loads(task.get("subtitle_objects") or "{}").items()
+        }
+
+        result = {
+            "task_id": task_id,
+            "status": "completed",
+            "download_url": download_url,
+            "complete_download_url": complete_download_url,
+            "duration": float(duration),
+            "voice_rate": voice_rate,
+            "message": message,
+            "subtitles": subtitles
+        }
+        if task.get("segments"):
+            # 对白任务：每段在音频中的起止时间（秒）
+            result["segments"] = json.loads(task["segments"])
+        return result
+    except Exception as e:
+        logger.error(f"生成预签名URL失败: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to generate presigned URL: {str(e)}")
+
+
+async def wait_for_status_change(redis: aioredis.Redis, task_id: str, task: dict, timeout: float) -> dict:
+    """
+    等待任务状态发生变化或超时，返回最新的任务信息
+    """
+    async with task_event_hub.subscribe(redis, task_id) as events:
+        # 订阅后重新读取一次，避免错过订阅前发生的变更
+        latest = await get_task(redis, task_id) or task
+        if latest.get("status") != task.get("status"):
+            return latest
+        try:
+            await asyncio.wait_for(events.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return latest
+    return await get_task(redis, task_id) or latest
+
+
+@router.get("/audio-task/{task_id}", summary="获取任务结果", description="获取语音合成任务的结果")
+async def get_audio_task_result(
+        task_id: str,
+        request: Request,
+        redis: aioredis.Redis = Depends(get_redis_client),
+        s3_client_ctx=Depends(get_s3_client_ctx),
+        mode: str = Query("url", description="选择模式：url 直接返回下载链接（默认）  stream 直接返回文件流（支持 Range）"),
+        wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS,
+                            description="长轮询等待秒数：任务未结束时最多等待该时间，状态变化后立即返回")
+):
+    # 一次往返获取所有任务相关信息
+    task = await get_task(redis, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    if wait > 0 and task.get("status") not in FINAL_STATUSES:
+        task = await wait_for_status_change(redis, task_id, task, wait)
+
+    if mode == "url" or task.get("status") != "completed":
+        return await build_task_result(task_id, task, s3_client_ctx)
+
+    # 任务完成后音频不再变化，以任务ID作为 ETag，本地副本和 S3 返回的一致
+    etag = f'"{task_id}"'
+    headers = {"ETag": etag, "Accept-Ranges": "bytes", "Cache-Control": "private, max-age=3600"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    media_type = get_output_format(task.get("output_format")).media_type
+    byte_range = request.headers.get("range")
+    file_path = hot_audio_store.path(task_id)
+    if file_path is not None:
+        # 由 FileResponse 从磁盘分块发送，支持 Range 请求
+        if not byte_range:
+            BYTES_SERVED.labels(endpoint="audio-task").inc(os.path.getsize(file_path))
+        return FileResponse(file_path, media_type=media_type, headers=headers)
+    return await stream_task_audio_from_s3(task_id, task, byte_range, media_type, headers, s3_client_ctx)
+
+
+async def stream_task_audio_from_s3(task_id: str, task: dict, byte_range: Optional[str], media_type: str,
+                                    headers: dict, s3_client_ctx) -> StreamingResponse:
+    """
+    本地没有副本时从 S3 转发音频；完整读取时顺便写入本地副本
+    """
+    object_name = task.get("object_name")
+    bucket_name = task.get("bucket_name")
+    if not object_name or not bucket_name:
+        raise HTTPException(status_code=404, detail="音频文件不存在")
+
+    # 能走到这里说明 S3 客户端已创建，botocore 已经导入
+    from botocore.exceptions import ClientError
+    try:
+        async with s3_client_ctx() as s3_client:
+            response = await open_s3_object(s3_client, bucket_name, object_name, byte_range)
+    except ClientError as e:
+        code = e.response.get("Error", {}).get("Code")
+        if code == "InvalidRange":
+            raise HTTPException(status_code=416, detail="请求的范围无效")
+        if code in ("NoSuchKey", "404"):
             raise HTTPException(status_code=404, detail="音频文件不存在")
+        raise
+
+    headers = {**headers, "Content-Length": str(response["ContentLength"])}
+    status_code = 200
+    if response.get("ContentRange"):
+        status_code = 206
+        headers["Content-Range"] = response["ContentRange"]
+
+    async def body():
+        hot_copy = hot_audio_store.writer(task_id) if status_code == 200 else None
+        completed = False
+        try:
+            async for data in iter_s3_body(response):
+                BYTES_SERVED.labels(endpoint="audio-task").inc(len(data))
+                if hot_copy is not None:
+                    await hot_copy.write(data)
+                yield data
+            completed = True
+        finally:
+            if hot_copy is not None:
+                await (hot_copy.commit() if completed else hot_copy.discard())
+
+    return StreamingResponse(body(), status_code=status_code, media_type=media_type, headers=headers)
+
+
+@router.get("/audio-task/{task_id}/events", summary="订阅任务状态",
+            description="以 Server-Sent Events 推送任务状态变化，任务结束后关闭连接")
+async def audio_task_events(
+        task_id: str,
+        redis: aioredis.Redis = Depends(get_redis_client),
+        s3_client_ctx=Depends(get_s3_client_ctx)
+):
+    task = await get_task(redis, task_id)
+    if task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    def format_event(result: dict) -> str:
+        return f"event: status\ndata: {json.dumps(result, ensure_ascii=False)}\n\n"
+
+    async def event_stream():
+        async with task_event_hub.subscribe(redis, task_id) as events:
+            last_status = None
+            current = await get_task(redis, task_id) or task
+            while True:
+                status = current.get("status")
+                if status != last_status:
+                    try:
+                        result = await build_task_result(task_id, current, s3_client_ctx)
+                    except HTTPException as e:
+                        result = {"task_id": task_id, "status": "failed", "message": e.detail}
+                    yield format_event(result)
+                    last_status = status
+                if status in FINAL_STATUSES:
+                    return
+                try:
+                    await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+                    current = await get_task(redis, task_id) or current
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+# 管理列表返回的任务字段
+ADMIN_TASK_FIELDS = ["status", "created_at", "updated_at", "attempts", "message", "error", "bucket_name",
+                     "object_name", "batch_id", "output_format"]
+
+
+@router.get("/admin/tasks", summary="按状态列出任务",
+            description="基于状态索引按创建时间分页列出任务，可用于排查失败或长时间未完成的任务",
+            dependencies=[Depends(verify_admin_token)])
+async def admin_list_tasks(
+        status: str = Query(..., description=f"任务状态，可选: {', '.join(TASK_STATUSES)}"),
+        offset: int = Query(0, ge=0, description="偏移量"),
+        limit: int = Query(100, ge=1, le=1000, description="每页条数"),
+        order: str = Query("desc", pattern="^(asc|desc)$", description="按创建时间排序，desc 为最新优先"),
+        since: Optional[float] = Query(None, description="创建时间下限（Unix 时间戳）"),
+        until: Optional[float] = Query(None, description="创建时间上限（Unix 时间戳）"),
+        redis: aioredis.Redis = Depends(get_redis_client)
+):
+    if status not in TASK_STATUSES:
+        raise HTTPException(status_code=400, detail=f"不支持的任务状态: {status}")
+    total, tasks = await list_tasks_by_status(redis, status, offset, limit, newest_first=order == "desc",
+                                              since=since, until=until, fields=ADMIN_TASK_FIELDS)
+    return JSONResponse({
+        "status": status,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "tasks": [{"task_id": task_id, **{k: v for k, v in task.items() if v is not None}} for task_id, task in tasks]
+    })
+
 
-        async with aiofiles.open(file_path, "rb") as f:
-            audio_data = await f.read()
-        return StreamingResponse(iter([audio_data]), media_type="audio/mpeg")
+@router.post("/admin/tasks/compact", summary="清理任务索引", description="从状态索引中移除已过期任务的ID",
+             dependencies=[Depends(verify_admin_token)])
+async def admin_compact_tasks(redis: aioredis.Redis = Depends(get_redis_client)):
+    return JSONResponse({"removed": await compact_task_indexes(redis)})
@@ -0,0 +1,177 @@
+"""
+集群级上游并发闸门：所有节点通过 Redis 有序集合共享租约，
+并发上限按 AIMD 调整——成功时缓慢增加，遇到限流或连接错误时减半
+"""
+import os
+import time
+import uuid
+import asyncio
+from contextlib import asynccontextmanager
+
+import aiohttp
+import edge_tts.communicate
+import edge_tts.voices
+from edge_tts.exceptions import WebSocketError
+from app import logger
+from app.dependencies import get_redis_client
+
+GATE_ENABLED = os.getenv("TTS_UPSTREAM_GATE_ENABLED", "true").lower() == "true"
+MAX_CONCURRENCY = int(os.getenv("TTS_UPSTREAM_MAX_CONCURRENCY", 64))
+MIN_CONCURRENCY = min(int(os.getenv("TTS_UPSTREAM_MIN_CONCURRENCY", 4)), MAX_CONCURRENCY)
+# 排队等待的最长时间（秒），超时抛出 UpstreamBusyError
+WAIT_SECONDS = float(os.getenv("TTS_UPSTREAM_WAIT_SECONDS", 30))
+# 租约有效期（秒），持有期间定期续约；进程崩溃后租约自动过期
+LEASE_SECONDS = 60
+# 出错时的乘性减小系数
+DECREASE_FACTOR = 0.5
+
+# 覆盖上游地址，压测时指向本地模拟服务（见 bench/mock_upstream.py）
+UPSTREAM_WSS_URL = os.getenv("TTS_UPSTREAM_WSS_URL")
+UPSTREAM_VOICES_URL = os.getenv("TTS_UPSTREAM_VOICES_URL")
+if UPSTREAM_WSS_URL:
+    edge_tts.communicate.WSS_URL = UPSTREAM_WSS_URL
+if UPSTREAM_VOICES_URL:
+    edge_tts.voices.VOICE_LIST = UPSTREAM_VOICES_URL
+
+LEASES_KEY = "tts_upstream:leases"
+LIMIT_KEY = "tts_upstream:limit"
+# 排队中的请求：有序集合，成员为租约ID，分数为过期时间；每次轮询时刷新，
+# 进程崩溃后没有移除的成员很快过期，不会让排队数永久偏高
+QUEUE_KEY = "tts_upstream:queue"
+# 排队登记的有效期（秒），需大于轮询间隔的上限
+QUEUE_ENTRY_SECONDS = 5
+
+# 清理过期租约后，在上限内则登记租约并移出排队集合，否则登记（刷新）排队
+_ACQUIRE_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[3], '-inf', ARGV[1])
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[4])
+if redis.call('ZCARD', KEYS[1]) < math.floor(limit) then
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[3])
+    redis.call('ZREM', KEYS[3], ARGV[3])
+    return 1
+end
+redis.call('ZADD', KEYS[3], ARGV[5], ARGV[3])
+return 0
+"""
+
+# 释放租约并按结果调整上限：成功时每轮（约 limit 次成功）加 1，失败时乘以系数
+_RELEASE_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+local limit = tonumber(redis.call('GET', KEYS[2]) or ARGV[3])
+if ARGV[2] == 'success' then
+    limit = math.min(tonumber(ARGV[3]), limit + 1 / limit)
+elseif ARGV[2] == 'throttled' then
+    limit = math.max(tonumber(ARGV[4]), limit * tonumber(ARGV[5]))
+end
+redis.call('SET', KEYS[2], tostring(limit))
+return tostring(limit)
+"""
+
+
+class UpstreamBusyError(Exception):
+    """等待上游并发名额超时"""
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """
+    判断是否为上游限流或连接类错误
+    """
+    if isinstance(error, aiohttp.WSServerHandshakeError):
+        return True
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in (403, 429) or error.status >= 500
+    return isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError, WebSocketError))
+
+
+async def _renew(redis, lease_id: str) -> None:
+    while True:
+        await asyncio.sleep(LEASE_SECONDS / 3)
+        try:
+            await redis.zadd(LEASES_KEY, {lease_id: time.time() + LEASE_SECONDS}, xx=True)
+        except Exception as e:
+            logger.warning(f"上游租约续约失败: {e}")
+
+
+@asynccontextmanager
+async def upstream_slot(deadline: float = None):
+    """
+    获取一个上游并发名额，名额不足时排队等待
+    :param deadline: 等待截止时间（time.time() 时间戳），默认 WAIT_SECONDS 秒后
+    """
+    if not GATE_ENABLED:
+        yield
+        return
+
+    redis = await get_redis_client()
+    lease_id = uuid.uuid4().hex
+    deadline = deadline or time.time() + WAIT_SECONDS
+    acquired = False
+    try:
+        acquired = await _acquire(redis, lease_id, deadline)
+    except UpstreamBusyError:
+        raise
+    except Exception as e:
+        # Redis 不可用时放行，避免闸门本身成为故障点
+        logger.warning(f"上游并发闸门不可用，直接放行: {e}")
+
+    if not acquired:
+        yield
+        return
+
+    renew = asyncio.create_task(_renew(redis, lease_id))
+    outcome = "success"
+    try:
+        yield
+    except BaseException as e:
+        outcome = "throttled" if is_throttle_error(e) else "error"
+        raise
+    finally:
+        renew.cancel()
+        try:
+            limit = await redis.eval(_RELEASE_SCRIPT, 2, LEASES_KEY, LIMIT_KEY, lease_id, outcome,
+                                     MAX_CONCURRENCY, MIN_CONCURRENCY, DECREASE_FACTOR)
+            if outcome == "throttled":
+                logger.warning(f"上游限流或连接失败，并发上限降为 {float(limit):.1f}")
+        except Exception as e:
+            logger.warning(f"释放上游租约失败: {e}")
+
+
+async def _acquire(redis, lease_id: str, deadline: float) -> bool:
+    delay = 0.05
+    queued = False
+    try:
+        while True:
+            now = time.time()
+            if await redis.eval(_ACQUIRE_SCRIPT, 3, LEASES_KEY, LIMIT_KEY, QUEUE_KEY, now, now + LEASE_SECONDS,
+                                lease_id, MAX_CONCURRENCY, now + QUEUE_ENTRY_SECONDS):
+                queued = False
+                return True
+            queued = True
+            if now >= deadline:
+                raise UpstreamBusyError("上游并发已满，等待超时")
+            await asyncio.sleep(min(delay, max(deadline - now, 0)))
+            delay = min(delay * 2, 0.5)
+    finally:
+        if queued:
+            await redis.zrem(QUEUE_KEY, lease_id)
+
+
+async def get_upstream_stats() -> dict:
+    """
+    返回集群范围的上游并发状态
+    """
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipe:
+        now = time.time()
+        pipe.zremrangebyscore(LEASES_KEY, "-inf", now)
+        pipe.zcard(LEASES_KEY)
+        pipe.get(LIMIT_KEY)
+        pipe.zcount(QUEUE_KEY, now, "+inf")
+        _, in_use, limit, queued = await pipe.execute()
+    return {
+        "enabled": GATE_ENABLED,
+        "limit": round(float(limit), 2) if limit else MAX_CONCURRENCY,
+        "in_use": in_use,
+        "queued": queued,
+    }
@@ -0,0 +1,146 @@
+"""
+语音目录：启动时拉取一次 Edge TTS 语音列表（失败时读取本地快照），
+在内存中按名称、语言区域和性别建立索引，供 /voices 查询和请求参数校验
+"""
+import os
+import json
+import asyncio
+import hashlib
+import tempfile
+from typing import Dict, List, Optional
+
+import edge_tts
+from app import logger
+
+# 语音列表快照文件，拉取成功后刷新，拉取失败时作为兜底
+VOICES_FILE = os.getenv("TTS_VOICES_FILE", "voices.json")
+VOICE_VALIDATION = os.getenv("TTS_VOICE_VALIDATION", "true").lower() == "true"
+LIST_TIMEOUT = 10
+# 语言区域的中文描述
+LANGUAGE_DESC_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "language_desc.json")
+
+
+def _load_language_desc() -> Dict[str, str]:
+    try:
+        with open(LANGUAGE_DESC_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class VoiceCatalog:
+    """
+    内存中的语音索引，所有查询均为字典查找
+    """
+
+    def __init__(self):
+        self.voices: List[dict] = []
+        self.etag = ""
+        self._by_name: Dict[str, dict] = {}
+        self._by_locale: Dict[str, List[dict]] = {}
+        self._by_gender: Dict[str, List[dict]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return bool(self.voices)
+
+    def load(self, voices: List[dict]) -> None:
+        language_desc = _load_language_desc()
+        entries = []
+        for voice in voices:
+            entries.append({
+                "name": voice["ShortName"],
+                "full_name": voice.get("Name", ""),
+                "locale": voice["Locale"],
+                "locale_name": language_desc.get(voice["Locale"], ""),
+                "gender": voice["Gender"],
+                "friendly_name": voice.get("FriendlyName", ""),
+                "categories": voice.get("VoiceTag", {}).get("ContentCategories", []),
+                "personalities": voice.get("VoiceTag", {}).get("VoicePersonalities", []),
+            })
+        entries.sort(key=lambda entry: entry["name"])
+
+        by_name, by_locale, by_gender = {}, {}, {}
+        for entry in entries:
+            # 短名称和完整名称都是 edge_tts 接受的写法
+            by_name[entry["name"].lower()] = entry
+            if entry["full_name"]:
+                by_name[entry["full_name"].lower()] = entry
+            by_locale.setdefault(entry["locale"].lower(), []).append(entry)
+            by_gender.setdefault(entry["gender"].lower(), []).append(entry)
+
+        self.voices = entries
+        self._by_name, self._by_locale, self._by_gender = by_name, by_locale, by_gender
+        self.etag = hashlib.sha256(json.dumps(entries, sort_keys=True).encode("utf-8")).hexdigest()[:32]
+
+    async def init(self) -> None:
+        """
+        拉取语音列表并写入快照；拉取失败时读取快照，二者都不可用时不做校验
+        """
+        voices = None
+        try:
+            voices = await asyncio.wait_for(edge_tts.list_voices(), LIST_TIMEOUT)
+            await asyncio.to_thread(self._write_snapshot, voices)
+        except Exception as e:
+            logger.warning(f"拉取语音列表失败，尝试读取快照: {e}")
+            try:
+                voices = await asyncio.to_thread(self._read_snapshot)
+            except (OSError, ValueError) as e:
+                logger.warning(f"读取语音列表快照失败，语音名称将不做校验: {e}")
+        if voices:
+            self.load(voices)
+            logger.info(f"语音目录已加载，共 {len(self.voices)} 个语音")
+
+    @staticmethod
+    def _write_snapshot(voices: List[dict]) -> None:
+        """
+        先写入同目录下的唯一临时文件再原子替换，多个进程同时写入时互不干扰
+        """
+        directory = os.path.dirname(os.path.abspath(VOICES_FILE))
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", dir=directory, prefix=".voices.", suffix=".tmp",
+                                         delete=False) as f:
+            json.dump(voices, f, ensure_ascii=False)
+        try:
+            os.replace(f.name, VOICES_FILE)
+        except OSError:
+            os.remove(f.name)
+            raise
+
+    @staticmethod
+    def _read_snapshot() -> List[dict]:
+        with open(VOICES_FILE, encoding="utf-8") as f:
+            return json.load(f)
+
+    def get(self, name: str) -> Optional[dict]:
+        return self._by_name.get(name.lower())
+
+    def is_valid(self, name: str) -> bool:
+        """
+        语音名称是否可用；未启用校验或目录未加载时一律放行
+        """
+        if not VOICE_VALIDATION or not self.loaded:
+            return True
+        return name.lower() in self._by_name
+
+    def find(self, locale: Optional[str] = None, gender: Optional[str] = None,
+             language: Optional[str] = None) -> List[dict]:
+        """
+        按语言区域（如 zh-CN）、语言（如 zh）和性别过滤
+        """
+        if locale:
+            candidates = self._by_locale.get(locale.lower(), [])
+        elif gender:
+            candidates = self._by_gender.get(gender.lower(), [])
+        else:
+            candidates = self.voices
+        if gender:
+            gender = gender.lower()
+            candidates = [voice for voice in candidates if voice["gender"].lower() == gender]
+        if language:
+            prefix = f"{language.lower()}-"
+            candidates = [voice for voice in candidates if voice["locale"].lower().startswith(prefix)]
+        return candidates
+
+
+# 全局语音目录
+voice_catalog = VoiceCatalog()
@@ -0,0 +1,84 @@
+"""
+启动预热：预解析上游和 S3 的域名，建立 Redis 连接、创建 S3 客户端，启动归一化进程池并做一次极短的合成
+归一化只在执行任务的进程中进行：队列模式下 API 进程不启动进程池，由 worker 启动时预热
+在后台执行，完成（无论各阶段成败）后 /readyz 才会返回就绪
+"""
+import os
+import time
+import asyncio
+from urllib.parse import urlparse
+
+import edge_tts
+
+from app import logger
+from app.dependencies import get_redis_client, init_s3_client
+from app.lifecycle import lifecycle, HEALTH_S3_BUCKET
+from app.normalize import NORMALIZE_ENABLED, warm_up_normalizer
+
+WARMUP_ENABLED = os.getenv("TTS_WARMUP_ENABLED", "true").lower() == "true"
+# 单个阶段的超时（秒）
+WARMUP_TIMEOUT = float(os.getenv("TTS_WARMUP_TIMEOUT", 15))
+# 预热合成使用的文本和语音，为空时跳过合成
+WARMUP_TEXT = os.getenv("TTS_WARMUP_TEXT", "你好")
+WARMUP_VOICE = os.getenv("TTS_WARMUP_VOICE", "zh-CN-XiaoxiaoNeural")
+
+
+async def _resolve_hosts() -> None:
+    loop = asyncio.get_running_loop()
+    hosts = {urlparse(edge_tts.communicate.WSS_URL).hostname, urlparse(os.getenv("ENDPOINT_URL", "")).hostname}
+    await asyncio.gather(*(loop.getaddrinfo(host, None) for host in hosts if host))
+
+
+async def _prime_redis() -> None:
+    redis = await get_redis_client()
+    await redis.ping()
+
+
+async def _prime_s3() -> None:
+    s3_client = await init_s3_client()
+    if HEALTH_S3_BUCKET:
+        # 发起一次请求，建立到 S3 的 TLS 连接
+        await s3_client.head_bucket(Bucket=HEALTH_S3_BUCKET)
+
+
+async def _prime_upstream() -> None:
+    # 延迟导入，避免与 app.tts 循环导入
+    from app.tts import synthesize_text
+    await synthesize_text(WARMUP_TEXT, WARMUP_VOICE, "+0%", "+0%")
+
+
+async def _run_stage(name: str, stage) -> dict:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(stage(), timeout=WARMUP_TIMEOUT)
+        result = {"ok": True}
+    except Exception as e:
+        logger.warning(f"预热阶段 {name} 失败: {e}")
+        result = {"ok": False, "error": str(e) or type(e).__name__}
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    return result
+
+
+async def warm_up() -> None:
+    """
+    执行各预热阶段并写入启动报告；域名解析先于其余阶段，其余阶段并发执行
+    """
+    # 延迟导入，避免与 app.tts 循环导入
+    from app.tts import TASK_BACKEND
+
+    started = time.perf_counter()
+    report = {"dns": await _run_stage("dns", _resolve_hosts)}
+    stages = {"redis": _prime_redis, "s3": _prime_s3}
+    if NORMALIZE_ENABLED and TASK_BACKEND != "queue":
+        stages["normalizer"] = warm_up_normalizer
+    if WARMUP_TEXT:
+        stages["upstream"] = _prime_upstream
+    results = await asyncio.gather(*(_run_stage(name, stage) for name, stage in stages.items()))
+    report.update(zip(stages, results))
+    report["seconds"] = round(time.perf_counter() - started, 3)
+
+    lifecycle.startup["warmup"] = report
+    lifecycle.warmed_up = True
+    logger.info(f"预热完成，耗时 {report['seconds']} 秒: "
+                + ", ".join(f"{name}={'ok' if r['ok'] else 'failed'}({r['seconds']}s)"
+                            for name, r in report.items() if isinstance(r, dict)))
@@ -0,0 +1,162 @@
+"""
+本地模拟的 Edge TTS 上游，实现 edge_tts 使用的 websocket 协议子集：
+收到 SSML 后按文本长度生成静音 MP3 帧和逐字的 WordBoundary，可配置首包延迟、吞吐和错误注入
+
+单独运行：
+
+    python -m bench.mock_upstream --port 9100 --latency 0.2 --realtime 20 --error-rate 0.01
+
+服务地址通过 TTS_UPSTREAM_WSS_URL / TTS_UPSTREAM_VOICES_URL 传给服务
+"""
+import re
+import json
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+
+from aiohttp import web, WSMsgType
+
+from app.mp3 import silence
+
+# 每个字符（中文）或单词（英文）的朗读时长（秒），语速为 +0% 时
+SECONDS_PER_TOKEN = 0.25
+# 每条音频消息携带的帧数
+FRAMES_PER_MESSAGE = 16
+FRAME_BYTES = 144
+FRAME_SECONDS = 576 / 24000
+# WordBoundary 的时间单位为 100ns
+TICKS_PER_SECOND = 10_000_000
+
+VOICES = [
+    {"Name": f"Microsoft Server Speech Text to Speech Voice ({locale}, {name})", "ShortName": f"{locale}-{name}",
+     "Gender": gender, "Locale": locale, "SuggestedCodec": "audio-24khz-48kbitrate-mono-mp3",
+     "FriendlyName": f"Microsoft {name} Online (Natural)", "Status": "GA",
+     "VoiceTag": {"ContentCategories": ["General"], "VoicePersonalities": ["Friendly"]}}
+    for locale, name, gender in [
+        ("zh-CN", "XiaoxiaoNeural", "Female"),
+        ("zh-CN", "YunxiNeural", "Male"),
+        ("zh-TW", "HsiaoYuNeural", "Female"),
+        ("en-US", "AriaNeural", "Female"),
+        ("en-US", "GuyNeural", "Male"),
+    ]
+]
+
+_SSML_TEXT = re.compile(r"<prosody[^>]*rate='([+-]?\d+)%'[^>]*>(.*?)</prosody>", re.S)
+_TOKEN = re.compile(r"[\u3400-\u9fff]|[A-Za-z0-9']+")
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.2
+    realtime: float = 20.0
+    error_rate: float = 0.0
+
+
+def _text_message(request_id: str, path: str, body: str = "") -> str:
+    return (f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+            f"Path:{path}\r\n\r\n{body}")
+
+
+def _audio_message(request_id: str, data: bytes) -> bytes:
+    header = f"X-RequestId:{request_id}\r\nContent-Type:audio/mpeg\r\nPath:audio\r\n".encode()
+    return len(header).to_bytes(2, "big") + header + data
+
+
+def _boundary_message(request_id: str, token: str, offset: int, duration: int) -> str:
+    return _text_message(request_id, "audio.metadata", json.dumps({"Metadata": [{
+        "Type": "WordBoundary",
+        "Data": {"Offset": offset, "Duration": duration,
+                 "text": {"Text": token, "Length": len(token), "BoundaryType": "WordBoundary"}},
+    }]}))
+
+
+async def _synthesize(ws: web.WebSocketResponse, config: MockConfig, request_id: str, ssml: str) -> None:
+    match = _SSML_TEXT.search(ssml)
+    rate, text = (int(match.group(1)), match.group(2)) if match else (0, ssml)
+    tokens = _TOKEN.findall(text) or [text[:1] or " "]
+    token_seconds = SECONDS_PER_TOKEN / max(1 + rate / 100, 0.1)
+
+    await asyncio.sleep(config.latency)
+    await ws.send_str(_text_message(request_id, "turn.start", "{}"))
+
+    # 首尾各留约 100ms 静音，与真实上游的留白近似
+    lead = int(0.1 * TICKS_PER_SECOND)
+    for index, token in enumerate(tokens):
+        await ws.send_str(_boundary_message(request_id, token, lead + int(index * token_seconds * TICKS_PER_SECOND),
+                                            int(token_seconds * TICKS_PER_SECOND)))
+
+    audio = silence(len(tokens) * token_seconds + 0.2)
+    chunk_bytes = FRAME_BYTES * FRAMES_PER_MESSAGE
+    # 按 realtime 倍速发送，模拟上游的生成速度
+    interval = FRAMES_PER_MESSAGE * FRAME_SECONDS / config.realtime if config.realtime > 0 else 0
+    for start in range(0, len(audio), chunk_bytes):
+        await ws.send_bytes(_audio_message(request_id, audio[start:start + chunk_bytes]))
+        if interval:
+            await asyncio.sleep(interval)
+    await ws.send_str(_text_message(request_id, "turn.end", "{}"))
+
+
+async def handle_synthesis(request: web.Request) -> web.StreamResponse:
+    config: MockConfig = request.app["config"]
+    if random.random() < config.error_rate:
+        # 模拟上游限流：握手阶段返回 429
+        return web.Response(status=429, text="Too Many Requests")
+
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    async for message in ws:
+        if message.type != WSMsgType.TEXT:
+            continue
+        headers, _, body = message.data.partition("\r\n\r\n")
+        if "Path:ssml" not in headers:
+            continue
+        request_id = re.search(r"X-RequestId:(\w+)", headers)
+        await _synthesize(ws, config, request_id.group(1) if request_id else "0", body)
+    return ws
+
+
+async def handle_voices(request: web.Request) -> web.Response:
+    return web.json_response(VOICES)
+
+
+def create_app(config: MockConfig) -> web.Application:
+    app = web.Application()
+    app["config"] = config
+    app.router.add_get("/edge/v1", handle_synthesis)
+    app.router.add_get("/voices/list", handle_voices)
+    return app
+
+
+async def start_mock_upstream(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+    """
+    在当前事件循环中启动模拟上游，返回 runner；实际端口见 runner.addresses
+    """
+    runner = web.AppRunner(create_app(config), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def upstream_env(host: str, port: int) -> dict:
+    """服务指向模拟上游所需的环境变量"""
+    return {
+        "TTS_UPSTREAM_WSS_URL": f"ws://{host}:{port}/edge/v1?TrustedClientToken=mock",
+        "TTS_UPSTREAM_VOICES_URL": f"http://{host}:{port}/voices/list?trustedclienttoken=mock",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模拟 Edge TTS 上游")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=0.2, help="首包延迟（秒）")
+    parser.add_argument("--realtime", type=float, default=20.0, help="音频生成速度（实时倍数，0 表示不限速）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="握手返回 429 的概率")
+    args = parser.parse_args()
+    config = MockConfig(latency=args.latency, realtime=args.realtime, error_rate=args.error_rate)
+    web.run_app(create_app(config), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+可复现的离线压测：启动模拟上游、Redis/S3 替身、API 服务和 worker，
+按配置的并发压测 /tts 与 /v2/create-audio-task + /audio-task，输出 JSON 结果
+结果中的 startup 为 API 服务的启动耗时：端口开始监听、/readyz 就绪、模块导入、预热各阶段及首个请求
+
+    pip install -r bench/requirements.txt
+    python -m bench.run --scenario tts --scenario task --requests 500 --concurrency 50 --output bench.json
+
+使用真实 Redis/S3 时传入 --redis-host/--s3-endpoint，跳过对应替身
+"""
+import os
+import sys
+import json
+import time
+import socket
+import random
+import string
+import asyncio
+import shutil
+import argparse
+import tempfile
+import subprocess
+import multiprocessing
+from statistics import quantiles
+from typing import List, Optional
+
+import httpx
+
+from bench.mock_upstream import upstream_env
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_BUCKET = "tts-bench"
+BASE_TEXT = "这是一个压测文本，用于比较接口在修改前后的性能。"
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _serve_redis(port: int) -> None:
+    from fakeredis import TcpFakeServer
+    TcpFakeServer(("127.0.0.1", port)).serve_forever()
+
+
+def _serve_s3(port: int) -> None:
+    from moto.server import ThreadedMotoServer
+    ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False).start()
+    while True:
+        time.sleep(3600)
+
+
+def _wait_port(port: int, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"端口 {port} 未就绪")
+
+
+def _wait_ready(base_url: str, timeout: float = 60) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError("API 服务未就绪")
+
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    """读取进程的峰值常驻内存（Linux /proc），其他平台返回 None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _summary(values: List[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+    if len(values) > 1:
+        cuts = quantiles(values, n=100, method="inclusive")
+        p50, p90, p99 = cuts[49], cuts[89], cuts[98]
+    else:
+        p50 = p90 = p99 = values[0]
+    return {"p50": round(p50 * 1000, 1), "p90": round(p90 * 1000, 1), "p99": round(p99 * 1000, 1),
+            "max": round(values[-1] * 1000, 1), "mean": round(sum(values) / len(values) * 1000, 1)}
+
+
+def _make_text(args) -> str:
+    if random.random() < args.repeat_ratio:
+        return BASE_TEXT
+    suffix = "".join(random.choices(string.ascii_letters + string.digits, k=8))
+    return f"{BASE_TEXT * args.text_repeat} 随机字符: {suffix}"
+
+
+async def _tts_request(client: httpx.AsyncClient, args) -> tuple:
+    started = time.perf_counter()
+    ttfb = None
+    async with client.stream("GET", "/tts", params={"text": _make_text(args), "voice_name": args.voice}) as response:
+        async for _ in response.aiter_bytes():
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+        ok = response.status_code == 200 and ttfb is not None
+    return ok, ttfb, time.perf_counter() - started
+
+
+async def _task_request(client: httpx.AsyncClient, args) -> tuple:
+    started = time.perf_counter()
+    response = await client.post("/v2/create-audio-task", json={
+        "text": _make_text(args), "voice_name": args.voice, "bucket_name": BENCH_BUCKET,
+        "mp3gain_params": args.mp3gain_params,
+    })
+    ttfb = time.perf_counter() - started
+    if response.status_code != 200:
+        return False, ttfb, ttfb
+    task_id = response.json()["task_id"]
+    deadline = started + args.task_timeout
+    while time.perf_counter() < deadline:
+        result = (await client.get(f"/audio-task/{task_id}", params={"wait": 30})).json()
+        if result.get("status") in ("completed", "failed"):
+            return result["status"] == "completed", ttfb, time.perf_counter() - started
+    return False, ttfb, time.perf_counter() - started
+
+
+SCENARIOS = {"tts": _tts_request, "task": _task_request}
+
+
+async def run_scenario(name: str, base_url: str, args) -> dict:
+    request = SCENARIOS[name]
+    semaphore = asyncio.Semaphore(args.concurrency)
+    ttfbs, latencies = [], []
+    errors = 0
+
+    async def one(client):
+        nonlocal errors
+        async with semaphore:
+            try:
+                ok, ttfb, total = await request(client, args)
+            except httpx.HTTPError:
+                ok, ttfb, total = False, None, None
+            if not ok:
+                errors += 1
+                return
+            ttfbs.append(ttfb)
+            latencies.append(total)
+
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.task_timeout) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(one(client) for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "error_rate": round(errors / args.requests, 4),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "elapsed_s": round(elapsed, 2),
+        "ttfb_ms": _summary(ttfbs),
+        "latency_ms": _summary(latencies),
+    }
+
+
+def _create_bucket(endpoint: str, env: dict) -> None:
+    import boto3
+    client = boto3.client("s3", endpoint_url=endpoint, aws_access_key_id=env["ACCESS_KEY_ID"],
+                          aws_secret_access_key=env["SECRET_ACCESS_KEY"], region_name="us-east-1")
+    try:
+        client.create_bucket(Bucket=BENCH_BUCKET)
+    except client.exceptions.BucketAlreadyOwnedByYou:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTS 服务离线压测")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="可重复，默认全部")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--voice", default="zh-CN-XiaoxiaoNeural")
+    parser.add_argument("--text-repeat", type=int, default=1, help="文本长度倍数")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="使用固定文本（可命中缓存）的请求比例")
+    parser.add_argument("--mp3gain-params", default="-r -c -d 8")
+    parser.add_argument("--task-timeout", type=float, default=120)
+    parser.add_argument("--upstream-latency", type=float, default=0.2)
+    parser.add_argument("--upstream-realtime", type=float, default=20.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--redis-host", help="使用已有 Redis（host:port），默认启动替身")
+    parser.add_argument("--s3-endpoint", help="使用已有 S3 兼容服务，默认启动替身")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果写入文件，默认输出到标准输出")
+    args = parser.parse_args()
+    random.seed(args.seed)
+    scenarios = args.scenario or sorted(SCENARIOS)
+
+    processes = []
+    server = worker = None
+    cache_dir = None
+    try:
+        upstream_port = _free_port()
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "bench.mock_upstream", "--port", str(upstream_port),
+            "--latency", str(args.upstream_latency), "--realtime", str(args.upstream_realtime),
+            "--error-rate", str(args.upstream_error_rate),
+        ], cwd=ROOT))
+
+        if args.redis_host:
+            redis_host, redis_port = args.redis_host.split(":")
+        else:
+            redis_host, redis_port = "127.0.0.1", str(_free_port())
+            processes.append(multiprocessing.Process(target=_serve_redis, args=(int(redis_port),), daemon=True))
+            processes[-1].start()
+
+        s3_endpoint = args.s3_endpoint
+        if not s3_endpoint:
+            s3_port = _free_port()
+            s3_endpoint = f"http://127.0.0.1:{s3_port}"
+            processes.append(multiprocessing.Process(target=_serve_s3, args=(s3_port,), daemon=True))
+            processes[-1].start()
+
+        api_port = _free_port()
+        # 每次使用新的缓存目录，保证结果可比
+        cache_dir = tempfile.mkdtemp(prefix="tts_bench_")
+        env = {
+            **os.environ,
+            **upstream_env("127.0.0.1", upstream_port),
+            "REDIS_HOST": redis_host,
+            "REDIS_PORT": redis_port,
+            "REDIS_DB": "0",
+            "ENDPOINT_URL": s3_endpoint,
+            "ACCESS_KEY_ID": os.getenv("ACCESS_KEY_ID", "bench"),
+            "SECRET_ACCESS_KEY": os.getenv("SECRET_ACCESS_KEY", "bench"),
+            "TTS_CACHE_DIR": cache_dir,
+            "TTS_VOICES_FILE": os.path.join(cache_dir, "voices.json"),
+            "TTS_PROXY_ENABLED": "false",
+            "TTS_TASK_BACKEND": "queue",
+        }
+
+        _wait_port(upstream_port)
+        _wait_port(int(redis_port))
+        if not args.s3_endpoint:
+            _wait_port(s3_port)
+        _create_bucket(s3_endpoint, env)
+
+        spawned = time.perf_counter()
+        server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(api_port),
+                                   "--log-level", "warning"], cwd=ROOT, env=env)
+        worker = subprocess.Popen([sys.executable, "worker.py"], cwd=ROOT, env=env)
+        _wait_port(api_port)
+        listen_seconds = time.perf_counter() - spawned
+        base_url = f"http://127.0.0.1:{api_port}"
+        _wait_ready(base_url)
+        ready_seconds = time.perf_counter() - spawned
+
+        results = {name: asyncio.run(run_scenario(name, base_url, args)) for name in scenarios}
+        report = {
+            "config": {key: value for key, value in vars(args).items() if key != "output"},
+            "startup": {
+                "listen_seconds": round(listen_seconds, 3),
+                "ready_seconds": round(ready_seconds, 3),
+                **httpx.get(f"{base_url}/healthz", timeout=10).json()["startup"],
+            },
+            "scenarios": results,
+            "peak_rss_mb": {"api": _peak_rss_mb(server.pid), "worker": _peak_rss_mb(worker.pid)},
+        }
+    finally:
+        for process in (server, worker):
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+        for process in processes:
+            process.terminate()
+        if cache_dir:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,19 @@
+import time
+
+_import_started = time.perf_counter()
+
+import asyncio
 from fastapi import FastAPI
 from app.tts import router as tts_router
-from app.dependencies import get_redis_client
-from app.utils import perform_initialization
+from app import logger
+from app.dependencies import init_redis_pool, close_redis_pool, close_s3_clients, get_redis_client
+from app.lifecycle import lifecycle, FirstRequestTimer, WEB_CONCURRENCY, DRAIN_TIMEOUT
+from app.warmup import WARMUP_ENABLED, warm_up
+from app.task_store import update_task
+from app.proxy import proxy_manager, PROXY_ENABLED
+from app.voices import voice_catalog
+from app.task_events import task_event_hub
+from app.normalize import shutdown_normalizer
 import os
 import uvicorn
 from contextlib import asynccontextmanager
@@ -11,16 +23,48 @@ from contextlib import asynccontextmanager
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 在应用启动时执行的代码
-    redis = get_redis_client()
-    # 初始化代理池 # TODO: 代理池不稳定，暂时不用代理池
-    # perform_initialization(redis)
+    init_redis_pool()
+    # 初始化代理池，后台定期刷新
+    if PROXY_ENABLED:
+        proxy_manager.start()
+    # 加载语音目录，用于 /voices 和语音名称校验
+    await voice_catalog.init()
+    warmup_task = None
+    if WARMUP_ENABLED:
+        # 后台预热，完成前 /readyz 返回 503；S3 客户端在预热中创建
+        warmup_task = asyncio.create_task(warm_up())
+    else:
+        # 不预热时 S3 客户端在首次使用时创建
+        lifecycle.warmed_up = True
     yield
+    # 在应用关闭时执行的代码
+    if warmup_task is not None:
+        warmup_task.cancel()
+    # 排空：等待进行中的音频流和后台任务完成，超时未完成的任务标记为失败
+    interrupted = await lifecycle.drain()
+    if interrupted:
+        redis = await get_redis_client()
+        for task_id in interrupted:
+            try:
+                await update_task(redis, task_id, status="failed", error="服务关闭，任务被中断",
+                                  message="服务关闭，任务被中断")
+            except Exception as e:
+                logger.error(f"标记中断任务失败 {task_id}: {e}")
+    await proxy_manager.stop()
+    await task_event_hub.close()
+    await close_redis_pool()
+    await close_s3_clients()
+    shutdown_normalizer()
 
 
 app = FastAPI(lifespan=lifespan)
+app.add_middleware(FirstRequestTimer)
+lifecycle.startup["import_seconds"] = round(time.perf_counter() - _import_started, 3)
 
 # 注册 TTS 路由
 app.include_router(tts_router)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=os.getenv("PORT", 8000))
+    # 多进程时 uvicorn 需要以导入字符串的形式加载应用
+    uvicorn.run("main:app", host="0.0.0.0", port=int(os.getenv("PORT", 8000)), workers=WEB_CONCURRENCY,
+                timeout_graceful_shutdown=int(DRAIN_TIMEOUT))
@@ -0,0 +1,119 @@
+"""
+合成缓存测试：缓存键归一化、内存 LRU 按字节淘汰、磁盘缓存的读写、过期和淘汰
+"""
+import os
+import time
+import asyncio
+
+import pytest
+
+from app.cache import CachedAudio, DiskCache, MemoryLRU, make_cache_key
+
+
+def test_cache_key_normalizes_parameters():
+    # NFD 的 "é" 与 NFC 形式、首尾空白、语音名称大小写不影响缓存键
+    key = make_cache_key("café", "zh-CN-XiaoxiaoNeural", "+10%", "+0%")
+    assert make_cache_key(" café ", "zh-cn-xiaoxiaoneural ", "+10%", "+0%") == key
+    assert make_cache_key("café", "zh-CN-XiaoxiaoNeural", "+20%", "+0%") != key
+    assert make_cache_key("café", "zh-CN-YunxiNeural", "+10%", "+0%") != key
+
+
+def test_memory_lru_evicts_least_recently_used():
+    lru = MemoryLRU(max_bytes=10)
+    lru.put("a", CachedAudio(b"1234"))
+    lru.put("b", CachedAudio(b"1234"))
+    lru.get("a")
+    lru.put("c", CachedAudio(b"1234"))
+    assert "a" in lru and "c" in lru and "b" not in lru
+    assert lru.current_bytes == 8
+
+    # 超过总预算的条目不缓存
+    lru.put("big", CachedAudio(b"x" * 11))
+    assert "big" not in lru
+
+
+def test_disk_cache_round_trip(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024 * 1024, ttl=3600)
+    item = CachedAudio(b"audio", [{"offset": 1, "duration": 2, "text": "你好"}])
+    asyncio.run(cache.put("key", item))
+    assert asyncio.run(cache.get("key")) == item
+    assert asyncio.run(cache.get("missing")) is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_disk_cache_expires_entries(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024 * 1024, ttl=60)
+    asyncio.run(cache.put("key", CachedAudio(b"audio")))
+    old = time.time() - 120
+    for path in cache._paths("key"):
+        os.utime(path, (old, old))
+    assert asyncio.run(cache.get("key")) is None
+    assert not os.listdir(tmp_path)
+
+
+def test_disk_cache_evicts_oldest_entries_over_budget(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=3000, ttl=3600)
+    now = time.time()
+    for index in range(3):
+        asyncio.run(cache.put(f"key{index}", CachedAudio(b"x" * 900)))
+        # 写入时间依次递增，key0 最旧
+        for path in cache._paths(f"key{index}"):
+            os.utime(path, (now - 100 + index, now - 100 + index))
+    # 读取更新访问时间，key0 变为最新
+    assert asyncio.run(cache.get("key0")) is not None
+
+    asyncio.run(cache.put("key3", CachedAudio(b"x" * 900)))
+    # 超出预算后按访问时间从旧到新淘汰到预算的 90%
+    remaining = {os.path.splitext(name)[0] for name in os.listdir(tmp_path)}
+    assert remaining == {"key0", "key3"}
+    assert cache._total_bytes == 2 * 902
+
+
+def test_disk_cache_scans_only_when_needed(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path), max_bytes=1024 * 1024, ttl=3600)
+    scans = []
+    original = cache._evict
+    monkeypatch.setattr(cache, "_evict", lambda: scans.append(1) or original())
+
+    for index in range(5):
+        asyncio.run(cache.put(f"key{index}", CachedAudio(b"x" * 100)))
+    # 只有首次写入（尚未统计过目录）触发扫描，之后按写入字节累加
+    assert len(scans) == 1
+    assert cache._total_bytes == 5 * 102
+
+    cache._next_scan = 0
+    asyncio.run(cache.put("key5", CachedAudio(b"x" * 100)))
+    assert len(scans) == 2
+
+
+def test_disk_cache_removes_stale_temp_files(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1024 * 1024, ttl=3600)
+    stale = tmp_path / "key.mp3.123.456.tmp"
+    fresh = tmp_path / "other.mp3.123.789.tmp"
+    stale.write_bytes(b"x" * 10)
+    fresh.write_bytes(b"x" * 10)
+    old = time.time() - cache.STALE_TMP_SECONDS - 10
+    os.utime(stale, (old, old))
+
+    cache._evict()
+    assert not stale.exists()
+    # 其他进程正在写入的临时文件保留，并计入字节数
+    assert fresh.exists()
+    assert cache._total_bytes == 10
+
+
+@pytest.mark.parametrize("meta_only", [True, False])
+def test_disk_cache_handles_partial_entries(tmp_path, meta_only):
+    cache = DiskCache(str(tmp_path), max_bytes=1024 * 1024, ttl=60)
+    asyncio.run(cache.put("key", CachedAudio(b"audio")))
+    audio_path, meta_path = cache._paths("key")
+    os.remove(audio_path if meta_only else meta_path)
+    assert asyncio.run(cache.get("key")) is None
+
+    # 只剩一半的过期条目在扫描时删除
+    old = time.time() - 120
+    for path in (audio_path, meta_path):
+        if os.path.exists(path):
+            os.utime(path, (old, old))
+    cache._evict()
+    assert not os.listdir(tmp_path)
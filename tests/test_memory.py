@@ -0,0 +1,141 @@
+"""
+内存预算测试：额度申请与释放、先来先得排队、超时拒绝、取消时归还额度、流式响应结束后释放
+"""
+import asyncio
+
+import pytest
+from starlette.requests import ClientDisconnect
+
+from app.memory import LeasedStreamingResponse, MemoryBudget, MemoryBudgetError
+
+
+def test_acquire_and_release():
+    async def run():
+        budget = MemoryBudget(100)
+        lease = await budget.acquire(60, timeout=0)
+        assert budget.used == 60
+        lease.release()
+        lease.release()
+        assert budget.used == 0
+
+        # 超过总预算的申请按总预算计
+        async with budget.reserve(500, timeout=0) as lease:
+            assert lease.nbytes == 100
+        assert budget.used == 0
+
+    asyncio.run(run())
+
+
+def test_disabled_budget_never_blocks():
+    async def run():
+        budget = MemoryBudget(0)
+        lease = await budget.acquire(10 ** 12, timeout=0)
+        assert lease.nbytes == 0 and budget.used == 0
+
+    asyncio.run(run())
+
+
+def test_rejects_after_timeout():
+    async def run():
+        budget = MemoryBudget(100)
+        held = await budget.acquire(80, timeout=0)
+        with pytest.raises(MemoryBudgetError):
+            await budget.acquire(30, timeout=0)
+        with pytest.raises(MemoryBudgetError):
+            await budget.acquire(30, timeout=0.05)
+        assert budget.rejected == 2
+        assert budget.get_stats()["waiting"] == 0
+        held.release()
+        assert budget.used == 0
+
+    asyncio.run(run())
+
+
+def test_waiters_are_granted_in_order():
+    async def run():
+        budget = MemoryBudget(100)
+        held = await budget.acquire(90, timeout=0)
+        order = []
+
+        async def waiter(name, nbytes):
+            lease = await budget.acquire(nbytes, timeout=5)
+            order.append(name)
+            return lease
+
+        large = asyncio.create_task(waiter("large", 80))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(waiter("small", 10))
+        await asyncio.sleep(0.01)
+        # 小申请本可以放下，但排在大申请之后，不会插队
+        assert order == []
+
+        held.release()
+        (await large).release()
+        (await small).release()
+        assert order == ["large", "small"]
+        assert budget.used == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_returns_its_grant():
+    async def run():
+        budget = MemoryBudget(100)
+        held = await budget.acquire(100, timeout=0)
+        waiter = asyncio.create_task(budget.acquire(50, timeout=5))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        held.release()
+        assert budget.used == 0
+        assert budget.get_stats()["waiting"] == 0
+
+    asyncio.run(run())
+
+
+def test_timed_out_head_unblocks_smaller_waiters():
+    async def run():
+        budget = MemoryBudget(100)
+        held = await budget.acquire(60, timeout=0)
+        head = asyncio.create_task(budget.acquire(80, timeout=0.05))
+        await asyncio.sleep(0)
+        small = asyncio.create_task(budget.acquire(30, timeout=5))
+
+        with pytest.raises(MemoryBudgetError):
+            await head
+        lease = await asyncio.wait_for(small, timeout=1)
+        assert budget.used == 90
+        lease.release()
+        held.release()
+
+    asyncio.run(run())
+
+
+@pytest.mark.parametrize("fail_send", [False, True])
+def test_streaming_response_releases_lease(fail_send):
+    async def run():
+        budget = MemoryBudget(100)
+        lease = await budget.acquire(50, timeout=0)
+
+        async def body():
+            yield b"audio"
+
+        async def receive():
+            await asyncio.sleep(10)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if fail_send:
+                raise OSError("client disconnected")
+
+        response = LeasedStreamingResponse(body(), lease, media_type="audio/mpeg")
+        scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.4"}}
+        if fail_send:
+            with pytest.raises((OSError, ClientDisconnect)):
+                await response(scope, receive, send)
+        else:
+            await response(scope, receive, send)
+        assert budget.used == 0
+
+    asyncio.run(run())
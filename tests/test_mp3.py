@@ -0,0 +1,58 @@
+"""
+MP3 帧级工具测试：帧头解析、时长计算、去除标签后的拼接、增量时长统计
+"""
+import pytest
+
+from app.mp3 import Mp3DurationCounter, join_mp3, mp3_duration, parse_frame_header, silence, strip_tags
+
+# edge_tts 输出格式的单帧：24kHz 单声道 48kbps，144 字节，576 个采样
+FRAME_SECONDS = 576 / 24000
+
+
+def _id3v2(payload: bytes = b"\x00" * 20) -> bytes:
+    size = len(payload)
+    return b"ID3\x04\x00\x00" + bytes([(size >> 21) & 0x7F, (size >> 14) & 0x7F, (size >> 7) & 0x7F, size & 0x7F]) + payload
+
+
+def _id3v1() -> bytes:
+    return b"TAG" + bytes(125)
+
+
+def test_parse_frame_header():
+    header = parse_frame_header(silence(FRAME_SECONDS), 0)
+    assert (header.version, header.layer, header.bitrate, header.sample_rate) == (2, 3, 48000, 24000)
+    assert header.length == 144
+    assert header.duration == pytest.approx(FRAME_SECONDS)
+    assert parse_frame_header(b"\x00\x00\x00\x00", 0) is None
+    assert parse_frame_header(b"\xff\xf3", 0) is None
+
+
+def test_silence_rounds_up_to_whole_frames():
+    assert silence(0) == b""
+    assert len(silence(FRAME_SECONDS)) == 144
+    assert len(silence(FRAME_SECONDS * 1.5)) == 288
+    assert mp3_duration(silence(1.0)) == pytest.approx(1.0, abs=FRAME_SECONDS)
+
+
+def test_duration_ignores_tags_and_resyncs_after_garbage():
+    frames = silence(FRAME_SECONDS * 10)
+    tagged = _id3v2() + frames[:144 * 4] + b"\x00garbage" + frames[144 * 4:] + _id3v1()
+    assert mp3_duration(tagged) == pytest.approx(FRAME_SECONDS * 10)
+
+
+def test_join_strips_tags_between_parts():
+    part = _id3v2() + silence(FRAME_SECONDS * 3) + _id3v1()
+    assert strip_tags(part) == silence(FRAME_SECONDS * 3)
+    joined = join_mp3([part, part, silence(FRAME_SECONDS)])
+    assert joined == silence(FRAME_SECONDS) * 7
+    assert mp3_duration(joined) == pytest.approx(FRAME_SECONDS * 7)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 144, 1000])
+def test_duration_counter_matches_full_parse(chunk_size):
+    data = _id3v2() + silence(FRAME_SECONDS * 20)
+    counter = Mp3DurationCounter()
+    for pos in range(0, len(data), chunk_size):
+        counter.feed(data[pos:pos + chunk_size])
+    assert counter.frames == 20
+    assert counter.duration == pytest.approx(mp3_duration(data))
@@ -0,0 +1,103 @@
+"""
+响度归一化测试：mp3gain 参数解析、global_gain 的修改与还原、响度分析及增益上限
+"""
+import math
+
+import numpy as np
+import pytest
+
+from app.mp3 import silence
+from app.normalize import (GAIN_STEP_DB, MAX_GAIN_DB, PINK_REF, GainOptions, _read_bits, analyze_loudness,
+                           apply_gain_steps, normalize_mp3)
+
+FRAME = silence(576 / 24000)
+# MPEG2 单声道帧：global_gain 位于帧头(32) + main_data_begin(8) + private_bits(1) + part2_3_length(12)
+# + big_values(9) 之后
+GLOBAL_GAIN_BIT = 32 + 9 + 21
+
+
+def _gains(data: bytes) -> list:
+    return [_read_bits(bytearray(data), pos * 8 + GLOBAL_GAIN_BIT, 8) for pos in range(0, len(data), len(FRAME))]
+
+
+@pytest.mark.parametrize("params, expected", [
+    (None, GainOptions()),
+    ("", GainOptions()),
+    ("-r", GainOptions(apply_track_gain=True)),
+    ("-r -c -d 8", GainOptions(apply_track_gain=True, ignore_clipping=True, db_offset=8.0)),
+    ("-d -2.5 -r", GainOptions(apply_track_gain=True, db_offset=-2.5)),
+])
+def test_parse_gain_options(params, expected):
+    assert GainOptions.parse(params) == expected
+
+
+@pytest.mark.parametrize("params", ["-x", "-d", "-d loud", "-r -k"])
+def test_parse_rejects_invalid_options(params):
+    with pytest.raises(ValueError):
+        GainOptions.parse(params)
+
+
+def test_apply_gain_steps_is_reversible():
+    data = FRAME * 5
+    assert apply_gain_steps(data, 0) == data
+    louder = apply_gain_steps(data, 4)
+    assert len(louder) == len(data)
+    assert _gains(louder) == [4] * 5
+    assert apply_gain_steps(louder, -4) == data
+
+
+def test_apply_gain_steps_clamps_to_field_range():
+    data = FRAME * 2
+    assert _gains(apply_gain_steps(data, -3)) == [0, 0]
+    assert _gains(apply_gain_steps(data, 300)) == [255, 255]
+
+
+def test_apply_gain_steps_leaves_tags_untouched():
+    tag = b"TAG" + bytes(125)
+    data = FRAME * 3 + tag
+    assert apply_gain_steps(data, 2).endswith(tag)
+
+
+def test_analyze_loudness_ignores_silence():
+    sample_rate = 24000
+    assert analyze_loudness(np.zeros(sample_rate, dtype=np.float32), sample_rate) == (0.0, 0.0)
+
+    t = np.arange(sample_rate) / sample_rate
+    tone = (0.5 * np.sin(2 * math.pi * 440 * t)).astype(np.float32)
+    gain, peak = analyze_loudness(tone, sample_rate)
+    # 0.5 幅度正弦的均方值为 0.125，对应 16 位刻度约 81dB
+    assert gain == pytest.approx(PINK_REF - 10 * math.log10(0.125 * 32768 ** 2), abs=0.01)
+    assert peak == pytest.approx(0.5, abs=1e-3)
+
+    # 前后的静音不拉低响度
+    padded = np.concatenate([np.zeros(sample_rate * 3, dtype=np.float32), tone])
+    assert analyze_loudness(padded, sample_rate)[0] == pytest.approx(gain, abs=0.01)
+
+
+def test_normalize_without_track_gain_is_noop():
+    data = FRAME * 3
+    assert normalize_mp3(data, GainOptions()) == (data, 0.0)
+    assert normalize_mp3(b"", GainOptions(apply_track_gain=True)) == (b"", 0.0)
+
+
+def test_normalize_skips_undecodable_audio():
+    data = b"\xff\xfbnot really an mp3" * 10
+    assert normalize_mp3(data, GainOptions(apply_track_gain=True)) == (data, 0.0)
+
+
+def test_normalize_silence_applies_no_gain():
+    # 全部为静音时建议增益为 0，不会被推到上限
+    data = FRAME * 100
+    assert normalize_mp3(data, GainOptions(apply_track_gain=True)) == (data, 0.0)
+
+
+def test_gain_is_capped(monkeypatch):
+    import app.normalize as normalize
+
+    # 建议增益远超上限时只应用 MAX_GAIN_DB
+    monkeypatch.setattr(normalize, "analyze_loudness", lambda samples, sample_rate: (40.0, 0.0))
+    data = FRAME * 100
+    out, gain = normalize_mp3(data, GainOptions(apply_track_gain=True))
+    max_steps = math.floor(MAX_GAIN_DB / GAIN_STEP_DB)
+    assert gain == max_steps * GAIN_STEP_DB
+    assert set(_gains(out)) == {max_steps}
@@ -0,0 +1,194 @@
+"""
+代理池测试：在本地启动一个返回代理列表的 HTTP 服务，验证刷新、失败冷却、首字节延迟和按健康度轮换
+
+    python -m pytest -q tests
+"""
+import json
+import random
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import aiohttp
+import pytest
+from edge_tts.exceptions import NoAudioReceived
+
+import app.proxy
+from app.proxy import ProxyManager, COOLDOWN_BASE, LATENCY_ALPHA
+
+
+@pytest.fixture
+def proxy_list_server():
+    """
+    模拟 proxy_pool 的 /all/ 接口；修改 state["proxies"] 改变返回的列表，state["status"] 模拟服务故障
+    """
+    state = {"proxies": [], "status": 200}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = json.dumps([{"proxy": proxy} for proxy in state["proxies"]]).encode()
+            self.send_response(state["status"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    state["url"] = f"http://127.0.0.1:{server.server_port}/all/"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def test_refresh_adds_and_removes_proxies(proxy_list_server):
+    manager = ProxyManager(pool_url=proxy_list_server["url"])
+    proxy_list_server["proxies"] = ["10.0.0.1:8080", "http://10.0.0.2:8080"]
+    asyncio.run(manager.refresh())
+    assert {stats["proxy"] for stats in manager.get_stats()} == {"http://10.0.0.1:8080", "http://10.0.0.2:8080"}
+
+    # 已有代理保留统计数据，下线的代理被移除，使用中的代理等请求结束后再移除
+    kept = manager._proxies["http://10.0.0.1:8080"]
+    manager.report(kept, ok=True, latency=0.5)
+    manager._proxies["http://10.0.0.2:8080"].in_flight = 1
+    proxy_list_server["proxies"] = ["10.0.0.1:8080", "10.0.0.3:8080"]
+    asyncio.run(manager.refresh())
+    assert manager._proxies["http://10.0.0.1:8080"] is kept
+    assert set(manager._proxies) == {"http://10.0.0.1:8080", "http://10.0.0.2:8080", "http://10.0.0.3:8080"}
+
+    manager._proxies["http://10.0.0.2:8080"].in_flight = 0
+    asyncio.run(manager.refresh())
+    assert set(manager._proxies) == {"http://10.0.0.1:8080", "http://10.0.0.3:8080"}
+
+
+def test_refresh_failure_keeps_current_proxies(proxy_list_server):
+    manager = ProxyManager(pool_url=proxy_list_server["url"])
+    proxy_list_server["proxies"] = ["10.0.0.1:8080"]
+    asyncio.run(manager.refresh())
+
+    proxy_list_server["status"] = 500
+    asyncio.run(manager.refresh())
+    assert set(manager._proxies) == {"http://10.0.0.1:8080"}
+
+
+def test_failures_put_proxy_in_cooldown(proxy_list_server):
+    manager = ProxyManager(pool_url=proxy_list_server["url"])
+    proxy_list_server["proxies"] = ["10.0.0.1:8080"]
+    asyncio.run(manager.refresh())
+    stats = manager._proxies["http://10.0.0.1:8080"]
+
+    manager.report(stats, ok=False, latency=1.0)
+    first = stats.cooldown_until
+    manager.report(stats, ok=False, latency=1.0)
+    # 连续失败时冷却时长翻倍
+    assert stats.cooldown_until - first == pytest.approx(COOLDOWN_BASE, abs=1)
+    assert manager.pick() is None
+    assert manager.get_stats()[0]["cooling_down"]
+
+    stats.cooldown_until = 0
+    manager.report(stats, ok=True, latency=0.2)
+    assert stats.consecutive_failures == 0
+    assert manager.pick() is stats
+
+
+def test_pick_prefers_healthy_proxies(proxy_list_server):
+    manager = ProxyManager(pool_url=proxy_list_server["url"])
+    proxy_list_server["proxies"] = ["10.0.0.1:8080", "10.0.0.2:8080"]
+    asyncio.run(manager.refresh())
+    healthy = manager._proxies["http://10.0.0.1:8080"]
+    flaky = manager._proxies["http://10.0.0.2:8080"]
+    for _ in range(20):
+        manager.report(healthy, ok=True, latency=0.2)
+    for _ in range(5):
+        manager.report(flaky, ok=True, latency=2.0)
+        manager.report(flaky, ok=False, latency=2.0)
+    flaky.cooldown_until = 0
+
+    random.seed(0)
+    picks = [manager.pick() for _ in range(1000)]
+    assert picks.count(healthy) > 900
+    assert flaky in picks
+
+
+def test_use_reports_outcome(proxy_list_server, monkeypatch):
+    monkeypatch.setattr(app.proxy, "PROXY_ENABLED", True)
+    manager = ProxyManager(pool_url=proxy_list_server["url"])
+    proxy_list_server["proxies"] = ["10.0.0.1:8080"]
+    asyncio.run(manager.refresh())
+    stats = manager._proxies["http://10.0.0.1:8080"]
+
+    async def succeed():
+        async with manager.use() as lease:
+            assert lease.proxy == "http://10.0.0.1:8080"
+            assert stats.in_flight == 1
+
+    async def fail():
+        async with manager.use():
+            raise aiohttp.ClientProxyConnectionError(None, OSError("proxy refused"))
+
+    async def no_audio():
+        async with manager.use():
+            raise NoAudioReceived("No audio was received.")
+
+    async def cancelled():
+        async with manager.use():
+            await asyncio.sleep(10)
+
+    async def run_cancelled():
+        task = asyncio.create_task(cancelled())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(succeed())
+    assert (stats.successes, stats.failures, stats.in_flight) == (1, 0, 0)
+
+    with pytest.raises(aiohttp.ClientConnectionError):
+        asyncio.run(fail())
+    assert (stats.successes, stats.failures) == (1, 1)
+
+    # 上游内容错误与代理无关，不计入健康度，也不触发冷却
+    stats.cooldown_until = 0
+    with pytest.raises(NoAudioReceived):
+        asyncio.run(no_audio())
+    assert (stats.successes, stats.failures, stats.cooldown_until) == (1, 1, 0)
+
+    # 取消与代理无关，不计入健康度
+    asyncio.run(run_cancelled())
+    assert (stats.successes, stats.failures, stats.in_flight) == (1, 1, 0)
+
+
+def test_latency_is_measured_to_first_byte(proxy_list_server, monkeypatch):
+    monkeypatch.setattr(app.proxy, "PROXY_ENABLED", True)
+    manager = ProxyManager(pool_url=proxy_list_server["url"])
+    proxy_list_server["proxies"] = ["10.0.0.1:8080"]
+    asyncio.run(manager.refresh())
+    stats = manager._proxies["http://10.0.0.1:8080"]
+
+    async def long_synthesis():
+        async with manager.use() as lease:
+            await asyncio.sleep(0.05)
+            lease.mark_first_byte()
+            # 长文本的后续音频不计入延迟
+            await asyncio.sleep(0.5)
+            lease.mark_first_byte()
+
+    asyncio.run(long_synthesis())
+    expected = LATENCY_ALPHA * 0.05 + (1 - LATENCY_ALPHA) * 1.0
+    assert stats.latency_ewma == pytest.approx(expected, abs=0.01)
+
+
+def test_use_without_proxies_connects_directly(proxy_list_server, monkeypatch):
+    monkeypatch.setattr(app.proxy, "PROXY_ENABLED", True)
+    manager = ProxyManager(pool_url=proxy_list_server["url"])
+
+    async def run():
+        async with manager.use() as lease:
+            return lease.proxy
+
+    assert asyncio.run(run()) is None
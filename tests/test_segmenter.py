@@ -0,0 +1,68 @@
+"""
+长文本分段测试：按句子/分句/长度切分，片段不超过字节上限，只含标点的片段不单独成段
+"""
+import random
+
+import pytest
+
+from app.segmenter import split_text, _SPEAKABLE_RE
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def test_short_text_is_one_chunk():
+    assert split_text("你好，世界。") == ["你好，世界。"]
+    assert split_text("") == []
+    assert split_text("   ") == []
+
+
+def test_splits_on_sentence_boundaries():
+    sentence = "今天天气很好。"
+    chunks = split_text(sentence * 10, max_bytes=_utf8_len(sentence) * 3)
+    assert all(chunk.endswith("。") for chunk in chunks)
+    assert "".join(chunks) == sentence * 10
+    # 相邻短句合并，不会每句一个请求
+    assert len(chunks) == 4
+
+
+def test_does_not_split_decimals_or_abbreviations():
+    text = "The price is 3.5 dollars. Dr.Smith agreed."
+    assert split_text(text, max_bytes=30) == ["The price is 3.5 dollars.", "Dr.Smith agreed."]
+
+
+def test_long_sentence_splits_on_clauses_then_hard():
+    clause = "这是一个比较长的分句，"
+    chunks = split_text(clause * 5 + "结束。", max_bytes=40)
+    assert all(_utf8_len(chunk) <= 40 for chunk in chunks)
+    assert "".join(chunks) == clause * 5 + "结束。"
+
+    words = " ".join(["word"] * 50)
+    chunks = split_text(words, max_bytes=32)
+    assert all(_utf8_len(chunk) <= 32 for chunk in chunks)
+    # 硬切优先在空白处断开，不切开单词
+    assert all(set(chunk.split()) == {"word"} for chunk in chunks)
+
+
+def test_punctuation_only_chunks_are_merged():
+    assert split_text("你好。……！？", max_bytes=9) == ["你好。……！？"]
+    assert split_text("……。你好。", max_bytes=9) == ["……。你好。"]
+
+
+@pytest.mark.parametrize("max_bytes", [1, 2, 3, 5])
+def test_tiny_max_bytes_terminates(max_bytes):
+    chunks = split_text("中文 text，混合。", max_bytes=max_bytes)
+    assert "".join(chunks).replace(" ", "") == "中文text，混合。"
+
+
+def test_fuzz_chunks_are_speakable_and_preserve_text():
+    rng = random.Random(0)
+    alphabet = "你好世界abc 123，。！？.,;…\n"
+    for _ in range(500):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200)))
+        max_bytes = rng.randint(1, 60)
+        chunks = split_text(text, max_bytes=max_bytes)
+        if _SPEAKABLE_RE.search(text):
+            assert all(_SPEAKABLE_RE.search(chunk) for chunk in chunks)
+        assert "".join(chunks).replace(" ", "").replace("\n", "") == text.replace(" ", "").replace("\n", "")
@@ -0,0 +1,109 @@
+"""
+单飞合并测试：相同 key 的并发请求共享一次上游合成，迟到者回放已缓冲的消息，错误和取消的传播
+"""
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+class Upstream:
+    """可控的上游：每次调用计数，按 release 的节奏产出消息"""
+
+    def __init__(self, count: int = 3, error: Exception = None):
+        self.calls = 0
+        self.count = count
+        self.error = error
+        self.cancelled = False
+        self.step = asyncio.Event()
+
+    async def source(self):
+        self.calls += 1
+        try:
+            for index in range(self.count):
+                await self.step.wait()
+                self.step.clear()
+                yield {"type": "audio", "data": bytes([index])}
+            if self.error is not None:
+                raise self.error
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+
+    def release(self):
+        self.step.set()
+
+
+async def _collect(stream):
+    return [message async for message in stream]
+
+
+async def _drive(upstream: Upstream, *tasks):
+    while not all(task.done() for task in tasks):
+        upstream.release()
+        await asyncio.sleep(0.01)
+
+
+def test_concurrent_requests_share_one_upstream_call():
+    async def run():
+        flights = SingleFlight()
+        upstream = Upstream()
+        first = asyncio.create_task(_collect(flights.stream("key", upstream.source)))
+        await asyncio.sleep(0.01)
+        upstream.release()
+        await asyncio.sleep(0.01)
+        # 迟到的请求先回放已缓冲的消息，再跟随实时消息
+        second = asyncio.create_task(_collect(flights.stream("key", upstream.source)))
+        await _drive(upstream, first, second)
+
+        assert upstream.calls == 1
+        assert first.result() == second.result() == [{"type": "audio", "data": bytes([i])} for i in range(3)]
+        assert flights.in_flight() == 0
+
+    asyncio.run(run())
+
+
+def test_different_keys_and_disabled_do_not_coalesce():
+    async def run():
+        for flights, key2 in ((SingleFlight(), "other"), (SingleFlight(enabled=False), "key")):
+            upstream = Upstream()
+            tasks = [asyncio.create_task(_collect(flights.stream(key, upstream.source))) for key in ("key", key2)]
+            await _drive(upstream, *tasks)
+            assert upstream.calls == 2
+
+    asyncio.run(run())
+
+
+def test_errors_reach_every_subscriber():
+    async def run():
+        flights = SingleFlight()
+        upstream = Upstream(count=1, error=ConnectionError("upstream closed"))
+        tasks = [asyncio.create_task(_collect(flights.stream("key", upstream.source))) for _ in range(2)]
+        await _drive(upstream, *tasks)
+        for task in tasks:
+            with pytest.raises(ConnectionError):
+                task.result()
+        assert upstream.calls == 1
+        assert flights.in_flight() == 0
+
+    asyncio.run(run())
+
+
+def test_upstream_cancelled_only_after_last_subscriber_leaves():
+    async def run():
+        flights = SingleFlight()
+        upstream = Upstream()
+        tasks = [asyncio.create_task(_collect(flights.stream("key", upstream.source))) for _ in range(2)]
+        await asyncio.sleep(0.01)
+
+        tasks[0].cancel()
+        await asyncio.sleep(0.01)
+        assert not upstream.cancelled
+        tasks[1].cancel()
+        await asyncio.sleep(0.01)
+        assert upstream.cancelled
+        # 取消中的合成已移除，新请求重新发起上游请求
+        assert flights.in_flight() == 0
+
+    asyncio.run(run())
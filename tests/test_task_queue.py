@@ -0,0 +1,129 @@
+"""
+任务流 worker 测试（fakeredis）：消费与确认、失败退避重试、达到最大次数后放弃、认领超时任务
+"""
+import asyncio
+import json
+import time
+
+import fakeredis
+import pytest
+
+import app.task_queue as task_queue
+from app.task_queue import (ATTEMPTS_KEY, DELAYED_KEY, GROUP_NAME, STREAM_KEY, TaskWorker, enqueue_task,
+                            ensure_group, get_queue_stats)
+from app.task_store import create_task, get_task
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+async def _read(redis, consumer: str) -> list:
+    response = await redis.xreadgroup(GROUP_NAME, consumer, {STREAM_KEY: ">"}, count=10)
+    return [message for _, messages in response or [] for message in messages]
+
+
+def test_worker_runs_and_acks_tasks(redis):
+    handled = []
+
+    async def handler(task_id, payload, attempt, max_attempts):
+        handled.append((task_id, payload, attempt, max_attempts))
+
+    async def run():
+        worker = TaskWorker(redis, handler, concurrency=2, consumer_name="w1")
+        await ensure_group(redis)
+        await enqueue_task(redis, "t1", {"text": "你好"})
+        runner = asyncio.create_task(worker.run())
+        for _ in range(100):
+            if handled:
+                break
+            await asyncio.sleep(0.02)
+        worker.stop()
+        await asyncio.wait_for(runner, timeout=5)
+
+        assert handled == [("t1", {"text": "你好"}, 1, task_queue.MAX_ATTEMPTS)]
+        # 完成的任务从任务流和待确认列表中删除
+        assert await get_queue_stats(redis) == {"pending": 0, "delayed": 0}
+        assert (await redis.xpending(STREAM_KEY, GROUP_NAME))["pending"] == 0
+        assert not await redis.hexists(ATTEMPTS_KEY, "t1")
+
+    asyncio.run(run())
+
+
+def test_failures_retry_with_backoff_then_give_up(redis, monkeypatch):
+    monkeypatch.setattr(task_queue, "MAX_ATTEMPTS", 2)
+    attempts = []
+
+    async def handler(task_id, payload, attempt, max_attempts):
+        attempts.append(attempt)
+        raise RuntimeError("upstream failed")
+
+    async def run():
+        worker = TaskWorker(redis, handler, consumer_name="w1")
+        await ensure_group(redis)
+        await enqueue_task(redis, "t1", {"text": "你好"})
+
+        (message_id, fields), = await _read(redis, "w1")
+        started = time.time()
+        await worker._handle(message_id, fields)
+        # 第一次失败：消息移入延迟集合，按退避时间重新投递
+        assert await redis.xlen(STREAM_KEY) == 0
+        (raw, due), = await redis.zrange(DELAYED_KEY, 0, -1, withscores=True)
+        assert json.loads(raw) == fields
+        assert due == pytest.approx(started + task_queue.RETRY_BACKOFF, abs=1)
+
+        await redis.zadd(DELAYED_KEY, {raw: 0})
+        await worker._promote_delayed()
+        assert await redis.zcard(DELAYED_KEY) == 0
+        (message_id, fields), = await _read(redis, "w1")
+        await worker._handle(message_id, fields)
+
+        # 达到最大次数：确认并删除消息，不再重试
+        assert attempts == [1, 2]
+        assert await get_queue_stats(redis) == {"pending": 0, "delayed": 0}
+        assert not await redis.hexists(ATTEMPTS_KEY, "t1")
+
+    asyncio.run(run())
+
+
+def test_abandoned_tasks_are_reclaimed(redis, monkeypatch):
+    monkeypatch.setattr(task_queue, "LEASE_SECONDS", 0)
+    handled = []
+
+    async def handler(task_id, payload, attempt, max_attempts):
+        handled.append((task_id, attempt))
+
+    async def run():
+        await ensure_group(redis)
+        await enqueue_task(redis, "t1", {"text": "你好"})
+        # w1 读取后崩溃，没有确认
+        assert len(await _read(redis, "w1")) == 1
+
+        worker = TaskWorker(redis, handler, consumer_name="w2")
+        await worker._reclaim_abandoned()
+        await asyncio.gather(*worker._running)
+        assert handled == [("t1", 1)]
+        assert await redis.xlen(STREAM_KEY) == 0
+        assert (await redis.xpending(STREAM_KEY, GROUP_NAME))["pending"] == 0
+
+    asyncio.run(run())
+
+
+def test_invalid_payload_marks_task_failed(redis):
+    async def handler(*args):
+        raise AssertionError("不应调用处理函数")
+
+    async def run():
+        await ensure_group(redis)
+        await create_task(redis, "t1")
+        await redis.xadd(STREAM_KEY, {"task_id": "t1", "payload": "{not json"})
+        (message_id, fields), = await _read(redis, "w1")
+
+        await TaskWorker(redis, handler, consumer_name="w1")._handle(message_id, fields)
+        task = await get_task(redis, "t1")
+        assert task["status"] == "failed"
+        assert task["error"]
+        assert await redis.xlen(STREAM_KEY) == 0
+
+    asyncio.run(run())
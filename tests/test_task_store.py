@@ -0,0 +1,114 @@
+"""
+任务状态存储测试（fakeredis）：状态索引随状态迁移、终态保留时长、按状态分页列出和索引清理
+"""
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+import app.task_store as task_store
+from app.task_store import (create_batch, create_task, compact_task_indexes, get_task, index_key,
+                            list_tasks_by_status, task_key, update_task)
+
+
+@pytest.fixture
+def redis():
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+def test_status_moves_between_indexes(redis):
+    async def run():
+        await create_task(redis, "t1", text="你好")
+        assert await redis.zrange(index_key("pending"), 0, -1) == ["t1"]
+
+        await update_task(redis, "t1", status="processing")
+        assert await redis.zcard(index_key("pending")) == 0
+        assert await redis.zrange(index_key("processing"), 0, -1) == ["t1"]
+        assert await redis.ttl(task_key("t1")) == -1
+
+        await update_task(redis, "t1", status="completed", object_name="a.mp3")
+        assert await redis.zcard(index_key("processing")) == 0
+        # 索引分数保持为创建时间
+        created_at = float((await get_task(redis, "t1"))["created_at"])
+        assert await redis.zscore(index_key("completed"), "t1") == pytest.approx(created_at, abs=1e-3)
+        assert 0 < await redis.ttl(task_key("t1")) <= task_store.TASK_RETENTION["completed"]
+
+        # 重试时回到非终态，取消过期
+        await update_task(redis, "t1", status="pending")
+        assert await redis.ttl(task_key("t1")) == -1
+        assert await redis.zrange(index_key("pending"), 0, -1) == ["t1"]
+        assert await redis.zcard(index_key("completed")) == 0
+
+    asyncio.run(run())
+
+
+def test_update_without_status_keeps_indexes(redis):
+    async def run():
+        await create_task(redis, "t1")
+        await update_task(redis, "t1", message="处理中")
+        assert (await get_task(redis, "t1"))["message"] == "处理中"
+        assert await redis.zrange(index_key("pending"), 0, -1) == ["t1"]
+
+    asyncio.run(run())
+
+
+def test_list_tasks_by_status_pages_and_filters(redis):
+    async def run():
+        for index in range(5):
+            await create_task(redis, f"t{index}", created_at=1000 + index)
+            await redis.zadd(index_key("pending"), {f"t{index}": 1000 + index})
+
+        total, tasks = await list_tasks_by_status(redis, "pending", offset=0, limit=2)
+        assert total == 5
+        assert [task_id for task_id, _ in tasks] == ["t4", "t3"]
+
+        total, tasks = await list_tasks_by_status(redis, "pending", offset=1, limit=2, newest_first=False)
+        assert [task_id for task_id, _ in tasks] == ["t1", "t2"]
+
+        total, tasks = await list_tasks_by_status(redis, "pending", since=1001, until=1003, fields=["status"])
+        assert total == 3
+        assert tasks == [("t3", {"status": "pending"}), ("t2", {"status": "pending"}), ("t1", {"status": "pending"})]
+
+    asyncio.run(run())
+
+
+def test_listing_drops_expired_tasks_from_index(redis):
+    async def run():
+        await create_task(redis, "t1")
+        await create_task(redis, "t2")
+        await redis.delete(task_key("t1"))
+
+        total, tasks = await list_tasks_by_status(redis, "pending")
+        assert total == 1
+        assert [task_id for task_id, _ in tasks] == ["t2"]
+        assert await redis.zrange(index_key("pending"), 0, -1) == ["t2"]
+
+    asyncio.run(run())
+
+
+def test_compact_removes_only_expired_entries(redis):
+    async def run():
+        old = time.time() - task_store.TASK_RETENTION["completed"] - 10
+        for index in range(5):
+            await redis.zadd(index_key("completed"), {f"old{index}": old})
+        await redis.hset(task_key("old0"), "status", "completed")
+        # 创建不久的任务不检查
+        await redis.zadd(index_key("completed"), {"recent": time.time()})
+
+        assert await compact_task_indexes(redis, batch_size=2) == 4
+        assert sorted(await redis.zrange(index_key("completed"), 0, -1)) == ["old0", "recent"]
+
+    asyncio.run(run())
+
+
+def test_batch_expires_with_its_tasks(redis):
+    async def run():
+        await create_batch(redis, "b1", ["t1", "t2", "t1"], status="pending")
+        batch = await redis.hgetall("tts_batch:b1")
+        assert (batch["total"], batch["unique"]) == ("3", "2")
+        if task_store.BATCH_RETENTION:
+            assert await redis.ttl("tts_batch:b1") > 0
+            assert await redis.ttl("tts_batch:b1:tasks") > 0
+
+    asyncio.run(run())
@@ -0,0 +1,49 @@
+"""
+TTS 任务 worker，独立于 API 进程运行：
+
+    python worker.py
+
+并发数通过环境变量 TTS_WORKER_CONCURRENCY 配置
+"""
+import signal
+import asyncio
+from functools import partial
+from app import logger
+from app.dependencies import get_redis_client, get_s3_client_ctx, close_redis_pool, close_s3_clients
+from app.task_queue import TaskWorker, WORKER_CONCURRENCY
+from app.tts import run_audio_task
+from app.normalize import NORMALIZE_ENABLED, warm_up_normalizer, shutdown_normalizer
+from app.proxy import proxy_manager, PROXY_ENABLED
+from app.metrics import start_worker_metrics_server
+
+
+async def main():
+    redis = await get_redis_client()
+    handler = partial(run_audio_task, redis=redis, s3_client_ctx=get_s3_client_ctx())
+    worker = TaskWorker(redis, handler, concurrency=WORKER_CONCURRENCY)
+    if PROXY_ENABLED:
+        proxy_manager.start()
+    start_worker_metrics_server()
+    if NORMALIZE_ENABLED:
+        # 预先启动归一化进程池，首个需要归一化的任务不再等待进程启动
+        try:
+            await warm_up_normalizer()
+        except Exception as e:
+            logger.warning(f"归一化进程池预热失败: {e}")
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        await proxy_manager.stop()
+        await close_redis_pool()
+        await close_s3_clients()
+        shutdown_normalizer()
+        logger.info("worker 已退出")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())